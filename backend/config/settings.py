@@ -109,6 +109,78 @@ else:
         }
     }
 
+# Cache - shared Redis cache on production (same instance as Channels), local memory for dev
+if _REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _REDIS_URL,
+            'KEY_PREFIX': 'markstrades',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a resolved License stays in the EA lookup cache (see core/license_cache.py)
+LICENSE_CACHE_TTL = int(os.environ.get('LICENSE_CACHE_TTL', '60'))
+
+# Seconds an email/username -> user resolution stays cached (see core/user_resolver.py)
+USER_RESOLVE_CACHE_TTL = int(os.environ.get('USER_RESOLVE_CACHE_TTL', '60'))
+
+# TradeData write-behind (see core/trade_buffer.py): buffer EA snapshots per worker and
+# flush them in batches every TRADE_DATA_FLUSH_INTERVAL seconds (or once MAX_PENDING is reached).
+# A killed worker loses at most that many seconds of snapshots, restored by the EA's next push (capped at 10s)
+TRADE_DATA_WRITE_BEHIND = os.environ.get('TRADE_DATA_WRITE_BEHIND', 'False') == 'True'
+TRADE_DATA_FLUSH_INTERVAL = float(os.environ.get('TRADE_DATA_FLUSH_INTERVAL', '2'))
+TRADE_DATA_FLUSH_MAX_PENDING = int(os.environ.get('TRADE_DATA_FLUSH_MAX_PENDING', '500'))
+
+# License verification log (see core/verification_log.py): queued per worker and bulk-inserted.
+# QUEUE_POLICY: 'drop' new records when the queue is full, or 'block' for up to BLOCK_TIMEOUT seconds
+VERIFICATION_LOG_ASYNC = os.environ.get('VERIFICATION_LOG_ASYNC', 'True') == 'True'
+VERIFICATION_LOG_QUEUE_SIZE = int(os.environ.get('VERIFICATION_LOG_QUEUE_SIZE', '10000'))
+VERIFICATION_LOG_QUEUE_POLICY = os.environ.get('VERIFICATION_LOG_QUEUE_POLICY', 'drop').strip().lower()
+VERIFICATION_LOG_BLOCK_TIMEOUT = float(os.environ.get('VERIFICATION_LOG_BLOCK_TIMEOUT', '1'))
+VERIFICATION_LOG_FLUSH_INTERVAL = float(os.environ.get('VERIFICATION_LOG_FLUSH_INTERVAL', '1'))
+VERIFICATION_LOG_RETENTION_DAYS = int(os.environ.get('VERIFICATION_LOG_RETENTION_DAYS', '30'))
+
+# Notification emails sent by a background thread per worker (see core/mail_queue.py), a full queue drops the email
+MAIL_QUEUE_SIZE = int(os.environ.get('MAIL_QUEUE_SIZE', '1000'))
+
+# Longest get_pending_commands long-poll (wait=<seconds>), only honoured under ASGI (daphne)
+TRADE_COMMAND_LONG_POLL_MAX_WAIT = int(os.environ.get('TRADE_COMMAND_LONG_POLL_MAX_WAIT', '25'))
+
+# Trade WebSocket frames per second per license and socket, extra updates are coalesced (0 = no limit)
+TRADE_WS_MAX_FPS = float(os.environ.get('TRADE_WS_MAX_FPS', '2'))
+
+# Trade WebSocket publishing (see core/trade_broadcast.py): queue updates and send them from a
+# background publisher instead of the EA request. Defaults to on with Redis (the in-memory
+# layer is only safe to use from one event loop). QUEUE_SIZE caps the licenses waiting to be sent.
+TRADE_BROADCAST_ASYNC = os.environ.get('TRADE_BROADCAST_ASYNC', 'True' if _REDIS_URL else 'False') == 'True'
+TRADE_BROADCAST_QUEUE_SIZE = int(os.environ.get('TRADE_BROADCAST_QUEUE_SIZE', '5000'))
+# Skip building/publishing trade updates for licenses no socket is watching (see core/presence.py).
+# Needs Redis shared by gunicorn and daphne, like the channel layer itself (off without it).
+TRADE_BROADCAST_PRESENCE = os.environ.get('TRADE_BROADCAST_PRESENCE', 'True' if _REDIS_URL else 'False') == 'True'
+PRESENCE_REDIS_URL = _REDIS_URL
+
+# Lifetime of the signed token the dashboard WebSocket authenticates with (seconds, default 30 days)
+DASHBOARD_WS_TOKEN_MAX_AGE = int(os.environ.get('DASHBOARD_WS_TOKEN_MAX_AGE', str(30 * 24 * 3600)))
+
+# FM chat resume (see core/chat_buffer.py): the last FM_CHAT_BUFFER_SIZE messages of each room are
+# kept in a Redis list (per-process memory without Redis) so reconnecting sockets only get what they missed
+FM_CHAT_BUFFER_SIZE = int(os.environ.get('FM_CHAT_BUFFER_SIZE', '200'))
+FM_CHAT_BUFFER_REDIS_URL = _REDIS_URL
+
+# Seconds FM chat access decisions (FM / subscriber / none) stay cached (see core/fm_access.py)
+FM_ACCESS_CACHE_TTL = int(os.environ.get('FM_ACCESS_CACHE_TTL', '300'))
+
+# Seconds public read-only responses (plans, products, FM marketplace...) stay cached, 0 disables it
+# (see core/response_cache.py, entries are also dropped when an admin edits the underlying rows)
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
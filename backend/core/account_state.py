@@ -0,0 +1,80 @@
+from core import metrics
+
+# LicenseAccountState: one row per license with the newest balance, equity, profit and
+# position counts, plus a pointer to the TradeData row they came from. Dashboards, the FM
+# pages and the License admin used to pick the latest TradeData per license with a sorted
+# subquery (or one query per row); they now join account_state instead.
+# The row is written on ingest: TradeData.save() (update_trade_data, admin edits) and the
+# write-behind flush (core/trade_buffer.py, which uses bulk_update) call record(); idle pushes
+# that only bump TradeData.last_update call touch(). A license reporting several MT5 accounts
+# keeps the most recently updated one, like the old order_by('-last_update').first().
+# record() is a single INSERT ... ON CONFLICT DO UPDATE ... WHERE (PostgreSQL, SQLite >= 3.24),
+# so TradeData.save() costs one extra query.
+
+STATE_FIELDS = [
+    'trade_data', 'mt5_account', 'account_balance', 'account_equity', 'account_profit',
+    'total_buy_positions', 'total_sell_positions', 'last_update',
+]
+
+
+def record(rows):
+    """
+    Copy saved TradeData rows into the state of their license, in one statement.
+    The upsert only replaces a stored state that is older or comes from the same TradeData
+    row, so concurrent writers cannot move it back to an older snapshot.
+    """
+    from django.db import connection
+    from core.models import LicenseAccountState
+
+    newest = {}
+    for row in rows:
+        current = newest.get(row.license_id)
+        if current is None or (row.last_update and current.last_update and row.last_update > current.last_update):
+            newest[row.license_id] = row
+    if not newest:
+        return 0
+
+    opts = LicenseAccountState._meta
+    fields = [opts.get_field('license')] + [opts.get_field(name) for name in STATE_FIELDS]
+    params = []
+    for license_id, row in newest.items():
+        values = [license_id, row.id] + [getattr(row, name) for name in STATE_FIELDS[1:]]
+        params.extend(field.get_db_prep_save(value, connection) for field, value in zip(fields, values))
+
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    columns = [qn(field.column) for field in fields]
+    placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    last_update, trade_data = qn(opts.get_field('last_update').column), qn(opts.get_field('trade_data').column)
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES {", ".join([placeholders] * len(newest))} '
+        f'ON CONFLICT ({columns[0]}) DO UPDATE SET '
+        + ', '.join(f'{column} = EXCLUDED.{column}' for column in columns[1:])
+        + f' WHERE {table}.{trade_data} = EXCLUDED.{trade_data} OR {table}.{last_update} IS NULL'
+        f' OR {table}.{last_update} <= EXCLUDED.{last_update}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        written = cursor.rowcount
+
+    if written < len(newest):
+        # Another MT5 account of the license (or a concurrent push) reported more recently
+        metrics.incr('account_state.stale', len(newest) - written)
+    metrics.incr('account_state.writes', written)
+    return written
+
+
+def touch(license_id, mt5_account, last_update):
+    """Bump last_update after an unchanged push rewrote only TradeData.last_update"""
+    from django.db.models import Q
+    from core.models import LicenseAccountState
+
+    return LicenseAccountState.objects.filter(
+        Q(last_update__isnull=True) | Q(last_update__lt=last_update),
+        license_id=license_id, mt5_account=mt5_account,
+    ).update(last_update=last_update)
+
+
+def get_state(license):
+    """The license's LicenseAccountState, or None before its first trade push"""
+    return getattr(license, 'account_state', None)
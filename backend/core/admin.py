@@ -9,7 +9,7 @@ from django.utils import timezone
 from decimal import Decimal
 from django.db.models import F
 from .models import (
-    SubscriptionPlan, License, LicenseVerificationLog, EASettings, TradeData, EAControlSettings,
+    SubscriptionPlan, License, LicenseVerificationLog, EASettings, TradeData, ClosedPosition, EAControlSettings,
     EAProduct, Referral, ReferralAttribution, ReferralTransaction, ReferralPayout,
     TradeCommand, EAActionLog, SiteSettings, PaymentNetwork, LicensePurchaseRequest,
     SMTPSettings, EmailPreference, PayoutMethod,
@@ -19,6 +19,8 @@ from .models import (
     VPSPlan, VPSOrder, VPSServer, VPSDiscount,
     GuidelineCategory, GuidelineVideo, GiftLicense
 )
+from .fm_access import invalidate_fm, invalidate_members
+from .license_cache import invalidate_license
 
 
 # Unregister default User admin and register with search
@@ -38,7 +40,11 @@ class CustomUserAdmin(UserAdmin):
             LicensePurchaseRequest.objects.filter(reviewed_by=obj).update(reviewed_by=None)
         except Exception:
             pass
+        license_keys = list(License.objects.filter(user=obj).values_list('license_key', flat=True))
+        fm_ids = list(FundManager.objects.filter(user=obj).values_list('id', flat=True))
         super().delete_model(request, obj)
+        invalidate_license(*license_keys)
+        invalidate_fm(*fm_ids)
     
     def delete_queryset(self, request, queryset):
         """Safe bulk delete: clear related references first"""
@@ -47,7 +53,11 @@ class CustomUserAdmin(UserAdmin):
             LicensePurchaseRequest.objects.filter(reviewed_by__in=queryset).update(reviewed_by=None)
         except Exception:
             pass
+        license_keys = list(License.objects.filter(user__in=queryset).values_list('license_key', flat=True))
+        fm_ids = list(FundManager.objects.filter(user__in=queryset).values_list('id', flat=True))
         super().delete_queryset(request, queryset)
+        invalidate_license(*license_keys)
+        invalidate_fm(*fm_ids)
 
 
 @admin.register(SubscriptionPlan)
@@ -943,6 +953,7 @@ class LicenseAdmin(admin.ModelAdmin):
     autocomplete_fields = ['user', 'plan']
     radio_fields = {'status': admin.HORIZONTAL}
     inlines = [EASettingsInline, TradeDataInline]
+    list_select_related = ['user', 'plan', 'account_state']
     
     fieldsets = (
         ('🔑 License Info', {'fields': ('user', 'plan', 'license_key', 'status')}),
@@ -988,8 +999,8 @@ class LicenseAdmin(admin.ModelAdmin):
     status_display.short_description = 'Status'
 
     def _get_trade_data(self, obj):
-        """Get the latest TradeData row for this license."""
-        return obj.trade_data.order_by('-last_update').first()
+        """Current account state of this license (joined by list_select_related)."""
+        return getattr(obj, 'account_state', None)
 
     def balance_display(self, obj):
         td = self._get_trade_data(obj)
@@ -1060,7 +1071,9 @@ class LicenseAdmin(admin.ModelAdmin):
             LicensePurchaseRequest.objects.filter(issued_license__in=queryset).update(issued_license=None)
         except Exception:
             pass
+        license_keys = list(queryset.values_list('license_key', flat=True))
         super().delete_queryset(request, queryset)
+        invalidate_license(*license_keys)
 
 
 @admin.register(LicenseVerificationLog)
@@ -1226,6 +1239,21 @@ class TradeDataAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(ClosedPosition)
+class ClosedPositionAdmin(admin.ModelAdmin):
+    list_display = ['ticket', 'license', 'symbol', 'type', 'lots', 'profit', 'close_time']
+    list_filter = ['type', 'symbol']
+    search_fields = ['license__license_key', 'mt5_account', 'ticket']
+    list_select_related = ['license']
+    date_hierarchy = 'close_time'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 class EAProductForm(forms.ModelForm):
     notify_all_users = forms.BooleanField(
         required=False,
@@ -1680,16 +1708,23 @@ class FundManagerAdmin(admin.ModelAdmin):
     list_filter = ['status', 'tier', 'is_verified', 'is_featured']
     search_fields = ['display_name', 'user__email', 'user__username', 'trading_pairs']
     list_editable = ['status', 'tier', 'is_verified', 'is_featured']
-    readonly_fields = ['average_rating', 'total_reviews', 'created_at', 'updated_at']
+    readonly_fields = ['average_rating', 'total_reviews', 'active_subscribers', 'managed_accounts', 'managed_balance', 'stats_updated_at', 'created_at', 'updated_at']
     fieldsets = (
         ('Profile', {'fields': ('user', 'display_name', 'bio', 'avatar', 'tier')}),
         ('Pricing', {'fields': ('monthly_price', 'platform_commission_percent', 'trial_days')}),
         ('Performance', {'fields': ('total_profit_percent', 'win_rate', 'months_active', 'average_rating', 'total_reviews')}),
+        ('Marketplace Stats', {'fields': (('active_subscribers', 'managed_accounts', 'managed_balance'), 'stats_updated_at')}),
         ('Status', {'fields': ('status', 'is_verified', 'is_featured')}),
         ('Trading', {'fields': ('trading_pairs', 'trading_style', 'max_subscribers')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)}),
     )
 
+    def delete_queryset(self, request, queryset):
+        """Bulk delete skips FundManager.delete(), drop the cached chat access here"""
+        fm_ids = list(queryset.values_list('id', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_fm(*fm_ids)
+
 
 @admin.register(FMSubscription)
 class FMSubscriptionAdmin(admin.ModelAdmin):
@@ -1698,6 +1733,16 @@ class FMSubscriptionAdmin(admin.ModelAdmin):
     search_fields = ['user__email', 'fund_manager__display_name']
     readonly_fields = ['created_at', 'updated_at']
 
+    def delete_queryset(self, request, queryset):
+        """Bulk delete skips FMSubscription.delete(), revoke the cached chat access and recount here"""
+        from .fm_stats import refresh_subscribers
+
+        pairs = list(queryset.values_list('fund_manager_id', 'user_id'))
+        super().delete_queryset(request, queryset)
+        invalidate_members(pairs)
+        for fm_id in {fm_id for fm_id, _ in pairs}:
+            refresh_subscribers(fm_id)
+
 
 @admin.register(FMAccountAssignment)
 class FMAccountAssignmentAdmin(admin.ModelAdmin):
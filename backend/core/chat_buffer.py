@@ -0,0 +1,154 @@
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings as django_settings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Recent messages per FM chat room, so a socket that reconnects can resume from the last
+# message id it has instead of re-fetching the whole page (fm_views.fm_get_chat).
+# fm_views appends every message it broadcasts to fm_chat_<fm_id>; the consumers answer a
+# resume with backfill(). The buffer is a Redis list fm_chat_buffer:<fm_id> trimmed to
+# FM_CHAT_BUFFER_SIZE entries, or a deque per process without Redis (runserver/dev).
+# It always holds the newest messages of the room, so it covers a resume whenever its oldest
+# entry is not newer than the client's last id; anything older goes to the database.
+# Editing or deleting a message (admin, cascades) clears the room's buffer (connected in
+# CoreConfig.ready()), so resumes read the database until new messages fill it again; the
+# buffered copies also carry reply_to snippets of other messages. Pins are not part of the
+# buffered payload, clients get them from fm_get_chat.
+
+_TTL = 7 * 24 * 3600
+
+_lock = threading.Lock()
+_local = {}
+_client = None
+
+
+def _size():
+    return max(1, int(getattr(django_settings, 'FM_CHAT_BUFFER_SIZE', 200)))
+
+
+def _key(fm_id):
+    return f'fm_chat_buffer:{fm_id}'
+
+
+def _redis():
+    global _client
+    url = getattr(django_settings, 'FM_CHAT_BUFFER_REDIS_URL', '')
+    if not url:
+        return None
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(url, socket_timeout=2)
+    return _client
+
+
+def append(fm_id, msg_data):
+    """Remember a message that was just broadcast to the room"""
+    try:
+        client = _redis()
+        if client is None:
+            with _lock:
+                buffer = _local.get(str(fm_id))
+                if buffer is None:
+                    buffer = _local[str(fm_id)] = deque(maxlen=_size())
+                buffer.append(msg_data)
+            return
+        pipe = client.pipeline()
+        pipe.rpush(_key(fm_id), json.dumps(msg_data))
+        pipe.ltrim(_key(fm_id), -_size(), -1)
+        pipe.expire(_key(fm_id), _TTL)
+        pipe.execute()
+    except Exception:
+        logger.exception('Chat buffer append failed for FM %s', fm_id)
+        # A gap in the list would hide this message from resumes, send them to the DB instead
+        try:
+            clear(fm_id)
+        except Exception:
+            pass
+
+
+def clear(fm_id):
+    client = _redis()
+    if client is None:
+        with _lock:
+            _local.pop(str(fm_id), None)
+    else:
+        client.delete(_key(fm_id))
+
+
+def _on_message_change(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) <= {'is_pinned'}):
+        return
+    try:
+        from core.models import FMChatRoom
+        fm_id = FMChatRoom.objects.filter(id=instance.chat_room_id).values_list('fund_manager_id', flat=True).first()
+        if fm_id is not None:
+            clear(fm_id)
+    except Exception:
+        logger.exception('Chat buffer clear failed for room %s', instance.chat_room_id)
+
+
+def connect():
+    """Clear a room's buffer when one of its messages is edited or deleted (called from CoreConfig.ready())"""
+    from django.db.models.signals import post_delete, post_save
+    from core.models import FMChatMessage
+
+    post_save.connect(_on_message_change, sender=FMChatMessage, dispatch_uid='chat_buffer_save')
+    post_delete.connect(_on_message_change, sender=FMChatMessage, dispatch_uid='chat_buffer_delete')
+
+
+def recent(fm_id):
+    """Buffered messages of the room, oldest first"""
+    client = _redis()
+    if client is None:
+        with _lock:
+            items = list(_local.get(str(fm_id), ()))
+    else:
+        items = [json.loads(raw) for raw in client.lrange(_key(fm_id), 0, -1)]
+    # Concurrent senders may push slightly out of order
+    return sorted(items, key=lambda m: m['id'])
+
+
+def backfill(fm_id, after_id, limit=None):
+    """(messages newer than after_id oldest first, complete)
+
+    complete is False when more than limit messages were missed, the client should then
+    load the chat page again instead.
+    """
+    limit = limit or _size()
+    try:
+        buffered = recent(fm_id)
+    except Exception:
+        logger.exception('Chat buffer read failed for FM %s', fm_id)
+        buffered = []
+    if buffered and buffered[0]['id'] <= after_id:
+        metrics.incr('chat_buffer.hit')
+        return [m for m in buffered if m['id'] > after_id][:limit], True
+    metrics.incr('chat_buffer.miss')
+    return messages_after(fm_id, after_id, limit)
+
+
+def messages_after(fm_id, after_id, limit):
+    """Database fallback for backfill()"""
+    from core.fm_access import get_access
+    from core.fm_views import serialize_chat_message
+    from core.models import FMChatMessage
+
+    fm, _ = get_access(fm_id, None)
+    if fm is None:
+        return [], True
+    fm_user_id = fm['user_id']
+    rows = list(
+        FMChatMessage.objects.filter(chat_room__fund_manager_id=fm_id, id__gt=after_id)
+        .select_related('sender', 'reply_to__sender')
+        .order_by('id')[:limit + 1]
+    )
+    if len(rows) > limit:
+        return [], False
+    return [serialize_chat_message(m, fm_user_id) for m in rows], True
+
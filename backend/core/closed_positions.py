@@ -0,0 +1,151 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from core import metrics
+
+# Closed trades live in the ClosedPosition table (one row per ticket). The EA re-sends the
+# deals closed in the last 24h on every push, so ingest is an insert that ignores tickets
+# already stored, and the dashboard reads a bounded window ordered by close time.
+
+# EA sends TimeToString(t, TIME_DATE|TIME_MINUTES) in broker time; stored as-is in UTC
+CLOSE_TIME_FORMAT = '%Y.%m.%d %H:%M'
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def parse_close_time(value):
+    if not value:
+        return None
+    for fmt in (CLOSE_TIME_FORMAT, '%Y.%m.%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value if value is not None else 0))
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def build_closed_position(license_id, mt5_account, position):
+    """Map one EA closed_positions entry onto an unsaved ClosedPosition (None if it has no ticket)"""
+    from core.models import ClosedPosition
+
+    try:
+        ticket = int(position.get('ticket'))
+    except (TypeError, ValueError):
+        return None
+    return ClosedPosition(
+        license_id=license_id,
+        mt5_account=mt5_account or '',
+        ticket=ticket,
+        symbol=str(position.get('symbol') or '')[:20],
+        type=str(position.get('type') or '')[:10],
+        lots=_decimal(position.get('lots')),
+        open_price=_decimal(position.get('open_price')),
+        close_price=_decimal(position.get('close_price')),
+        profit=_decimal(position.get('profit')),
+        close_time=parse_close_time(position.get('close_time')),
+    )
+
+
+def record_closed_positions(items):
+    """
+    Store closed positions, skipping tickets that are already known.
+    items: iterable of (license_id, mt5_account, positions) tuples.
+    """
+    from core.models import ClosedPosition
+
+    objs = []
+    seen = set()
+    for license_id, mt5_account, positions in items:
+        for position in positions or []:
+            obj = build_closed_position(license_id, mt5_account, position)
+            if obj is None:
+                continue
+            key = (obj.license_id, obj.mt5_account, obj.ticket)
+            if key in seen:
+                continue
+            seen.add(key)
+            objs.append(obj)
+    if not objs:
+        return 0
+    ClosedPosition.objects.bulk_create(objs, batch_size=500, ignore_conflicts=True)
+    metrics.incr('closed_positions.received', len(objs))
+    return len(objs)
+
+
+def record_if_changed(license_id, mt5_account, positions):
+    """
+    record_closed_positions() for one push, skipped when the push carries the same tickets
+    as the last one stored for this account (the EA re-sends its 24h window every time)
+    """
+    import hashlib
+    from django.core.cache import cache
+
+    tickets = sorted(str(p.get('ticket')) for p in positions or [] if isinstance(p, dict))
+    if not tickets:
+        return 0
+    key = f'closed_seen:{license_id}:{mt5_account or ""}'
+    digest = hashlib.sha1(','.join(tickets).encode()).hexdigest()
+    try:
+        if cache.get(key) == digest:
+            metrics.incr('closed_positions.unchanged')
+            return 0
+    except Exception:
+        pass
+    written = record_closed_positions([(license_id, mt5_account, positions)])
+    try:
+        cache.set(key, digest, 24 * 3600)
+    except Exception:
+        pass
+    return written
+
+
+def serialize_closed_position(obj):
+    """Same shape the EA sends (and the dashboard has always rendered)"""
+    return {
+        'ticket': obj.ticket,
+        'symbol': obj.symbol,
+        'type': obj.type,
+        'lots': float(obj.lots),
+        'open_price': float(obj.open_price),
+        'close_price': float(obj.close_price),
+        'profit': float(obj.profit),
+        'close_time': obj.close_time.astimezone(dt_timezone.utc).strftime(CLOSE_TIME_FORMAT) if obj.close_time else '',
+    }
+
+
+def get_closed_positions(license, mt5_account='', limit=DEFAULT_LIMIT, before_ticket=None):
+    """
+    Return (positions, total, next_cursor) for a license/account, newest first.
+    Pass the previous next_cursor as before_ticket to get the next page.
+    """
+    from django.db.models import F, Q
+    from core.models import ClosedPosition
+
+    qs = ClosedPosition.objects.filter(license=license, mt5_account=mt5_account or '')
+    total = qs.count()
+
+    # Newest first, deals without a close time last (matches closedpos_account_time_nl_idx)
+    page = qs
+    if before_ticket:
+        anchor = list(qs.filter(ticket=before_ticket).values_list('close_time', flat=True)[:1])
+        if anchor and anchor[0] is not None:
+            page = qs.filter(
+                Q(close_time__lt=anchor[0]) | Q(close_time=anchor[0], ticket__lt=before_ticket)
+                | Q(close_time__isnull=True)
+            )
+        elif anchor:
+            page = qs.filter(close_time__isnull=True, ticket__lt=before_ticket)
+        else:
+            page = qs.filter(ticket__lt=before_ticket)
+
+    rows = list(page.order_by(F('close_time').desc(nulls_last=True), '-ticket')[:limit + 1])
+    next_cursor = rows[limit - 1].ticket if len(rows) > limit else None
+    return [serialize_closed_position(r) for r in rows[:limit]], total, next_cursor
@@ -1,43 +1,260 @@
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
+from .presence import PresenceMixin, license_key_name, owner_key_name
+from .trade_broadcast import TradeFrameMixin, license_group, owner_group, stored_payloads
+
 
-class TradeConsumer(AsyncWebsocketConsumer):
+class TradeConsumer(PresenceMixin, TradeFrameMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for single license trade data updates."""
 
     async def connect(self):
         self.license_key = self.scope['url_route']['kwargs']['license_key']
-        self.group_name = f'trade_{self.license_key}'
+        self.group_name = license_group(self.license_key)
+        self.setup_frames()
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.watch(license_key_name(self.license_key))
         await self.accept()
+        if self.diff_mode:
+            for payload in await database_sync_to_async(stored_payloads)(license_keys=[self.license_key]):
+                await self.send_snapshot(payload['license_key'], payload)
 
     async def disconnect(self, close_code):
+        self.stop_frames()
+        await self.stop_presence()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
-    async def receive(self, text_data):
-        pass
-
-    async def trade_update(self, event):
-        await self.send(text_data=json.dumps(event['data']))
+    async def receive(self, text_data=None, bytes_data=None):
+        await self.handle_frame_message(text_data)
 
 
-class AllTradesConsumer(AsyncWebsocketConsumer):
+class AllTradesConsumer(PresenceMixin, TradeFrameMixin, AsyncWebsocketConsumer):
     """WebSocket consumer for all-licenses trade data overview by user email."""
 
     async def connect(self):
         self.email = self.scope['url_route']['kwargs']['email']
-        self.group_name = f'trades_all_{self.email.replace("@", "_at_").replace(".", "_")}'
+        self.setup_frames()
 
-        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        # Owner groups are per user id, join those of every account with this email
+        owner_ids = await database_sync_to_async(self._owner_ids)()
+        self.group_names = [owner_group(user_id) for user_id in owner_ids]
+        for group in self.group_names:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.watch(*(owner_key_name(user_id) for user_id in owner_ids))
         await self.accept()
+        if self.diff_mode:
+            for payload in await database_sync_to_async(stored_payloads)(owner_ids=owner_ids):
+                await self.send_snapshot(payload['license_key'], payload)
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        self.stop_frames()
+        await self.stop_presence()
+        for group in getattr(self, 'group_names', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        await self.handle_frame_message(text_data)
+
+    def _owner_ids(self):
+        from django.contrib.auth.models import User
+        return list(User.objects.filter(email=self.email).values_list('id', flat=True))
+
+
+class DashboardConsumer(PresenceMixin, TradeFrameMixin, AsyncWebsocketConsumer):
+    """
+    One authenticated socket per dashboard tab, multiplexing trade and FM chat topics.
+    Connect with ?token=<user.ws_token from login>, then send:
+      {"type": "subscribe" | "unsubscribe", "topics": ["trade:<license_key>", "trades:all", "fm_chat:<fm_id>"]}
+      {"type": "resync", "license_key": K}, {"type": "typing", "fm_id": N, "is_typing": true}, {"type": "ping"}
+      {"type": "resume", "fm_id": N, "after_id": M} (or "after": {"fm_chat:<fm_id>": M} with subscribe)
+    Trade topics use the diff protocol of core/trade_broadcast.py; FM chat events arrive as
+    {"type": ..., "fm_id": N, "data": {...}} with the same types as FMChatConsumer, plus "backfill"
+    with the messages missed since a resume (core/chat_buffer.py).
+    """
+
+    MAX_TOPICS = 50
+
+    async def connect(self):
+        from .ws_auth import user_from_token
+
+        query = parse_qs(self.scope.get('query_string', b'').decode(errors='ignore'))
+        self.user = await database_sync_to_async(user_from_token)(query.get('token', [''])[0])
+        if self.user is None:
+            # Accept first so the browser sees the 4401 code (a rejected handshake is just 1006)
+            await self.accept()
+            await self.close(code=4401)
+            return
+
+        self.setup_frames()
+        self.diff_mode = True
+        self.email = self.user.email or self.user.username
+        self.topics = set()
+        self.groups = set()
+        self.owned_keys = None
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        self.stop_frames()
+        await self.stop_presence()
+        for group in getattr(self, 'groups', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if getattr(self, 'user', None) is None:
+            return
+        try:
+            message = json.loads(text_data or '')
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        msg_type = message.get('type')
+
+        if msg_type == 'ping':
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+        elif msg_type == 'subscribe':
+            await self._subscribe(message.get('topics') or [], message.get('after') or {})
+        elif msg_type == 'unsubscribe':
+            await self._unsubscribe(message.get('topics') or [])
+        elif msg_type == 'resync':
+            await self.handle_frame_message(text_data)
+        elif msg_type == 'resume':
+            fm_id, after_id = str(message.get('fm_id', '')), message.get('after_id')
+            if f'fm_chat:{fm_id}' in self.topics and isinstance(after_id, int):
+                await self._send_backfill(int(fm_id), after_id)
+        elif msg_type == 'typing':
+            fm_id = str(message.get('fm_id', ''))
+            if f'fm_chat:{fm_id}' in self.topics:
+                await self.channel_layer.group_send(f'fm_chat_{fm_id}', {
+                    'type': 'user_typing',
+                    'fm_id': int(fm_id),
+                    'data': {'email': self.email, 'is_typing': message.get('is_typing', True)},
+                })
+
+    async def _subscribe(self, topics, after=None):
+        requested = [str(t) for t in topics if isinstance(t, (str, int))][:self.MAX_TOPICS]
+        new = [t for t in dict.fromkeys(requested) if t not in self.topics]
+        allowed, denied = await database_sync_to_async(self._authorize)(new)
+        allowed = allowed[:max(0, self.MAX_TOPICS - len(self.topics))]
+        self.topics.update(allowed)
+        await self._sync_groups()
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'topics': sorted(self.topics), 'denied': denied}))
+
+        trade_keys = [t.split(':', 1)[1] for t in allowed if t.startswith('trade:')]
+        if 'trades:all' in allowed:
+            trade_keys = None
+        if trade_keys != []:
+            payloads = await database_sync_to_async(stored_payloads)(
+                license_keys=trade_keys if trade_keys is not None else self.owned_keys
+            )
+            for payload in payloads:
+                await self.send_snapshot(payload['license_key'], payload)
+
+        for topic in allowed:
+            if topic.startswith('fm_chat:'):
+                fm_id = int(topic.split(':', 1)[1])
+                # Reconnect: {"after": {"fm_chat:<id>": <last message id>}} replays the missed messages
+                after_id = after.get(topic) if isinstance(after, dict) else None
+                if isinstance(after_id, int):
+                    await self._send_backfill(fm_id, after_id)
+                await self.channel_layer.group_send(f'fm_chat_{fm_id}', {
+                    'type': 'user_joined',
+                    'fm_id': fm_id,
+                    'data': {'email': self.email, 'message': f'{self.email} joined the chat'},
+                })
+
+    async def _unsubscribe(self, topics):
+        removed = {str(t) for t in topics} & self.topics
+        self.topics -= removed
+        await self._sync_groups()
+        # A later subscribe starts over with a snapshot
+        keys = set(self._sent_state) if 'trades:all' in removed else {t.split(':', 1)[1] for t in removed if t.startswith('trade:')}
+        for key in keys:
+            self._sent_state.pop(key, None)
+        await self.send(text_data=json.dumps({'type': 'subscribed', 'topics': sorted(self.topics), 'denied': []}))
+
+    def _authorize(self, topics):
+        """Split topics into (allowed, denied) for this user"""
+        from .fm_consumers import fm_chat_access
+        from .models import License
+
+        self.owned_keys = list(License.objects.filter(user=self.user).values_list('license_key', flat=True))
+        allowed, denied = [], []
+        for topic in topics:
+            kind, _, value = topic.partition(':')
+            if topic == 'trades:all':
+                ok = True
+            elif kind == 'trade':
+                ok = value in self.owned_keys
+            elif kind == 'fm_chat':
+                ok = value.isdigit() and fm_chat_access(int(value), self.user)
+            else:
+                ok = False
+            (allowed if ok else denied).append(topic)
+        return allowed, denied
+
+    def _wanted_groups(self):
+        groups = set()
+        all_trades = 'trades:all' in self.topics
+        if all_trades:
+            # Keyed by user id: accounts sharing an email must not see each other's trades
+            groups.add(owner_group(self.user.id))
+        for topic in self.topics:
+            kind, _, value = topic.partition(':')
+            if kind == 'trade' and not all_trades:
+                groups.add(license_group(value))
+            elif kind == 'fm_chat':
+                groups.add(f'fm_chat_{value}')
+        return groups
+
+    async def _sync_groups(self):
+        wanted = self._wanted_groups()
+        for group in wanted - self.groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        for group in self.groups - wanted:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.groups = wanted
+
+        # Presence for the ingest side (core/presence.py)
+        watching = {license_key_name(t.split(':', 1)[1]) for t in self.topics if t.startswith('trade:')}
+        if 'trades:all' in self.topics:
+            watching.add(owner_key_name(self.user.id))
+        await self.unwatch(*((self._presence_keys or set()) - watching))
+        await self.watch(*watching)
+
+    async def _send_backfill(self, fm_id, after_id):
+        from .fm_consumers import chat_backfill
+
+        messages, complete = await chat_backfill(fm_id, after_id)
+        await self.send(text_data=json.dumps({
+            'type': 'backfill',
+            'fm_id': fm_id,
+            'data': {'after_id': after_id, 'messages': messages, 'complete': complete},
+        }))
+
+    async def _chat_event(self, event):
+        await self.send(text_data=json.dumps({
+            'type': event['type'],
+            'fm_id': event.get('fm_id'),
+            'data': event['data'],
+        }))
+
+    async def chat_message(self, event):
+        await self._chat_event(event)
+
+    async def user_joined(self, event):
+        await self._chat_event(event)
+
+    async def user_typing(self, event):
+        if event['data'].get('email') != self.email:
+            await self._chat_event(event)
 
-    async def receive(self, text_data):
-        pass
+    async def fm_command(self, event):
+        await self._chat_event(event)
 
-    async def trade_update(self, event):
-        await self.send(text_data=json.dumps(event['data']))
+    async def announcement(self, event):
+        await self._chat_event(event)
@@ -0,0 +1,144 @@
+from django.conf import settings as django_settings
+from django.core.cache import cache
+
+from core import metrics
+
+# Cached access decisions for the FM chat endpoints and consumers.
+# Every chat request used to load the FundManager and run an FMSubscription exists() just to
+# learn whether the caller is the FM, a subscriber or neither. Two small entries are kept in
+# the Django cache (Redis on production) for FM_ACCESS_CACHE_TTL seconds:
+#   fm_access:fm:<fm_id>                 owner, status, display name and chat room of the FM
+#   fm_access:member:<fm_id>:<user_id>   whether the user has an active/trial subscription
+# FundManager.save()/delete(), FMChatRoom.save() and FMSubscription.save()/delete() drop
+# them, which covers subscribe, unsubscribe, cancel and admin edits. Queryset deletes skip
+# those methods, so the admin bulk deletes of FundManager and FMSubscription call
+# invalidate_fm()/invalidate_members() themselves.
+
+_MISSING = '__missing__'
+
+
+def _ttl():
+    return getattr(django_settings, 'FM_ACCESS_CACHE_TTL', 300)
+
+
+def _fm_key(fm_id):
+    return f'fm_access:fm:{fm_id}'
+
+
+def _member_key(fm_id, user_id):
+    return f'fm_access:member:{fm_id}:{user_id}'
+
+
+def _load_fm(fm_id):
+    from core.models import FundManager
+
+    row = (
+        FundManager.objects.filter(id=fm_id)
+        .values('id', 'user_id', 'status', 'display_name', 'chat_room__id', 'chat_room__name')
+        .first()
+    )
+    if row is None:
+        return None
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'approved': row['status'] == 'approved',
+        'display_name': row['display_name'],
+        'room_id': row['chat_room__id'],
+        'room_name': row['chat_room__name'] or '',
+    }
+
+
+def _load_member(fm_id, user_id):
+    from core.models import FMSubscription
+
+    return FMSubscription.objects.filter(
+        user_id=user_id, fund_manager_id=fm_id, status__in=['active', 'trial']
+    ).exists()
+
+
+def get_access(fm_id, user_id):
+    """
+    Return (fm, role) for a user and fund manager id.
+    fm is a dict (id, user_id, approved, display_name, room_id, room_name) or None if the
+    FM does not exist; role is 'fm', 'subscriber' or None (always None without a user_id).
+    """
+    try:
+        fm_id = int(fm_id)
+    except (TypeError, ValueError):
+        return None, None
+
+    ttl = _ttl()
+    fm_key, member_key = _fm_key(fm_id), _member_key(fm_id, user_id)
+    keys = [fm_key, member_key] if user_id else [fm_key]
+    cached = cache.get_many(keys) if ttl > 0 else {}
+
+    loaded = False
+    fm = cached.get(fm_key)
+    if fm is None:
+        loaded = True
+        fm = _load_fm(fm_id) or _MISSING
+        if ttl > 0:
+            cache.set(fm_key, fm, ttl)
+
+    role = None
+    if fm == _MISSING:
+        fm = None
+    elif fm['user_id'] == user_id:
+        role = 'fm'
+    elif user_id:
+        member = cached.get(member_key)
+        if member is None:
+            loaded = True
+            member = _load_member(fm_id, user_id)
+            if ttl > 0:
+                cache.set(member_key, member, ttl)
+        role = 'subscriber' if member else None
+
+    metrics.incr('fm_access.misses' if loaded else 'fm_access.hits')
+    return fm, role
+
+
+def chat_room(fm):
+    """(room_id, room_name) of the FM's chat room, created on first use"""
+    from core.models import FMChatRoom
+
+    if fm['room_id'] is not None:
+        return fm['room_id'], fm['room_name']
+    room, _ = FMChatRoom.objects.get_or_create(
+        fund_manager_id=fm['id'],
+        defaults={'name': f"{fm['display_name']}'s Community"},
+    )
+    return room.id, room.name
+
+
+def invalidate_fm(*fm_ids):
+    try:
+        cache.delete_many([_fm_key(fm_id) for fm_id in fm_ids])
+    except Exception:
+        pass
+
+
+def invalidate_member(fm_id, user_id):
+    invalidate_members([(fm_id, user_id)])
+
+
+def invalidate_members(pairs):
+    """Drop the subscriber entries of these (fm_id, user_id) pairs"""
+    try:
+        cache.delete_many([_member_key(fm_id, user_id) for fm_id, user_id in pairs])
+    except Exception:
+        pass
+
+
+def get_stats():
+    """Hit/miss counters for this worker process"""
+    counters = metrics.snapshot('fm_access.')
+    hits = counters.get('fm_access.hits', 0)
+    misses = counters.get('fm_access.misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
@@ -1,4 +1,6 @@
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
@@ -28,6 +30,11 @@ class FMChatConsumer(AsyncWebsocketConsumer):
         )
         await self.accept()
 
+        # Reconnect: ?after_id=<last message id seen> replays only the missed messages
+        after_id = parse_qs(self.scope.get('query_string', b'').decode(errors='ignore')).get('after_id', [''])[0]
+        if after_id.isdigit():
+            await self.send_backfill(int(after_id))
+
         # Send system message that user joined
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -57,6 +64,12 @@ class FMChatConsumer(AsyncWebsocketConsumer):
                 await self.send(text_data=json.dumps({'type': 'pong'}))
                 return
             
+            if msg_type == 'resume':
+                after_id = data.get('after_id')
+                if isinstance(after_id, int):
+                    await self.send_backfill(after_id)
+                return
+
             if msg_type == 'typing':
                 await self.channel_layer.group_send(
                     self.room_group_name,
@@ -109,28 +122,35 @@ class FMChatConsumer(AsyncWebsocketConsumer):
             'data': event['data'],
         }))
 
+    async def send_backfill(self, after_id):
+        """Messages newer than after_id, complete=False means reload the chat instead"""
+        messages, complete = await chat_backfill(self.fm_id, after_id)
+        await self.send(text_data=json.dumps({
+            'type': 'backfill',
+            'data': {'after_id': after_id, 'messages': messages, 'complete': complete},
+        }))
+
     @database_sync_to_async
     def _check_access(self):
         """Check if user has access to this FM chat"""
-        from core.models import FundManager, FMSubscription
         from django.contrib.auth.models import User
         
-        try:
-            fm = FundManager.objects.get(id=self.fm_id, status='approved')
-        except FundManager.DoesNotExist:
-            return False
-        
         user = User.objects.filter(email__iexact=self.email).first()
         if not user:
             return False
-        
-        # FM always has access
-        if fm.user == user:
-            return True
-        
-        # Active subscribers have access
-        return FMSubscription.objects.filter(
-            user=user,
-            fund_manager=fm,
-            status__in=['active', 'trial']
-        ).exists()
+        return fm_chat_access(self.fm_id, user)
+
+
+def fm_chat_access(fm_id, user):
+    """Whether user may follow the chat of fund manager fm_id (the FM or an active subscriber)"""
+    from .fm_access import get_access
+
+    fm, role = get_access(fm_id, user.id)
+    return bool(fm and fm['approved'] and role)
+
+
+@database_sync_to_async
+def chat_backfill(fm_id, after_id):
+    from .chat_buffer import backfill
+
+    return backfill(fm_id, after_id)
@@ -0,0 +1,140 @@
+import logging
+from decimal import Decimal
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Stored marketplace figures of every FundManager: active subscribers, managed accounts and
+# balance (AUM), profit % and win rate. list_fund_managers, fm_leaderboard and
+# fund_manager_detail read the columns instead of counting per row.
+# refresh() recomputes them for all FMs with a few grouped queries and writes only the rows
+# whose figures changed (manage.py refresh_fm_stats, run every 5 minutes by the pm2 app
+# fm-stats in ecosystem.config.js, its first run after the deploy fills in what migration 0058
+# does not backfill).
+# FMSubscription.save()/delete() refresh the subscriber count of that FM right away and drop
+# the cached marketplace responses once it is committed (the post_save invalidation fires
+# before the recount, a read in between would cache the old count again).
+# Managed accounts and balance come from LicenseAccountState of the licenses assigned through
+# active/trial subscriptions. Profit % and win rate come from the ClosedPosition rows of those
+# licenses closed since they were assigned: profit % is their profit relative to the balance
+# before it. FMs without such closed trades keep their stored profit % and win rate.
+
+LIVE_STATUSES = ['active', 'trial']
+STATS_FIELDS = [
+    'active_subscribers', 'managed_accounts', 'managed_balance', 'total_profit_percent', 'win_rate',
+]
+
+
+def _subscriber_counts():
+    from django.db.models import Count
+    from core.models import FMSubscription
+
+    rows = (
+        FMSubscription.objects.filter(status__in=LIVE_STATUSES)
+        .values('fund_manager_id')
+        .annotate(n=Count('id'))
+    )
+    return {row['fund_manager_id']: row['n'] for row in rows}
+
+
+def _managed_accounts():
+    from django.db.models import Count, Sum
+    from core.models import FMAccountAssignment
+
+    rows = (
+        FMAccountAssignment.objects.filter(
+            subscription__status__in=LIVE_STATUSES, license__account_state__isnull=False
+        )
+        .values('subscription__fund_manager_id')
+        .annotate(n=Count('id'), balance=Sum('license__account_state__account_balance'))
+    )
+    return {row['subscription__fund_manager_id']: (row['n'], row['balance'] or Decimal('0.00')) for row in rows}
+
+
+def _closed_trades():
+    from django.db.models import Count, F, Q, Sum
+    from core.models import ClosedPosition
+
+    rows = (
+        ClosedPosition.objects.filter(
+            license__fm_assignments__subscription__status__in=LIVE_STATUSES,
+            close_time__gte=F('license__fm_assignments__assigned_at'),
+        )
+        .values('license__fm_assignments__subscription__fund_manager_id')
+        .annotate(n=Count('id'), wins=Count('id', filter=Q(profit__gt=0)), profit=Sum('profit'))
+    )
+    return {
+        row['license__fm_assignments__subscription__fund_manager_id']: (row['n'], row['wins'], row['profit'] or Decimal('0'))
+        for row in rows
+    }
+
+
+def _values(fm, subscribers, managed, trades):
+    accounts, balance = managed.get(fm.id, (0, Decimal('0.00')))
+    values = {
+        'active_subscribers': subscribers.get(fm.id, 0),
+        'managed_accounts': accounts,
+        'managed_balance': balance,
+        'total_profit_percent': fm.total_profit_percent,
+        'win_rate': fm.win_rate,
+    }
+    count, wins, profit = trades.get(fm.id, (0, 0, Decimal('0')))
+    if count:
+        values['win_rate'] = (Decimal(wins) * 100 / count).quantize(Decimal('0.01'))
+        start_balance = balance - profit
+        values['total_profit_percent'] = (
+            (profit * 100 / start_balance).quantize(Decimal('0.01')) if start_balance > 0 else Decimal('0.00')
+        )
+    return values
+
+
+def refresh():
+    """Recompute the stored stats of all FMs, returns the number of rows updated"""
+    from core.models import FundManager
+
+    started = timezone.now()
+    subscribers = _subscriber_counts()
+    managed = _managed_accounts()
+    trades = _closed_trades()
+
+    changed = []
+    for fm in FundManager.objects.only('id', *STATS_FIELDS):
+        values = _values(fm, subscribers, managed, trades)
+        if any(getattr(fm, name) != value for name, value in values.items()):
+            for name, value in values.items():
+                setattr(fm, name, value)
+            fm.stats_updated_at = started
+            changed.append(fm)
+    FundManager.objects.bulk_update(changed, STATS_FIELDS + ['stats_updated_at'], batch_size=200)
+    if changed:
+        # bulk_update sends no post_save, drop the cached marketplace responses here
+        from core.response_cache import invalidate
+        invalidate('fund_managers')
+    return len(changed)
+
+
+def refresh_subscribers(fm_id):
+    """Recount the active/trial subscribers of one FM (after a subscription changed)"""
+    from django.db.models import Count, IntegerField, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+    from core.models import FMSubscription, FundManager
+
+    count = (
+        FMSubscription.objects.filter(fund_manager_id=OuterRef('pk'), status__in=LIVE_STATUSES)
+        .values('fund_manager_id')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    try:
+        FundManager.objects.filter(id=fm_id).update(
+            active_subscribers=Coalesce(Subquery(count, output_field=IntegerField()), 0)
+        )
+    except Exception:
+        logger.exception('Subscriber recount failed for FM %s', fm_id)
+        return
+
+    from django.db import transaction
+    from core.response_cache import invalidate
+    transaction.on_commit(lambda: invalidate('fund_managers'))
+
@@ -15,6 +15,9 @@ from core.models import (
     EconomicEvent, TradingWaveAlert, License, TradeData, TradeCommand,
     EAControlSettings
 )
+from core.license_cache import get_license, invalidate_license, invalidate_license_ids
+from core import account_state, chat_buffer, fm_access, mail_queue, user_resolver
+from core.response_cache import cached_response
 
 
 # ============================================================
@@ -23,25 +26,7 @@ from core.models import (
 
 def _resolve_user(identifier):
     """Resolve a user from email or username"""
-    if not identifier:
-        return None
-    identifier = identifier.strip()
-    email_qs = User.objects.filter(email__iexact=identifier)
-    username_qs = User.objects.filter(username__iexact=identifier).exclude(id__in=email_qs.values('id'))
-    ids = list(email_qs.values_list('id', flat=True)) + list(username_qs.values_list('id', flat=True))
-    if not ids:
-        return None
-
-    # Prefer the account that actually has licenses/subscriptions (handles legacy duplicate users in production).
-    return (
-        User.objects.filter(id__in=ids)
-        .annotate(
-            license_count=Count('licenses', distinct=True),
-            fm_sub_count=Count('fm_subscriptions', distinct=True),
-        )
-        .order_by('-license_count', '-fm_sub_count', '-id')
-        .first()
-    )
+    return user_resolver.resolve_user(identifier)
 
 
 def _get_fm_from_user(user):
@@ -110,6 +95,7 @@ def _send_fm_email(to_email, subject, heading, body_lines, cta_text=None, cta_ur
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('fund_managers')
 def list_fund_managers(request):
     """List all approved fund managers for the marketplace"""
     fms = FundManager.objects.filter(status='approved').select_related('user')
@@ -119,7 +105,7 @@ def list_fund_managers(request):
     if sort == 'rating':
         fms = fms.order_by('-average_rating', '-total_reviews')
     elif sort == 'subscribers':
-        fms = fms.annotate(sub_count=Count('subscriptions', filter=Q(subscriptions__status__in=['active', 'trial']))).order_by('-sub_count')
+        fms = fms.order_by('-active_subscribers')
     elif sort == 'price_low':
         fms = fms.order_by('monthly_price')
     elif sort == 'price_high':
@@ -151,7 +137,7 @@ def list_fund_managers(request):
             'months_active': fm.months_active,
             'average_rating': str(fm.average_rating),
             'total_reviews': fm.total_reviews,
-            'subscriber_count': fm.subscriber_count,
+            'subscriber_count': fm.active_subscribers,
             'is_verified': fm.is_verified,
             'is_featured': fm.is_featured,
             'trading_pairs': fm.trading_pairs,
@@ -182,20 +168,6 @@ def fund_manager_detail(request, fm_id):
         'created_at': r.created_at.isoformat(),
     } for r in reviews]
     
-    # Get aggregate stats from managed accounts
-    managed_accounts = FMAccountAssignment.objects.filter(
-        subscription__fund_manager=fm,
-        subscription__status__in=['active', 'trial']
-    ).select_related('license')
-    
-    total_balance = Decimal('0.00')
-    total_accounts = 0
-    for acc in managed_accounts:
-        td = acc.license.trade_data.order_by('-last_update').first()
-        if td:
-            total_balance += td.account_balance
-            total_accounts += 1
-    
     # Get schedules
     schedules = fm.schedules.filter(is_active=True)
     schedules_data = [{
@@ -219,9 +191,9 @@ def fund_manager_detail(request, fm_id):
         'months_active': fm.months_active,
         'average_rating': str(fm.average_rating),
         'total_reviews': fm.total_reviews,
-        'subscriber_count': fm.subscriber_count,
-        'total_managed_accounts': total_accounts,
-        'total_managed_balance': str(total_balance),
+        'subscriber_count': fm.active_subscribers,
+        'total_managed_accounts': fm.managed_accounts,
+        'total_managed_balance': str(fm.managed_balance),
         'is_verified': fm.is_verified,
         'is_featured': fm.is_featured,
         'trading_pairs': fm.trading_pairs,
@@ -494,6 +466,7 @@ def unsubscribe_from_fm(request):
             id__in=affected_license_ids,
             status='suspended',
         ).exclude(expires_at__lt=now).update(status='active', updated_at=now)
+        invalidate_license_ids(affected_license_ids)
 
     # Send email notifications
     _send_fm_email(
@@ -567,6 +540,7 @@ def fm_cancel_subscriber(request):
             id__in=affected_license_ids,
             status='suspended',
         ).exclude(expires_at__lt=now).update(status='active', updated_at=now)
+        invalidate_license_ids(affected_license_ids)
 
     return JsonResponse({'success': True, 'message': f'Subscription for {sub.user.email} has been cancelled.'})
 
@@ -794,8 +768,21 @@ def fm_dashboard(request):
     if not fm:
         return JsonResponse({'success': False, 'error': 'Not a fund manager'}, status=403)
     
-    # Get all active subscriptions with assignments
-    subs = fm.subscriptions.filter(status__in=['active', 'trial']).select_related('user')
+    # Assembled from a fixed set of queries whatever the subscriber count: subscriptions
+    # (+ user), their assignments (+ license, its account state and the TradeData row it
+    # points to), and the subscribers that are approved FMs themselves
+    from django.db.models import Prefetch
+
+    assignments_qs = FMAccountAssignment.objects.select_related('license__account_state__trade_data')
+    subs = list(
+        fm.subscriptions.filter(status__in=['active', 'trial'])
+        .select_related('user')
+        .prefetch_related(Prefetch('assigned_accounts', queryset=assignments_qs))
+    )
+    subscriber_fms = {
+        sub_fm.user_id: sub_fm
+        for sub_fm in FundManager.objects.filter(user_id__in=[sub.user_id for sub in subs], status='approved')
+    }
     
     subscribers = []
     total_balance = Decimal('0.00')
@@ -803,13 +790,13 @@ def fm_dashboard(request):
     total_profit = Decimal('0.00')
     
     for sub in subs:
-        assignments = sub.assigned_accounts.select_related('license')
         accounts = []
-        for a in assignments:
-            td = a.license.trade_data.order_by('-last_update').first()
+        for a in sub.assigned_accounts.all():
+            state = account_state.get_state(a.license)
+            td = state.trade_data if state else None
             acc_data = {
                 'assignment_id': a.id,
-                'license_id': a.license.id,
+                'license_id': a.license_id,
                 'mt5_account': a.license.mt5_account,
                 'is_ea_active': a.is_ea_active,
                 'last_toggled_reason': a.last_toggled_reason,
@@ -835,7 +822,7 @@ def fm_dashboard(request):
             accounts.append(acc_data)
         
         # Check if this subscriber is also an approved FM
-        sub_fm = FundManager.objects.filter(user=sub.user, status='approved').first()
+        sub_fm = subscriber_fms.get(sub.user_id)
         subscribers.append({
             'subscription_id': sub.id,
             'user_email': sub.user.email,
@@ -860,7 +847,7 @@ def fm_dashboard(request):
     } for c in recent_commands]
     
     # Earnings summary
-    total_active_subs = subs.filter(status='active').count()
+    total_active_subs = sum(1 for sub in subs if sub.status == 'active')
     monthly_revenue = total_active_subs * fm.monthly_price
     platform_fee = monthly_revenue * fm.platform_commission_percent / 100
     net_earnings = monthly_revenue - platform_fee
@@ -879,9 +866,9 @@ def fm_dashboard(request):
                 'avatar_url': fm.avatar.url if fm.avatar else None,
             },
             'stats': {
-                'total_subscribers': subs.count(),
+                'total_subscribers': len(subs),
                 'active_subscribers': total_active_subs,
-                'trial_subscribers': subs.filter(status='trial').count(),
+                'trial_subscribers': sum(1 for sub in subs if sub.status == 'trial'),
                 'total_managed_balance': str(total_balance),
                 'total_managed_equity': str(total_equity),
                 'total_managed_profit': str(total_profit),
@@ -934,97 +921,98 @@ def fm_toggle_ea(request):
     
     new_state = action == 'ea_on'
     now = timezone.now()
-    
-    if target == 'all':
-        # Toggle all assigned accounts
+    toggle_reason = reason or ('EA enabled by FM' if new_state else 'EA disabled by FM')
+    tc_type = 'EA_ON' if action == 'ea_on' else 'EA_OFF'
+    tc_reason = reason or ('FM enabled EA' if action == 'ea_on' else 'FM disabled EA')
+
+    from django.db import transaction
+    from core.models import TradeCommand
+    from core.trade_commands import notify_new_command
+
+    # One transaction with set-based writes: the targeted assignments are read once, then
+    # one UPDATE each for assignments and licenses and one bulk_create of TradeCommands.
+    # Cache invalidation, EA wake-ups, the chat broadcast and emails run after commit.
+    with transaction.atomic():
         assignments = FMAccountAssignment.objects.filter(
             subscription__fund_manager=fm,
             subscription__status__in=['active', 'trial']
         )
-        affected = assignments.update(
+        if target == 'all':
+            target_type = 'all'
+            target_assignment = None
+        else:
+            target_type = 'specific'
+            target_assignment = assignments.filter(id=target).first() if str(target).isdigit() else None
+            if target_assignment is None:
+                return JsonResponse({'success': False, 'error': 'Account assignment not found'}, status=404)
+            assignments = assignments.filter(id=target_assignment.id)
+
+        rows = list(assignments.values_list(
+            'id', 'license_id', 'license__license_key', 'subscription__user_id', 'subscription__user__email'
+        ))
+        assignment_ids = [row[0] for row in rows]
+        license_ids = list(dict.fromkeys(row[1] for row in rows))
+        affected = FMAccountAssignment.objects.filter(id__in=assignment_ids).update(
             is_ea_active=new_state,
             last_toggled_at=now,
-            last_toggled_reason=reason or ('EA enabled by FM' if new_state else 'EA disabled by FM')
+            last_toggled_reason=toggle_reason,
         )
         # Also update the actual License status for all affected licenses
-        affected_license_ids = list(assignments.values_list('license_id', flat=True))
         if new_state:
             # FM starting: re-activate suspended licenses (only if not expired)
             License.objects.filter(
-                id__in=affected_license_ids, status='suspended'
+                id__in=license_ids, status='suspended'
             ).exclude(expires_at__lt=now).update(status='active', updated_at=now)
         else:
             # FM stopping: suspend active licenses
             License.objects.filter(
-                id__in=affected_license_ids, status='active'
+                id__in=license_ids, status='active'
             ).update(status='suspended', updated_at=now)
-        target_type = 'all'
-        target_assignment = None
-    else:
-        # Toggle specific account
-        try:
-            assignment = FMAccountAssignment.objects.get(
-                id=target,
-                subscription__fund_manager=fm,
-                subscription__status__in=['active', 'trial']
-            )
-            assignment.is_ea_active = new_state
-            assignment.last_toggled_at = now
-            assignment.last_toggled_reason = reason or ('EA enabled by FM' if new_state else 'EA disabled by FM')
-            assignment.save()
-            # Also update the actual License status
-            lic = assignment.license
-            if new_state and lic.status == 'suspended' and lic.expires_at >= now:
-                lic.status = 'active'
-                lic.save(update_fields=['status', 'updated_at'])
-            elif not new_state and lic.status == 'active':
-                lic.status = 'suspended'
-                lic.save(update_fields=['status', 'updated_at'])
-            affected = 1
-            target_type = 'specific'
-            target_assignment = assignment
-        except FMAccountAssignment.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Account assignment not found'}, status=404)
-    
-    # Log command
-    cmd = FMCommand.objects.create(
-        fund_manager=fm,
-        command_type=action,
-        target_type=target_type,
-        target_assignment=target_assignment,
-        reason=reason,
-        status='executed',
-        affected_accounts=affected,
-        executed_at=now,
-    )
-    
-    # Create TradeCommand entries for each affected license so EA can poll
-    from core.models import TradeCommand
-    tc_type = 'EA_ON' if action == 'ea_on' else 'EA_OFF'
-    tc_reason = reason or ('FM enabled EA' if action == 'ea_on' else 'FM disabled EA')
-    
-    if target == 'all':
-        affected_assignments = FMAccountAssignment.objects.filter(
-            subscription__fund_manager=fm,
-            subscription__status__in=['active', 'trial']
-        ).select_related('license')
-        for a in affected_assignments:
-            TradeCommand.objects.create(
-                license=a.license,
-                command_type=tc_type,
-                parameters={'fm_id': fm.id, 'fm_name': fm.display_name, 'reason': tc_reason},
-                expires_at=now + timedelta(minutes=30),
-            )
-    else:
-        if target_assignment:
-            TradeCommand.objects.create(
-                license=target_assignment.license,
+
+        # Log command
+        cmd = FMCommand.objects.create(
+            fund_manager=fm,
+            command_type=action,
+            target_type=target_type,
+            target_assignment=target_assignment,
+            reason=reason,
+            status='executed',
+            affected_accounts=affected,
+            executed_at=now,
+        )
+
+        # TradeCommand entries for each affected license so EA can poll
+        # (bulk_create skips TradeCommand.save(), the EAs are woken up below)
+        TradeCommand.objects.bulk_create([
+            TradeCommand(
+                license_id=license_id,
                 command_type=tc_type,
                 parameters={'fm_id': fm.id, 'fm_name': fm.display_name, 'reason': tc_reason},
                 expires_at=now + timedelta(minutes=30),
             )
-    
-    # Broadcast via WebSocket to notify chat subscribers
+            for license_id in license_ids
+        ], batch_size=500)
+
+        license_keys = list(dict.fromkeys(row[2] for row in rows))
+        recipients = list({row[3]: row[4] for row in rows if row[4]}.values())
+        transaction.on_commit(lambda: invalidate_license(*license_keys))
+        transaction.on_commit(lambda: notify_new_command(*license_ids))
+        transaction.on_commit(lambda: _broadcast_fm_command(fm, action, tc_reason, affected, now))
+        transaction.on_commit(lambda: _notify_toggle_subscribers(fm, new_state, tc_reason, recipients))
+
+    return JsonResponse({
+        'success': True,
+        'command': {
+            'id': cmd.id,
+            'action': action,
+            'affected_accounts': affected,
+            'reason': reason,
+        }
+    })
+
+
+def _broadcast_fm_command(fm, action, reason, affected, now):
+    """Notify the FM chat room that the EAs were toggled"""
     try:
         from channels.layers import get_channel_layer
         from asgiref.sync import async_to_sync
@@ -1033,9 +1021,10 @@ def fm_toggle_ea(request):
             f'fm_chat_{fm.id}',
             {
                 'type': 'fm_command',
+                'fm_id': fm.id,
                 'data': {
                     'command_type': action,
-                    'reason': tc_reason,
+                    'reason': reason,
                     'affected_accounts': affected,
                     'fm_name': fm.display_name,
                     'timestamp': now.isoformat(),
@@ -1045,63 +1034,42 @@ def fm_toggle_ea(request):
     except Exception:
         pass  # Non-critical if WebSocket broadcast fails
 
-    # Send email notifications to affected subscribers
-    try:
-        if target == 'all':
-            notify_assignments = FMAccountAssignment.objects.filter(
-                subscription__fund_manager=fm,
-                subscription__status__in=['active', 'trial']
-            ).select_related('subscription__user')
-        else:
-            notify_assignments = [target_assignment] if target_assignment else []
-
-        notified_users = set()
-        for a in notify_assignments:
-            sub_user = a.subscription.user
-            if sub_user.id in notified_users:
-                continue
-            notified_users.add(sub_user.id)
-            if new_state:
-                _send_fm_email(
-                    to_email=sub_user.email,
-                    subject=f'Your Robot Has Been Started by {fm.display_name}',
-                    heading='Robot Started by Fund Manager',
-                    body_lines=[
-                        f'Your fund manager <strong>{fm.display_name}</strong> has <strong>started your robot</strong>.',
-                        f'Reason: {tc_reason}',
-                        'Your MT5 EA is now active and trading will resume automatically.',
-                        'If you have any concerns, please contact your fund manager via the FM chat.',
-                    ],
-                    cta_text='View Dashboard',
-                    cta_url='/dashboard',
-                )
-            else:
-                _send_fm_email(
-                    to_email=sub_user.email,
-                    subject=f'Your Robot Has Been Stopped by {fm.display_name}',
-                    heading='Robot Stopped by Fund Manager',
-                    body_lines=[
-                        f'Your fund manager <strong>{fm.display_name}</strong> has <strong>stopped your robot</strong>.',
-                        f'Reason: {tc_reason}',
-                        'Your MT5 EA has been paused. No new trades will be opened until the robot is restarted.',
-                        'If you have concerns or wish to unsubscribe, you can do so from the FM Engine page.',
-                    ],
-                    cta_text='View FM Engine',
-                    cta_url='/dashboard/fund-managers',
-                    extra_note='This action was taken by your fund manager as part of their trade management strategy.',
-                )
-    except Exception:
-        pass  # Email is non-critical
 
-    return JsonResponse({
-        'success': True,
-        'command': {
-            'id': cmd.id,
-            'action': action,
-            'affected_accounts': affected,
-            'reason': reason,
-        }
-    })
+def _notify_toggle_subscribers(fm, new_state, reason, recipients):
+    """
+    Email the subscribers whose robots were started/stopped, through the background mail queue
+    (core/mail_queue.py). Called after commit, the toggle itself is already pushed to the EAs.
+    """
+    display_name = fm.display_name
+    if new_state:
+        email = dict(
+            subject=f'Your Robot Has Been Started by {display_name}',
+            heading='Robot Started by Fund Manager',
+            body_lines=[
+                f'Your fund manager <strong>{display_name}</strong> has <strong>started your robot</strong>.',
+                f'Reason: {reason}',
+                'Your MT5 EA is now active and trading will resume automatically.',
+                'If you have any concerns, please contact your fund manager via the FM chat.',
+            ],
+            cta_text='View Dashboard',
+            cta_url='/dashboard',
+        )
+    else:
+        email = dict(
+            subject=f'Your Robot Has Been Stopped by {display_name}',
+            heading='Robot Stopped by Fund Manager',
+            body_lines=[
+                f'Your fund manager <strong>{display_name}</strong> has <strong>stopped your robot</strong>.',
+                f'Reason: {reason}',
+                'Your MT5 EA has been paused. No new trades will be opened until the robot is restarted.',
+                'If you have concerns or wish to unsubscribe, you can do so from the FM Engine page.',
+            ],
+            cta_text='View FM Engine',
+            cta_url='/dashboard/fund-managers',
+            extra_note='This action was taken by your fund manager as part of their trade management strategy.',
+        )
+    for to_email in recipients:
+        mail_queue.enqueue(_send_fm_email, to_email=to_email, **email)
 
 
 @csrf_exempt
@@ -1118,9 +1086,8 @@ def check_fm_ea_status(request):
     if not license_key:
         return JsonResponse({'success': False, 'error': 'License key required'}, status=400)
     
-    try:
-        lic = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    lic = get_license(license_key)
+    if lic is None:
         return JsonResponse({'success': True, 'ea_allowed': True})  # No license = no FM control
     
     # Check active FM assignments for this license
@@ -1158,10 +1125,38 @@ def check_fm_ea_status(request):
 # FM: CHAT
 # ============================================================
 
+def serialize_chat_message(m, fm_user_id, include_pinned=False):
+    """Chat message as sent to clients (also used by chat_buffer for resumes)"""
+    d = {
+        'id': m.id,
+        'sender_name': m.sender.first_name or m.sender.username,
+        'sender_email': m.sender.email,
+        'is_fm': m.sender_id == fm_user_id,
+        'message': m.message,
+        'message_type': m.message_type,
+        'image_url': m.image.url if m.image else None,
+        'voice_url': m.voice.url if m.voice else None,
+        'reply_to': {
+            'id': m.reply_to.id,
+            'sender_name': m.reply_to.sender.first_name or m.reply_to.sender.username,
+            'message': m.reply_to.message[:80],
+            'message_type': m.reply_to.message_type,
+        } if m.reply_to else None,
+        'created_at': m.created_at.isoformat(),
+    }
+    if include_pinned:
+        d['is_pinned'] = m.is_pinned
+    return d
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def fm_get_chat(request):
-    """Get chat messages for a fund manager's room"""
+    """
+    Get chat messages for a fund manager's room, newest first.
+    Pass the previous next_before_id as before_id for older messages (page=N still works,
+    it is ignored when before_id is given).
+    """
     try:
         data = json.loads(request.body)
     except json.JSONDecodeError:
@@ -1169,67 +1164,57 @@ def fm_get_chat(request):
     
     email = data.get('email', '').strip()
     fm_id = data.get('fund_manager_id')
-    page = data.get('page', 1)
     per_page = 50
+    try:
+        before_id = int(data.get('before_id') or 0) or None
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Invalid before_id'}, status=400)
+    try:
+        page = max(1, int(data.get('page') or 1))
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Invalid page'}, status=400)
     
     user = _resolve_user(email)
     if not user:
         return JsonResponse({'success': False, 'error': 'User not found'}, status=404)
     
-    try:
-        fm = FundManager.objects.get(id=fm_id)
-    except FundManager.DoesNotExist:
+    # Check access: must be FM or subscriber (cached, see core/fm_access.py)
+    fm, role = fm_access.get_access(fm_id, user.id)
+    if fm is None:
         return JsonResponse({'success': False, 'error': 'Fund manager not found'}, status=404)
-    
-    # Check access: must be FM or subscriber
-    is_fm = fm.user == user
-    is_subscriber = FMSubscription.objects.filter(
-        user=user, fund_manager=fm, status__in=['active', 'trial']
-    ).exists()
-    
-    if not is_fm and not is_subscriber:
+    if not role:
         return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
-    
-    try:
-        room = fm.chat_room
-    except FMChatRoom.DoesNotExist:
-        room = FMChatRoom.objects.create(fund_manager=fm, name=f"{fm.display_name}'s Community")
-    
-    # Get messages (newest first, paginated)
-    offset = (page - 1) * per_page
-    messages = room.messages.select_related('sender').order_by('-created_at')[offset:offset + per_page]
+    is_fm = role == 'fm'
+    room_id, room_name = fm_access.chat_room(fm)
+    
+    # Get messages (newest first). before_id seeks on the (chat_room, created_at, id) index,
+    # so every page costs the same; page=N is the old OFFSET pagination
+    qs = FMChatMessage.objects.filter(chat_room_id=room_id).select_related('sender', 'reply_to__sender')
+    if before_id:
+        anchor = qs.filter(id=before_id).values_list('created_at', flat=True).first()
+        if anchor is not None:
+            # created_at <= anchor bounds the index range, the exclude only drops ties
+            qs = qs.filter(created_at__lte=anchor).exclude(created_at=anchor, id__gte=before_id)
+        else:
+            qs = qs.filter(id__lt=before_id)
+        rows = list(qs.order_by('-created_at', '-id')[:per_page + 1])
+    else:
+        offset = (page - 1) * per_page
+        rows = list(qs.order_by('-created_at', '-id')[offset:offset + per_page + 1])
+    has_more = len(rows) > per_page
+    messages = rows[:per_page]
     
     # Get pinned messages
-    pinned = room.messages.filter(is_pinned=True).select_related('sender').order_by('-created_at')[:5]
-    
-    def _serialize_msg(m, include_pinned=False):
-        d = {
-            'id': m.id,
-            'sender_name': m.sender.first_name or m.sender.username,
-            'sender_email': m.sender.email,
-            'is_fm': m.sender == fm.user,
-            'message': m.message,
-            'message_type': m.message_type,
-            'image_url': m.image.url if m.image else None,
-            'voice_url': m.voice.url if m.voice else None,
-            'reply_to': {
-                'id': m.reply_to.id,
-                'sender_name': m.reply_to.sender.first_name or m.reply_to.sender.username,
-                'message': m.reply_to.message[:80],
-                'message_type': m.reply_to.message_type,
-            } if m.reply_to else None,
-            'created_at': m.created_at.isoformat(),
-        }
-        if include_pinned:
-            d['is_pinned'] = m.is_pinned
-        return d
-
+    pinned = FMChatMessage.objects.filter(chat_room_id=room_id, is_pinned=True).select_related('sender', 'reply_to__sender').order_by('-created_at')[:5]
+    
     return JsonResponse({
         'success': True,
-        'room_name': room.name,
+        'room_name': room_name,
         'is_fm': is_fm,
-        'messages': [_serialize_msg(m, include_pinned=True) for m in messages],
-        'pinned': [_serialize_msg(m) for m in pinned],
+        'messages': [serialize_chat_message(m, fm['user_id'], include_pinned=True) for m in messages],
+        'pinned': [serialize_chat_message(m, fm['user_id']) for m in pinned],
+        'has_more': has_more,
+        'next_before_id': messages[-1].id if has_more else None,
     })
 
 
@@ -1264,39 +1249,30 @@ def fm_send_message(request):
     if not user:
         return JsonResponse({'success': False, 'error': 'User not found'}, status=404)
     
-    try:
-        fm = FundManager.objects.get(id=fm_id)
-    except FundManager.DoesNotExist:
+    # Check access (cached, see core/fm_access.py)
+    fm, role = fm_access.get_access(fm_id, user.id)
+    if fm is None:
         return JsonResponse({'success': False, 'error': 'Fund manager not found'}, status=404)
-    
-    # Check access
-    is_fm = fm.user == user
-    is_subscriber = FMSubscription.objects.filter(
-        user=user, fund_manager=fm, status__in=['active', 'trial']
-    ).exists()
-    
-    if not is_fm and not is_subscriber:
+    if not role:
         return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    is_fm = role == 'fm'
     
     # Only FM can post announcements/signals
     if message_type in ('announcement', 'signal') and not is_fm:
         message_type = 'message'
 
+    room_id, _ = fm_access.chat_room(fm)
+
     # Reply-to
     reply_to_obj = None
     if reply_to_id:
         try:
-            reply_to_obj = FMChatMessage.objects.get(id=reply_to_id, chat_room__fund_manager=fm)
-        except FMChatMessage.DoesNotExist:
+            reply_to_obj = FMChatMessage.objects.select_related('sender').get(id=reply_to_id, chat_room_id=room_id)
+        except (FMChatMessage.DoesNotExist, ValueError):
             pass
     
-    try:
-        room = fm.chat_room
-    except FMChatRoom.DoesNotExist:
-        room = FMChatRoom.objects.create(fund_manager=fm, name=f"{fm.display_name}'s Community")
-    
     msg = FMChatMessage.objects.create(
-        chat_room=room,
+        chat_room_id=room_id,
         sender=user,
         message=message_text,
         message_type=message_type,
@@ -1322,15 +1298,17 @@ def fm_send_message(request):
     }
     
     # Broadcast via WebSocket to all connected chat clients
+    chat_buffer.append(fm['id'], msg_data)
     try:
         from channels.layers import get_channel_layer
         from asgiref.sync import async_to_sync
         channel_layer = get_channel_layer()
         event_type = 'announcement' if message_type == 'announcement' else 'chat_message'
         async_to_sync(channel_layer.group_send)(
-            f'fm_chat_{fm_id}',
+            f"fm_chat_{fm['id']}",
             {
                 'type': event_type,
+                'fm_id': fm['id'],
                 'data': msg_data,
             }
         )
@@ -1366,7 +1344,7 @@ def fm_pin_message(request):
         return JsonResponse({'success': False, 'error': 'Message not found'}, status=404)
     
     # Only FM can pin
-    if msg.chat_room.fund_manager.user != user:
+    if msg.chat_room.fund_manager.user_id != user.id:
         return JsonResponse({'success': False, 'error': 'Only the fund manager can pin messages'}, status=403)
     
     msg.is_pinned = pin
@@ -1619,6 +1597,7 @@ def apply_fund_manager(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('economic_events', ttl=60)
 def get_economic_events(request):
     """Get upcoming economic events"""
     days_ahead = int(request.GET.get('days', 7))
@@ -1653,6 +1632,7 @@ def get_economic_events(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('wave_alerts', ttl=5)
 def get_trading_wave_alert(request):
     """Get all trading wave alerts with countdown info"""
     now = timezone.now()
@@ -1688,18 +1668,17 @@ def get_trading_wave_alert(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('fund_managers')
 def fm_leaderboard(request):
     """Get fund manager leaderboard"""
     metric = request.GET.get('metric', 'profit')  # profit, rating, subscribers
     
-    fms = FundManager.objects.filter(status='approved')
+    fms = FundManager.objects.filter(status='approved').select_related('user')
     
     if metric == 'rating':
         fms = fms.order_by('-average_rating', '-total_reviews')
     elif metric == 'subscribers':
-        fms = fms.annotate(
-            sub_count=Count('subscriptions', filter=Q(subscriptions__status__in=['active', 'trial']))
-        ).order_by('-sub_count')
+        fms = fms.order_by('-active_subscribers')
     else:  # profit
         fms = fms.order_by('-total_profit_percent')
     
@@ -1723,7 +1702,7 @@ def fm_leaderboard(request):
             'total_profit_percent': str(fm.total_profit_percent),
             'win_rate': str(fm.win_rate),
             'average_rating': str(fm.average_rating),
-            'subscriber_count': fm.subscriber_count,
+            'subscriber_count': fm.active_subscribers,
             'monthly_price': str(fm.monthly_price),
             'trading_style': fm.trading_style,
             'months_active': fm.months_active,
@@ -1787,17 +1766,12 @@ def fm_chat_media_upload(request):
     if not user:
         return JsonResponse({'success': False, 'error': 'User not found'}, status=404)
 
-    try:
-        fm = FundManager.objects.get(id=fm_id)
-    except (FundManager.DoesNotExist, TypeError, ValueError):
+    fm, role = fm_access.get_access(fm_id, user.id)
+    if fm is None:
         return JsonResponse({'success': False, 'error': 'Fund manager not found'}, status=404)
-
-    is_fm = fm.user == user
-    is_subscriber = FMSubscription.objects.filter(
-        user=user, fund_manager=fm, status__in=['active', 'trial']
-    ).exists()
-    if not is_fm and not is_subscriber:
+    if not role:
         return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    is_fm = role == 'fm'
 
     # Profanity check on caption
     if caption:
@@ -1805,10 +1779,7 @@ def fm_chat_media_upload(request):
         if matched:
             return JsonResponse({'success': False, 'error': f'Your message contains a blocked word.', 'blocked': True}, status=400)
 
-    try:
-        room = fm.chat_room
-    except FMChatRoom.DoesNotExist:
-        room = FMChatRoom.objects.create(fund_manager=fm, name=f"{fm.display_name}'s Community")
+    room_id, _ = fm_access.chat_room(fm)
 
     msg = None
     if media_type == 'photo' and 'file' in request.FILES:
@@ -1819,7 +1790,7 @@ def fm_chat_media_upload(request):
         if img.size > 10 * 1024 * 1024:
             return JsonResponse({'success': False, 'error': 'Image too large. Max 10MB.'}, status=400)
         msg = FMChatMessage.objects.create(
-            chat_room=room, sender=user, message=caption,
+            chat_room_id=room_id, sender=user, message=caption,
             message_type='photo', image=img
         )
     elif media_type == 'voice' and 'file' in request.FILES:
@@ -1835,7 +1806,7 @@ def fm_chat_media_upload(request):
         if audio.size > 20 * 1024 * 1024:
             return JsonResponse({'success': False, 'error': 'Voice file too large. Max 20MB.'}, status=400)
         msg = FMChatMessage.objects.create(
-            chat_room=room, sender=user, message=caption,
+            chat_room_id=room_id, sender=user, message=caption,
             message_type='voice', voice=audio
         )
     else:
@@ -1855,13 +1826,14 @@ def fm_chat_media_upload(request):
     }
 
     # Broadcast via WebSocket
+    chat_buffer.append(fm['id'], msg_data)
     try:
         from channels.layers import get_channel_layer
         from asgiref.sync import async_to_sync
         channel_layer = get_channel_layer()
         async_to_sync(channel_layer.group_send)(
-            f'fm_chat_{fm.id}',
-            {'type': 'chat_message', 'data': msg_data}
+            f"fm_chat_{fm['id']}",
+            {'type': 'chat_message', 'fm_id': fm['id'], 'data': msg_data}
         )
     except Exception:
         pass
@@ -0,0 +1,96 @@
+import re
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+
+from core import metrics
+
+# Shared License lookup for the EA-facing endpoints.
+# Every MT5 terminal polls several endpoints every few seconds and each of them starts
+# with License.objects.get(license_key=...). The resolved License (with its plan) is kept
+# in the Django cache (Redis on production, so all workers share it) for LICENSE_CACHE_TTL
+# seconds. License.save()/delete() (after the commit), the admin and the bulk status updates
+# call invalidate_license(); SubscriptionPlan.save() drops the licenses of that plan.
+
+_KEY_PREFIX = 'license:'
+_MISSING = '__missing__'
+_MISSING_TTL = 15
+_VALID_KEY_RE = re.compile(r'^[A-Z0-9-]{1,64}$')
+
+
+def _ttl():
+    return getattr(django_settings, 'LICENSE_CACHE_TTL', 60)
+
+
+def _cache_key(license_key):
+    return f'{_KEY_PREFIX}{license_key}'
+
+
+def get_license(license_key):
+    """
+    Return the License for license_key (with plan loaded), or None if it does not exist.
+    Keys are expected to be normalized (stripped + upper-cased) by the caller.
+    """
+    from core.models import License
+
+    if not license_key or not _VALID_KEY_RE.match(license_key) or _ttl() <= 0:
+        metrics.incr('license_cache.bypass')
+        return License.objects.select_related('plan').filter(license_key=license_key).first()
+
+    key = _cache_key(license_key)
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.incr('license_cache.hits')
+        return None if cached == _MISSING else cached
+
+    metrics.incr('license_cache.misses')
+    license = License.objects.select_related('plan').filter(license_key=license_key).first()
+    if license is None:
+        cache.set(key, _MISSING, min(_MISSING_TTL, _ttl()))
+    else:
+        cache.set(key, license, _ttl())
+    return license
+
+
+def invalidate_license(*license_keys):
+    """Drop cached entries for the given license keys"""
+    keys = [_cache_key(k) for k in license_keys if k]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+        metrics.incr('license_cache.invalidations', len(keys))
+    except Exception:
+        pass
+
+
+def invalidate_license_ids(license_ids):
+    """Drop cached entries for licenses touched by a queryset .update()"""
+    from core.models import License
+
+    ids = list(license_ids)
+    if not ids:
+        return
+    invalidate_license(*License.objects.filter(id__in=ids).values_list('license_key', flat=True))
+
+
+def invalidate_plan(plan_id):
+    """Drop cached entries for the licenses of a plan (the cached License embeds its plan)"""
+    from core.models import License
+
+    invalidate_license(*License.objects.filter(plan_id=plan_id).values_list('license_key', flat=True))
+
+
+def get_stats():
+    """Hit/miss counters for this worker process"""
+    counters = metrics.snapshot('license_cache.')
+    hits = counters.get('license_cache.hits', 0)
+    misses = counters.get('license_cache.misses', 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'bypass': counters.get('license_cache.bypass', 0),
+        'invalidations': counters.get('license_cache.invalidations', 0),
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+# MT5 account binding + verification stats for verify_license.
+# Runs in one transaction. The first statement is the verification_count/last_verified
+# UPDATE, which also takes the license row lock, so concurrent verifies of the same license
+# (EA restart storms, several terminals) serialise on max_accounts. All bindings are read
+# with one query and only the changed columns are written. A rejected verify rolls back,
+# so the stats only count successful verifications.
+
+
+def verify_and_bind(license, mt5_account, hardware_id):
+    """
+    Record a successful verification and bind mt5_account to the license.
+    Returns None on success, or the rejection message for the log.
+    """
+    from core.models import License, LicenseMT5Account
+
+    now = timezone.now()
+    with transaction.atomic():
+        License.objects.filter(pk=license.pk).update(
+            last_verified=now,
+            verification_count=F('verification_count') + 1,
+        )
+        license.last_verified = now
+        if not mt5_account:
+            return None
+
+        bindings = {
+            b.mt5_account: b
+            for b in LicenseMT5Account.objects.filter(license_id=license.pk).only('id', 'mt5_account', 'hardware_id')
+        }
+
+        to_create = []
+        # Backward compatibility: old single-binding on the license moves into the bindings table
+        if license.mt5_account and license.mt5_account not in bindings:
+            legacy = LicenseMT5Account(
+                license_id=license.pk,
+                mt5_account=license.mt5_account,
+                hardware_id=license.hardware_id or None,
+                last_seen=now,
+            )
+            bindings[legacy.mt5_account] = legacy
+            to_create.append(legacy)
+
+        binding = bindings.get(mt5_account)
+        if binding is None:
+            max_accounts = license.plan.max_accounts or 1
+            if len(bindings) >= max_accounts:
+                transaction.set_rollback(True)
+                return f'Max accounts reached ({max_accounts})'
+            to_create.append(LicenseMT5Account(
+                license_id=license.pk,
+                mt5_account=mt5_account,
+                hardware_id=hardware_id or None,
+                last_seen=now,
+            ))
+        elif binding.pk:
+            changes = {'last_seen': now}
+            if hardware_id and not binding.hardware_id:
+                changes['hardware_id'] = hardware_id
+            LicenseMT5Account.objects.filter(pk=binding.pk).update(**changes)
+
+        if to_create:
+            LicenseMT5Account.objects.bulk_create(to_create, ignore_conflicts=True)
+
+        # Preserve old field for compatibility with existing admin/UI code
+        if not license.mt5_account:
+            changes = {'mt5_account': mt5_account, 'updated_at': now}
+            if hardware_id and not license.hardware_id:
+                changes['hardware_id'] = hardware_id
+            # The cached instance may be stale, only fill the field if it is still empty
+            License.objects.filter(pk=license.pk).filter(
+                Q(mt5_account__isnull=True) | Q(mt5_account='')
+            ).update(**changes)
+            for name, value in changes.items():
+                setattr(license, name, value)
+            from core.license_cache import invalidate_license
+            transaction.on_commit(lambda: invalidate_license(license.license_key))
+    return None
@@ -0,0 +1,106 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings as django_settings
+from django.db import close_old_connections
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Background sending of notification emails.
+# Request paths that notify many users (fm_toggle_ea emailing every affected subscriber) used to
+# start a thread per request. They now enqueue() one send per recipient on a bounded per-process
+# queue (MAIL_QUEUE_SIZE, a full queue drops the email) and a single writer thread works through
+# it. Whatever is still queued when the worker shuts down (gunicorn/pm2 restart, max-requests
+# recycle) is sent by the exit hook; only a worker that is killed outright loses queued emails.
+
+_queue = None
+_lock = threading.Lock()
+_worker_pid = None
+
+
+def _get_queue():
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = queue.Queue(maxsize=max(1, int(getattr(django_settings, 'MAIL_QUEUE_SIZE', 1000))))
+    return _queue
+
+
+def enqueue(send, *args, **kwargs):
+    """Queue send(*args, **kwargs) for the writer thread. Returns False if the queue is full."""
+    try:
+        _get_queue().put_nowait((send, args, kwargs))
+    except queue.Full:
+        metrics.incr('mail_queue.dropped')
+        logger.warning('Mail queue full, dropped %s', getattr(send, '__name__', send))
+        return False
+    metrics.incr('mail_queue.queued')
+    _ensure_worker()
+    return True
+
+
+def _deliver(item):
+    send, args, kwargs = item
+    try:
+        send(*args, **kwargs)
+    except Exception:
+        metrics.incr('mail_queue.failed')
+        logger.exception('Queued email failed')
+        return
+    metrics.incr('mail_queue.sent')
+
+
+def drain():
+    """Send everything currently queued. Returns the number of items processed."""
+    q = _get_queue()
+    done = 0
+    while True:
+        try:
+            item = q.get_nowait()
+        except queue.Empty:
+            return done
+        _deliver(item)
+        done += 1
+
+
+def _run():
+    q = _get_queue()
+    while True:
+        item = q.get()
+        close_old_connections()
+        _deliver(item)
+
+
+def _ensure_worker():
+    """Start the sender thread once per process (gunicorn forks after import)"""
+    global _worker_pid
+    pid = os.getpid()
+    if _worker_pid == pid:
+        return
+    with _lock:
+        if _worker_pid == pid:
+            return
+        _worker_pid = pid
+    threading.Thread(target=_run, name='mail-queue-sender', daemon=True).start()
+
+
+def get_stats():
+    """Queue counters for this worker process"""
+    counters = metrics.snapshot('mail_queue.')
+    stats = {name.split('.', 1)[1]: value for name, value in counters.items()}
+    stats['pending'] = _queue.qsize() if _queue is not None else 0
+    return stats
+
+
+@atexit.register
+def _drain_on_exit():
+    try:
+        drain()
+    except Exception:
+        pass
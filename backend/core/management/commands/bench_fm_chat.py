@@ -0,0 +1,112 @@
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from core.fm_views import fm_get_chat
+from core.models import FMChatMessage, FMChatRoom, FundManager
+
+PER_PAGE = 50
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway FM chat room and compare fm_get_chat page latency, page=N (OFFSET) vs before_id. '
+        'Everything it writes is rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=1_000_000,
+            help='Messages to seed into the room (default: 1000000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Requests per measured page (default: 5)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run with DEBUG off too (the seeded rows are still rolled back)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG is off, refusing to seed bench rows into this database (use --force)')
+        total = max(PER_PAGE * 2, options['messages'])
+        repeat = max(1, options['repeat'])
+        with transaction.atomic():
+            try:
+                self._run(total, repeat)
+            finally:
+                # The room, its messages and the FM user are never committed
+                transaction.set_rollback(True)
+
+    def _run(self, total, repeat):
+        factory = RequestFactory()
+
+        stamp = time.time_ns()
+        fm_user = User.objects.create(username=f'bench-fm-{stamp}', email=f'bench-fm-{stamp}@example.com')
+        fm = FundManager.objects.create(user=fm_user, display_name='Bench FM', status='approved')
+        room = FMChatRoom.objects.create(fund_manager=fm, name='Bench room')
+        self._seed(room, fm_user, total)
+
+        def fetch(**params):
+            request = factory.post(
+                '/api/fund-managers/chat/',
+                data=json.dumps({'email': fm_user.email, 'fund_manager_id': fm.id, **params}),
+                content_type='application/json',
+            )
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                body = json.loads(fm_get_chat(request).content)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            return body, best * 1000
+
+        depths = sorted({
+            d // PER_PAGE * PER_PAGE
+            for d in (0, PER_PAGE, 1_000, 10_000, 100_000, total // 2, total - PER_PAGE) if d < total
+        })
+        # before_id cursors for the measured depths, streamed (not part of the timings)
+        wanted = {depth - 1 for depth in depths if depth}
+        cursors = {}
+        rows = room.messages.order_by('-created_at', '-id').values_list('id', flat=True)
+        for position, message_id in enumerate(rows.iterator(chunk_size=10_000)):
+            if position in wanted:
+                cursors[position + 1] = message_id
+                if len(cursors) == len(wanted):
+                    break
+
+        self.stdout.write(f'{"depth":>10}{"page=N ms":>12}{"before_id ms":>14}  same')
+        for depth in depths:
+            offset_body, offset_ms = fetch(page=depth // PER_PAGE + 1)
+            if depth:
+                keyset_body, keyset_ms = fetch(before_id=cursors[depth])
+            else:
+                keyset_body, keyset_ms = offset_body, offset_ms
+            same = [m['id'] for m in offset_body['messages']] == [m['id'] for m in keyset_body['messages']]
+            self.stdout.write(f'{depth:>10}{offset_ms:>12.2f}{keyset_ms:>14.2f}  {same}')
+
+    def _seed(self, room, sender, total, batch_size=5000):
+        """Insert total messages, oldest first (created_at is auto_now_add, so ascending with id)"""
+        created = 0
+        while created < total:
+            count = min(batch_size, total - created)
+            FMChatMessage.objects.bulk_create([
+                FMChatMessage(chat_room=room, sender=sender, message=f'bench message {created + i}')
+                for i in range(count)
+            ])
+            created += count
+            self.stdout.write(f'\rseeded {created}/{total}', ending='')
+            self.stdout.flush()
+        self.stdout.write('')
@@ -0,0 +1,102 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from core.models import License, SubscriptionPlan
+from core.views import verify_license
+
+try:
+    from core.license_cache import invalidate_license
+except ImportError:
+    # Trees before the license cache have nothing cached to drop
+    def invalidate_license(*license_keys):
+        pass
+
+# Statements that are transaction bookkeeping rather than work
+_TX_PREFIXES = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure queries and latency per verify_license call (new, returning and rejected MT5 accounts). '
+        'Everything it writes is rolled back. It only needs core.views.verify_license '
+        '(the license cache is optional), so it can be copied into an older checkout to measure that tree '
+        'the same way'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Verify calls per scenario (default: 50)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run with DEBUG off too (the bench rows are still rolled back)',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG is off, refusing to write bench rows to this database (use --force)')
+        iterations = max(1, options['iterations'])
+        factory = RequestFactory()
+
+        def verify(license_key, mt5_account):
+            request = factory.post(
+                '/api/verify/',
+                data=json.dumps({'license_key': license_key, 'mt5_account': mt5_account, 'hardware_id': 'bench'}),
+                content_type='application/json',
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = verify_license(request)
+                elapsed = time.perf_counter() - start
+            sql = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(_TX_PREFIXES)]
+            log_writes = sum(1 for s in sql if 'core_licenseverificationlog' in s)
+            return json.loads(response.content), len(sql) - log_writes, log_writes, elapsed
+
+        results = {}
+        # Throwaway users, plans and licenses inside a transaction that is rolled back at the end,
+        # bindings and log rows (written synchronously here) included
+        with transaction.atomic():
+            stamp = time.time_ns()
+            user = User.objects.create(username=f'bench-verify-{stamp}')
+            plan = SubscriptionPlan.objects.create(name='bench', price=0, duration_days=30, max_accounts=iterations + 1)
+            license = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=30))
+            full_plan = SubscriptionPlan.objects.create(name='bench full', price=0, duration_days=30, max_accounts=1)
+            full = License.objects.create(user=user, plan=full_plan, expires_at=timezone.now() + timedelta(days=30))
+            scenarios = [
+                ('new account', lambda i: verify(license.license_key, f'9{i:07d}')),
+                ('returning account', lambda i: verify(license.license_key, '90000000')),
+                ('max accounts reject', lambda i: verify(full.license_key, f'7{i:07d}')),
+                ('invalid key', lambda i: verify('0000-0000-0000-0000', '90000000')),
+            ]
+            try:
+                with override_settings(VERIFICATION_LOG_ASYNC=False):
+                    verify(full.license_key, '80000000')
+                    for name, run in scenarios:
+                        queries, logs, total = [], [], 0.0
+                        for i in range(iterations):
+                            body, n, log_writes, elapsed = run(i)
+                            queries.append(n)
+                            logs.append(log_writes)
+                            total += elapsed
+                        results[name] = (min(queries), max(queries), max(logs), total / iterations * 1000, body.get('valid'))
+            finally:
+                transaction.set_rollback(True)
+                invalidate_license(license.license_key, full.license_key)
+
+        self.stdout.write(f'{"scenario":<20}{"queries":>10}{"log rows":>10}{"avg ms":>10}  valid')
+        for name, (q_min, q_max, log_writes, avg_ms, valid) in results.items():
+            queries = str(q_min) if q_min == q_max else f'{q_min}-{q_max}'
+            self.stdout.write(f'{name:<20}{queries:>10}{log_writes:>10}{avg_ms:>10.2f}  {valid}')
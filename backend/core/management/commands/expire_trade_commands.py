@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.models import TradeCommand
+
+
+class Command(BaseCommand):
+    help = 'Mark pending trade commands past their expiry as expired (one UPDATE per run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            type=int,
+            default=0,
+            help='Keep running and sweep every N seconds (default: run once)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the commands that would be expired',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            stale = TradeCommand.objects.filter(status='pending', expires_at__lte=timezone.now()).count()
+            self.stdout.write(f'{stale} pending trade commands would be expired')
+            return
+
+        interval = max(0, options['loop'])
+        while True:
+            expired = TradeCommand.expire_stale()
+            if expired or not interval:
+                self.stdout.write(f'Expired {expired} trade commands')
+            if not interval:
+                return
+            time.sleep(interval)
+            close_old_connections()
@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import user_resolver
+from core.models import CanonicalUser
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the CanonicalUser mapping for emails/usernames shared by several accounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the duplicate identifiers and the account each would resolve to',
+        )
+
+    def handle(self, *args, **options):
+        # An identifier is ambiguous when it is the email or username of more than one account
+        owners = defaultdict(set)
+        for user_id, email, username in User.objects.values_list('id', 'email', 'username').iterator():
+            for value in (email, username):
+                value = (value or '').strip().lower()
+                if value:
+                    owners[value].add(user_id)
+        duplicates = {identifier: ids for identifier, ids in owners.items() if len(ids) > 1}
+
+        mapping = {identifier: user_resolver.rank(ids) for identifier, ids in duplicates.items()}
+        if options['dry_run']:
+            for identifier, user_id in sorted(mapping.items()):
+                self.stdout.write(f'{identifier}: {sorted(duplicates[identifier])} -> {user_id}')
+            self.stdout.write(f'{len(mapping)} duplicate identifiers')
+            return
+
+        with transaction.atomic():
+            CanonicalUser.objects.all().delete()
+            CanonicalUser.objects.bulk_create([
+                CanonicalUser(identifier=identifier, user_id=user_id) for identifier, user_id in mapping.items()
+            ])
+        user_resolver.invalidate(*mapping)
+        self.stdout.write(f'Mapped {len(mapping)} duplicate identifiers')
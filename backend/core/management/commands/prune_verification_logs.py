@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.models import LicenseVerificationLog
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete old license verification logs. Records still queued in the web workers are '
+        'written by their own writer threads, not by this command'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'VERIFICATION_LOG_RETENTION_DAYS', 30),
+            help='Keep logs from the last N days (default: VERIFICATION_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement, keeps locks and WAL bursts small (default: 5000)',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            default=0,
+            help='Keep running and prune every N seconds (default: run once)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the rows that would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        days = max(0, options['days'])
+        batch_size = max(1, options['batch_size'])
+
+        if options['dry_run']:
+            old = LicenseVerificationLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=days))
+            self.stdout.write(f'{old.count()} verification logs older than {days} days would be deleted')
+            return
+
+        interval = max(0, options['loop'])
+        while True:
+            deleted = self._prune(days, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} verification logs older than {days} days'))
+            if not interval:
+                return
+            time.sleep(interval)
+            close_old_connections()
+
+    def _prune(self, days, batch_size):
+        old = LicenseVerificationLog.objects.filter(created_at__lt=timezone.now() - timedelta(days=days))
+
+        # Delete by id batches (uses the created_at index) instead of one huge DELETE
+        deleted = 0
+        while True:
+            ids = list(old.order_by('created_at').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += LicenseVerificationLog.objects.filter(id__in=ids).delete()[0]
+        return deleted
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import fm_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored marketplace stats of fund managers (subscribers, AUM, profit %, win rate)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            type=int,
+            default=0,
+            help='Keep running and refresh every N seconds (default: run once)',
+        )
+
+    def handle(self, *args, **options):
+        interval = max(0, options['loop'])
+        while True:
+            updated = fm_stats.refresh()
+            if updated or not interval:
+                self.stdout.write(f'Updated stats of {updated} fund managers')
+            if not interval:
+                return
+            time.sleep(interval)
+            close_old_connections()
@@ -0,0 +1,24 @@
+import threading
+from collections import defaultdict
+
+# Lightweight in-process counters for the hot EA paths (cache hits, skipped writes, ...).
+# Each gunicorn/daphne worker keeps its own counts.
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def incr(name, amount=1):
+    """Increment a named counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot(prefix=None):
+    """Return a copy of the counters, optionally only those starting with prefix"""
+    with _lock:
+        items = dict(_counters)
+    if prefix:
+        items = {k: v for k, v in items.items() if k.startswith(prefix)}
+    return items
+
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 08:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0049_alter_eacontrolsettings_lot_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosedPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mt5_account', models.CharField(blank=True, default='', max_length=50)),
+                ('ticket', models.BigIntegerField()),
+                ('symbol', models.CharField(blank=True, default='', max_length=20)),
+                ('type', models.CharField(blank=True, default='', max_length=10)),
+                ('lots', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('open_price', models.DecimalField(decimal_places=5, default=0, max_digits=15)),
+                ('close_price', models.DecimalField(decimal_places=5, default=0, max_digits=15)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('close_time', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('license', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closed_positions', to='core.license')),
+            ],
+            options={
+                'verbose_name': 'Closed Position',
+                'verbose_name_plural': 'Closed Positions',
+                'ordering': ['-close_time', '-ticket'],
+                'indexes': [models.Index(fields=['license', 'mt5_account', '-close_time', '-ticket'], name='closedpos_account_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('license', 'mt5_account', 'ticket'), name='unique_closedposition_ticket')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+from django.db.models import F
+
+# Formats the EA has sent in closed_positions[].close_time (copy of core.closed_positions at the time)
+CLOSE_TIME_FORMATS = ('%Y.%m.%d %H:%M', '%Y.%m.%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S')
+
+
+def parse_close_time(value):
+    if not value:
+        return None
+    for fmt in CLOSE_TIME_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def _decimal(value):
+    try:
+        return Decimal(str(value if value is not None else 0))
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+def copy_closed_positions(apps, schema_editor):
+    TradeData = apps.get_model('core', 'TradeData')
+    ClosedPosition = apps.get_model('core', 'ClosedPosition')
+    for td in TradeData.objects.exclude(closed_positions=[]).iterator():
+        objs = []
+        for p in td.closed_positions or []:
+            try:
+                ticket = int(p.get('ticket'))
+            except (TypeError, ValueError, AttributeError):
+                continue
+            objs.append(ClosedPosition(
+                license_id=td.license_id,
+                mt5_account=td.mt5_account,
+                ticket=ticket,
+                symbol=str(p.get('symbol') or '')[:20],
+                type=str(p.get('type') or '')[:10],
+                lots=_decimal(p.get('lots')),
+                open_price=_decimal(p.get('open_price')),
+                close_price=_decimal(p.get('close_price')),
+                profit=_decimal(p.get('profit')),
+                close_time=parse_close_time(p.get('close_time')),
+            ))
+        ClosedPosition.objects.bulk_create(objs, batch_size=500, ignore_conflicts=True)
+
+
+def restore_closed_positions(apps, schema_editor):
+    TradeData = apps.get_model('core', 'TradeData')
+    ClosedPosition = apps.get_model('core', 'ClosedPosition')
+    for td in TradeData.objects.iterator():
+        rows = ClosedPosition.objects.filter(
+            license_id=td.license_id, mt5_account=td.mt5_account,
+        ).order_by(F('close_time').desc(nulls_last=True), '-ticket')[:1000]
+        td.closed_positions = [{
+            'ticket': r.ticket,
+            'symbol': r.symbol,
+            'type': r.type,
+            'lots': float(r.lots),
+            'open_price': float(r.open_price),
+            'close_price': float(r.close_price),
+            'profit': float(r.profit),
+            'close_time': r.close_time.strftime('%Y.%m.%d %H:%M') if r.close_time else '',
+        } for r in rows]
+        td.save(update_fields=['closed_positions'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0050_closedposition'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_closed_positions, restore_closed_positions),
+    ]
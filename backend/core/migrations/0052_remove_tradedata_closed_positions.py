@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 08:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0051_copy_closed_positions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tradedata',
+            name='closed_positions',
+        ),
+    ]
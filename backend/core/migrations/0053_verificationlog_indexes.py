@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 08:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0052_remove_tradedata_closed_positions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='licenseverificationlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='licenseverificationlog',
+            index=models.Index(fields=['created_at'], name='verifylog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licenseverificationlog',
+            index=models.Index(fields=['license', '-created_at'], name='verifylog_license_created_idx'),
+        ),
+    ]
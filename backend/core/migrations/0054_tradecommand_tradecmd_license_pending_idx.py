@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0053_verificationlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tradecommand',
+            index=models.Index(fields=['license', 'status', 'expires_at'], name='tradecmd_license_pending_idx'),
+        ),
+    ]
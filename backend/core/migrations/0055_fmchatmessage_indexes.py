@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0054_tradecommand_tradecmd_license_pending_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fmchatmessage',
+            index=models.Index(fields=['chat_room', '-created_at', '-id'], name='fmchat_room_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fmchatmessage',
+            index=models.Index(condition=models.Q(('is_pinned', True)), fields=['chat_room', '-created_at'], name='fmchat_room_pinned_idx'),
+        ),
+    ]
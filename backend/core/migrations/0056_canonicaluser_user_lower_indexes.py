@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0055_fmchatmessage_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifier', models.CharField(help_text='Lower-cased email or username', max_length=254, unique=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Canonical User',
+                'verbose_name_plural': 'Canonical Users',
+            },
+        ),
+        # auth_user belongs to django.contrib.auth, so its lookup indexes for
+        # core/user_resolver.py (lower(email) / lower(username)) are plain SQL
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS core_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX IF EXISTS core_user_email_lower_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS core_user_username_lower_idx ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX IF EXISTS core_user_username_lower_idx;',
+        ),
+    ]
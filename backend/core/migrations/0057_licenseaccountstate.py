@@ -0,0 +1,56 @@
+# Generated by Django 5.0 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_account_state(apps, schema_editor):
+    TradeData = apps.get_model('core', 'TradeData')
+    LicenseAccountState = apps.get_model('core', 'LicenseAccountState')
+
+    states = {}
+    rows = TradeData.objects.order_by('license_id', '-last_update').iterator(chunk_size=2000)
+    for row in rows:
+        if row.license_id in states:
+            continue
+        states[row.license_id] = LicenseAccountState(
+            license_id=row.license_id,
+            trade_data_id=row.id,
+            mt5_account=row.mt5_account,
+            account_balance=row.account_balance,
+            account_equity=row.account_equity,
+            account_profit=row.account_profit,
+            total_buy_positions=row.total_buy_positions,
+            total_sell_positions=row.total_sell_positions,
+            last_update=row.last_update,
+        )
+    LicenseAccountState.objects.bulk_create(states.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0056_canonicaluser_user_lower_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LicenseAccountState',
+            fields=[
+                ('license', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='account_state', serialize=False, to='core.license')),
+                ('mt5_account', models.CharField(blank=True, default='', max_length=50)),
+                ('account_balance', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('account_equity', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('account_profit', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_buy_positions', models.IntegerField(default=0)),
+                ('total_sell_positions', models.IntegerField(default=0)),
+                ('last_update', models.DateTimeField(blank=True, null=True)),
+                ('trade_data', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.tradedata')),
+            ],
+            options={
+                'verbose_name': 'License Account State',
+                'verbose_name_plural': 'License Account States',
+            },
+        ),
+        migrations.RunPython(backfill_account_state, migrations.RunPython.noop),
+    ]
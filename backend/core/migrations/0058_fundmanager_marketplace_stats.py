@@ -0,0 +1,74 @@
+# Generated by Django 5.0 on 2026-10-18 15:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_stats(apps, schema_editor):
+    # Subscriber and managed account counts only, profit % and win rate keep their stored values
+    # until the first `manage.py refresh_fm_stats` (pm2 app fm-stats) after the deploy
+    from django.db.models import Count, Sum
+    FundManager = apps.get_model('core', 'FundManager')
+    FMSubscription = apps.get_model('core', 'FMSubscription')
+    FMAccountAssignment = apps.get_model('core', 'FMAccountAssignment')
+
+    live = ['active', 'trial']
+    subscribers = {
+        row['fund_manager_id']: row['n']
+        for row in FMSubscription.objects.filter(status__in=live).values('fund_manager_id').annotate(n=Count('id'))
+    }
+    managed = {
+        row['subscription__fund_manager_id']: (row['n'], row['balance'] or Decimal('0.00'))
+        for row in FMAccountAssignment.objects.filter(
+            subscription__status__in=live, license__account_state__isnull=False
+        ).values('subscription__fund_manager_id').annotate(
+            n=Count('id'), balance=Sum('license__account_state__account_balance')
+        )
+    }
+
+    changed = []
+    for fm in FundManager.objects.filter(id__in=set(subscribers) | set(managed)).only('id'):
+        fm.active_subscribers = subscribers.get(fm.id, 0)
+        fm.managed_accounts, fm.managed_balance = managed.get(fm.id, (0, Decimal('0.00')))
+        changed.append(fm)
+    FundManager.objects.bulk_update(changed, ['active_subscribers', 'managed_accounts', 'managed_balance'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0057_licenseaccountstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundmanager',
+            name='active_subscribers',
+            field=models.IntegerField(default=0, help_text='Active and trial subscriptions'),
+        ),
+        migrations.AddField(
+            model_name='fundmanager',
+            name='managed_accounts',
+            field=models.IntegerField(default=0, help_text='Accounts assigned through active and trial subscriptions'),
+        ),
+        migrations.AddField(
+            model_name='fundmanager',
+            name='managed_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text="Sum of the managed accounts' balances", max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='fundmanager',
+            name='stats_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='fundmanager',
+            index=models.Index(fields=['status', '-total_profit_percent'], name='fm_status_profit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundmanager',
+            index=models.Index(fields=['status', '-active_subscribers'], name='fm_status_subscribers_idx'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0058_fundmanager_marketplace_stats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='closedposition',
+            options={'ordering': [models.OrderBy(models.F('close_time'), descending=True, nulls_last=True), '-ticket'], 'verbose_name': 'Closed Position', 'verbose_name_plural': 'Closed Positions'},
+        ),
+        migrations.AddIndex(
+            model_name='closedposition',
+            index=models.Index(models.F('license'), models.F('mt5_account'), models.OrderBy(models.F('close_time'), descending=True, nulls_last=True), models.OrderBy(models.F('ticket'), descending=True), name='closedpos_account_time_nl_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='closedposition',
+            name='closedpos_account_time_idx',
+        ),
+    ]
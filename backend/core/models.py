@@ -21,6 +21,15 @@ class SubscriptionPlan(models.Model):
     def __str__(self):
         return f"{self.name} - ${self.price} ({self.duration_days} days)"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Cached licenses carry their plan (max_accounts etc.)
+        if self.pk:
+            from django.db import transaction
+            from core.license_cache import invalidate_plan
+            plan_id = self.pk
+            transaction.on_commit(lambda: invalidate_plan(plan_id))
+
     class Meta:
         ordering = ['price']
 
@@ -63,6 +72,19 @@ class License(models.Model):
         if not self.expires_at:
             self.expires_at = timezone.now() + timedelta(days=self.plan.duration_days)
         super().save(*args, **kwargs)
+        # After the commit, so a lookup in between cannot cache the old row again
+        from django.db import transaction
+        from core.license_cache import invalidate_license
+        license_key = self.license_key
+        transaction.on_commit(lambda: invalidate_license(license_key))
+
+    def delete(self, *args, **kwargs):
+        license_key = self.license_key
+        result = super().delete(*args, **kwargs)
+        from django.db import transaction
+        from core.license_cache import invalidate_license
+        transaction.on_commit(lambda: invalidate_license(license_key))
+        return result
 
     @staticmethod
     def generate_license_key():
@@ -77,7 +99,7 @@ class License(models.Model):
             return False
         if timezone.now() > self.expires_at:
             self.status = 'expired'
-            self.save()
+            self.save(update_fields=['status', 'updated_at'])
             return False
         return True
 
@@ -89,6 +111,20 @@ class License(models.Model):
         import math
         return max(0, math.ceil(delta.total_seconds() / 86400))
 
+    def current_status(self, now=None):
+        """Status with a passed expiry applied, without saving it (is_valid() persists it)"""
+        if self.status == 'active' and (now or timezone.now()) > self.expires_at:
+            return 'expired'
+        return self.status
+
+    def days_left(self, now=None):
+        """days_remaining() for read-only listings: same value, never writes"""
+        now = now or timezone.now()
+        if self.current_status(now) != 'active':
+            return 0
+        import math
+        return max(0, math.ceil((self.expires_at - now).total_seconds() / 86400))
+
     def __str__(self):
         return f"{self.user.username} - {self.license_key[:8]}... ({self.status})"
 
@@ -120,7 +156,8 @@ class LicenseVerificationLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     is_valid = models.BooleanField(default=False)
     message = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the attempt happens, rows are written later in batches (core/verification_log.py)
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.license_key[:8]}... - {'Valid' if self.is_valid else 'Invalid'} - {self.created_at}"
@@ -129,6 +166,10 @@ class LicenseVerificationLog(models.Model):
         ordering = ['-created_at']
         verbose_name = "License Verification Log"
         verbose_name_plural = "License Verification Logs"
+        indexes = [
+            models.Index(fields=['created_at'], name='verifylog_created_idx'),
+            models.Index(fields=['license', '-created_at'], name='verifylog_license_created_idx'),
+        ]
 
 
 class EASettings(models.Model):
@@ -304,9 +345,6 @@ class TradeData(models.Model):
     pending_orders = models.JSONField(default=list, blank=True)
     total_pending_orders = models.IntegerField(default=0)
     
-    # Closed Positions JSON (last 1000 closed trades, older removed automatically)
-    closed_positions = models.JSONField(default=list, blank=True)
-    
     # Trading Mode
     trading_mode = models.CharField(max_length=50, default='Normal')
     
@@ -317,6 +355,11 @@ class TradeData(models.Model):
     last_update = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from core.account_state import record
+        record([self])
+
     def __str__(self):
         return f"Trade Data - {self.mt5_account or self.license.mt5_account} - {self.last_update}"
 
@@ -329,6 +372,63 @@ class TradeData(models.Model):
         ]
 
 
+class LicenseAccountState(models.Model):
+    """Newest account figures of a license, kept up to date on trade data ingest (see core/account_state.py)"""
+    license = models.OneToOneField(License, on_delete=models.CASCADE, primary_key=True, related_name='account_state')
+    trade_data = models.ForeignKey(TradeData, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    mt5_account = models.CharField(max_length=50, blank=True, default='')
+
+    account_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    account_equity = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    account_profit = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_buy_positions = models.IntegerField(default=0)
+    total_sell_positions = models.IntegerField(default=0)
+
+    last_update = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Account State - {self.license_id} - {self.last_update}"
+
+    class Meta:
+        verbose_name = "License Account State"
+        verbose_name_plural = "License Account States"
+
+
+class ClosedPosition(models.Model):
+    """Closed trade reported by the EA (one row per deal ticket, insert-only)"""
+    license = models.ForeignKey(License, on_delete=models.CASCADE, related_name='closed_positions')
+    mt5_account = models.CharField(max_length=50, blank=True, default='')
+    ticket = models.BigIntegerField()
+
+    symbol = models.CharField(max_length=20, blank=True, default='')
+    type = models.CharField(max_length=10, blank=True, default='')
+    lots = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    open_price = models.DecimalField(max_digits=15, decimal_places=5, default=0)
+    close_price = models.DecimalField(max_digits=15, decimal_places=5, default=0)
+    profit = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    close_time = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.ticket} {self.type} {self.lots} {self.symbol} ({self.profit})"
+
+    class Meta:
+        verbose_name = "Closed Position"
+        verbose_name_plural = "Closed Positions"
+        # Deals without a parseable close time go last (PostgreSQL sorts NULLs first in DESC)
+        ordering = [models.F('close_time').desc(nulls_last=True), '-ticket']
+        constraints = [
+            models.UniqueConstraint(fields=['license', 'mt5_account', 'ticket'], name='unique_closedposition_ticket')
+        ]
+        indexes = [
+            models.Index(
+                models.F('license'), models.F('mt5_account'), models.F('close_time').desc(nulls_last=True),
+                models.F('ticket').desc(), name='closedpos_account_time_nl_idx',
+            ),
+        ]
+
+
 class EAControlSettings(models.Model):
     """User-configurable EA control settings per license — lot size, daily targets, schedule stop"""
     
@@ -655,7 +755,14 @@ class TradeCommand(models.Model):
     def save(self, *args, **kwargs):
         if not self.expires_at:
             self.expires_at = timezone.now() + timedelta(minutes=5)
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if adding and self.status == 'pending':
+            # Wake up the EA's long-poll request (core/trade_commands.py)
+            from django.db import transaction
+            from core.trade_commands import notify_new_command
+            license_id = self.license_id
+            transaction.on_commit(lambda: notify_new_command(license_id))
     
     def is_expired(self):
         """Check if command has expired"""
@@ -663,10 +770,18 @@ class TradeCommand(models.Model):
             return False
         if timezone.now() > self.expires_at:
             self.status = 'expired'
-            self.save()
+            self.save(update_fields=['status'])
             return True
         return False
     
+    @classmethod
+    def expire_stale(cls, license=None):
+        """Mark every pending command past expires_at as expired in one UPDATE. Returns the row count."""
+        stale = cls.objects.filter(status='pending', expires_at__lte=timezone.now())
+        if license is not None:
+            stale = stale.filter(license=license)
+        return stale.update(status='expired')
+    
     def __str__(self):
         return f"{self.command_type} - {self.license.license_key[:12]}... ({self.status})"
     
@@ -674,6 +789,10 @@ class TradeCommand(models.Model):
         verbose_name = "Trade Command"
         verbose_name_plural = "Trade Commands"
         ordering = ['-created_at']
+        indexes = [
+            # EA poll: pending, non-expired commands of one license
+            models.Index(fields=['license', 'status', 'expires_at'], name='tradecmd_license_pending_idx'),
+        ]
 
 
 class SiteSettings(models.Model):
@@ -903,10 +1022,14 @@ class FundManager(models.Model):
     # Subscription pricing
     monthly_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('29.00'), help_text="Monthly subscription price in USD")
     
-    # Performance stats (updated periodically)
+    # Performance stats (updated periodically by manage.py refresh_fm_stats, see core/fm_stats.py)
     total_profit_percent = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), help_text="Total profit % across all managed accounts")
     win_rate = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.00'), help_text="Win rate percentage")
     months_active = models.IntegerField(default=0)
+    active_subscribers = models.IntegerField(default=0, help_text="Active and trial subscriptions")
+    managed_accounts = models.IntegerField(default=0, help_text="Accounts assigned through active and trial subscriptions")
+    managed_balance = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'), help_text="Sum of the managed accounts' balances")
+    stats_updated_at = models.DateTimeField(null=True, blank=True)
     
     # Ratings
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=Decimal('0.00'))
@@ -942,6 +1065,18 @@ class FundManager(models.Model):
             subscription__status='active'
         ).count()
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from core.fm_access import invalidate_fm
+        invalidate_fm(self.id)
+
+    def delete(self, *args, **kwargs):
+        fm_id = self.id
+        result = super().delete(*args, **kwargs)
+        from core.fm_access import invalidate_fm
+        invalidate_fm(fm_id)
+        return result
+
     def __str__(self):
         return f"{self.display_name} ({self.get_status_display()}) - ${self.monthly_price}/mo"
     
@@ -949,6 +1084,10 @@ class FundManager(models.Model):
         verbose_name = "Fund Manager"
         verbose_name_plural = "Fund Managers"
         ordering = ['-is_featured', '-average_rating', '-created_at']
+        indexes = [
+            models.Index(fields=['status', '-total_profit_percent'], name='fm_status_profit_idx'),
+            models.Index(fields=['status', '-active_subscribers'], name='fm_status_subscribers_idx'),
+        ]
 
 
 class FMSubscription(models.Model):
@@ -993,6 +1132,22 @@ class FMSubscription(models.Model):
         delta = self.current_period_end - timezone.now()
         return max(0, delta.days)
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from core.fm_access import invalidate_member
+        from core.fm_stats import refresh_subscribers
+        invalidate_member(self.fund_manager_id, self.user_id)
+        refresh_subscribers(self.fund_manager_id)
+
+    def delete(self, *args, **kwargs):
+        fm_id, user_id = self.fund_manager_id, self.user_id
+        result = super().delete(*args, **kwargs)
+        from core.fm_access import invalidate_member
+        from core.fm_stats import refresh_subscribers
+        invalidate_member(fm_id, user_id)
+        refresh_subscribers(fm_id)
+        return result
+
     def __str__(self):
         return f"{self.user.email} → {self.fund_manager.display_name} ({self.status})"
     
@@ -1079,6 +1234,11 @@ class FMChatRoom(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from core.fm_access import invalidate_fm
+        invalidate_fm(self.fund_manager_id)
+
     def __str__(self):
         return f"Chat: {self.fund_manager.display_name}"
     
@@ -1121,6 +1281,15 @@ class FMChatMessage(models.Model):
         verbose_name = "FM Chat Message"
         verbose_name_plural = "FM Chat Messages"
         ordering = ['-created_at']
+        indexes = [
+            # fm_get_chat pages: newest first, before_id cursor
+            models.Index(fields=['chat_room', '-created_at', '-id'], name='fmchat_room_created_idx'),
+            models.Index(
+                fields=['chat_room', '-created_at'],
+                condition=models.Q(is_pinned=True),
+                name='fmchat_room_pinned_idx',
+            ),
+        ]
 
 
 class FMReview(models.Model):
@@ -1841,3 +2010,18 @@ class GiftLicense(models.Model):
         ordering = ['-purchased_at']
         verbose_name = "Gift License"
         verbose_name_plural = "Gift Licenses"
+
+
+class CanonicalUser(models.Model):
+    """Account an email/username resolves to when several User rows share it (legacy duplicates)"""
+
+    identifier = models.CharField(max_length=254, unique=True, help_text="Lower-cased email or username")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.identifier} → {self.user_id}"
+
+    class Meta:
+        verbose_name = "Canonical User"
+        verbose_name_plural = "Canonical Users"
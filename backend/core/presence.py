@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+from django.conf import settings as django_settings
+
+from core import metrics
+
+# Who is watching which trade stream, so update_trade_data can skip building and publishing
+# the WebSocket payload for licenses nobody has open (most of them, most of the time).
+# Consumers register themselves in Redis sorted sets
+#   presence:license:<license_key>   TradeConsumer, DashboardConsumer trade:<key>
+#   presence:owner:<user_id>         AllTradesConsumer, DashboardConsumer trades:all
+# with their channel name as member and the time their registration runs out as score.
+# Live sockets re-assert their own member every _REFRESH seconds and remove it on leave, so
+# a socket is never lost when the key or another socket's entry expires, and sockets of a
+# crashed daphne process stop counting after _TTL. The ingest side remembers each answer for
+# _MEMO_TTL seconds per worker; a socket that just connected gets its snapshot from the
+# consumer in the meantime. Without Redis (PRESENCE_REDIS_URL) every license counts as watched.
+
+_TTL = 180
+_REFRESH = 60
+_MEMO_TTL = 2.0
+
+_memo = {}
+_client = None
+_async_client = None
+_async_loop = None
+
+
+def license_key_name(license_key):
+    return f'presence:license:{license_key}'
+
+
+def owner_key_name(user_id):
+    return f'presence:owner:{user_id}'
+
+
+def _url():
+    return getattr(django_settings, 'PRESENCE_REDIS_URL', '')
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(_url(), socket_timeout=2)
+    return _client
+
+
+def _aredis():
+    """asyncio client of the running event loop (the consumers' side)"""
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        import redis.asyncio
+        _async_client = redis.asyncio.Redis.from_url(_url(), socket_timeout=2)
+        _async_loop = loop
+    return _async_client
+
+
+def enabled():
+    return bool(getattr(django_settings, 'TRADE_BROADCAST_PRESENCE', False) and _url())
+
+
+def is_watched(license):
+    """Whether any socket follows this license (directly or through its owner)"""
+    if not enabled():
+        return True
+    now = time.monotonic()
+    memo = _memo.get(license.license_key)
+    if memo is not None and memo[1] > now:
+        watched = memo[0]
+    else:
+        try:
+            pipe = _redis().pipeline(transaction=False)
+            for key in (license_key_name(license.license_key), owner_key_name(license.user_id)):
+                pipe.zcount(key, time.time(), '+inf')
+            watched = any(count > 0 for count in pipe.execute())
+        except Exception:
+            # Fail open, a missed skip only costs a publish
+            watched = True
+        _memo[license.license_key] = (watched, now + _MEMO_TTL)
+    metrics.incr('presence.published' if watched else 'presence.skipped')
+    return watched
+
+
+def get_stats():
+    """Skipped/published broadcast counters for this worker process"""
+    counters = metrics.snapshot('presence.')
+    skipped = counters.get('presence.skipped', 0)
+    published = counters.get('presence.published', 0)
+    total = skipped + published
+    return {
+        'skipped': skipped,
+        'published': published,
+        'skip_rate': round(skipped / total, 4) if total else 0.0,
+    }
+
+
+class PresenceMixin:
+    """Per-socket presence for AsyncWebsocketConsumer (call stop_presence from disconnect)"""
+
+    _presence_keys = None
+    _presence_task = None
+
+    async def _register(self, keys):
+        expires = time.time() + _TTL
+        pipe = _aredis().pipeline(transaction=False)
+        for key in keys:
+            pipe.zadd(key, {self.channel_name: expires})
+            # Drop members left behind by crashed processes, keep the key itself bounded too
+            pipe.zremrangebyscore(key, '-inf', time.time())
+            pipe.expire(key, _TTL)
+        await pipe.execute()
+
+    async def watch(self, *keys):
+        if self._presence_keys is None:
+            self._presence_keys = set()
+        new = set(keys) - self._presence_keys
+        if not new:
+            return
+        self._presence_keys.update(new)
+        if not enabled():
+            return
+        try:
+            await self._register(new)
+        except Exception:
+            pass
+        if self._presence_task is None or self._presence_task.done():
+            self._presence_task = asyncio.ensure_future(self._refresh_presence())
+
+    async def unwatch(self, *keys):
+        gone = set(keys) & (self._presence_keys or set())
+        if not gone:
+            return
+        self._presence_keys -= gone
+        if not enabled():
+            return
+        try:
+            pipe = _aredis().pipeline(transaction=False)
+            for key in gone:
+                pipe.zrem(key, self.channel_name)
+            await pipe.execute()
+        except Exception:
+            pass
+
+    async def stop_presence(self):
+        if self._presence_task is not None:
+            self._presence_task.cancel()
+        await self.unwatch(*(self._presence_keys or ()))
+
+    async def _refresh_presence(self):
+        while self._presence_keys:
+            await asyncio.sleep(_REFRESH)
+            try:
+                # Re-assert this socket's own entries, whatever happened to the keys meanwhile
+                await self._register(list(self._presence_keys))
+            except Exception:
+                pass
@@ -0,0 +1,163 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core import metrics
+
+# Cached responses for the public read-only endpoints (plans, EA products, site settings,
+# guideline videos, VPS plans, economic calendar, wave alerts, FM marketplace).
+# @cached_response('group', ...) keeps the rendered body in the Django cache (Redis on
+# production, shared by all workers) keyed by view, query string and group versions, for
+# RESPONSE_CACHE_TTL seconds (0 disables it). Every response carries an ETag and Last-Modified
+# and conditional GETs are answered with 304 without touching the database.
+# Invalidation bumps a per-group version instead of deleting keys: post_save/post_delete of
+# the models in GROUP_MODELS (connected in CoreConfig.ready()) and code paths that write with
+# queryset.update()/bulk_update() call invalidate(group).
+
+GROUP_MODELS = {
+    'plans': ['SubscriptionPlan', 'SiteSettings'],
+    'ea_products': ['EAProduct'],
+    'site_settings': ['SiteSettings'],
+    'guidelines': ['GuidelineCategory', 'GuidelineVideo'],
+    'vps_plans': ['VPSPlan'],
+    'economic_events': ['EconomicEvent'],
+    'wave_alerts': ['TradingWaveAlert'],
+    'fund_managers': ['FundManager', 'FMSubscription'],
+}
+
+_groups_by_model = {}
+for _group, _model_names in GROUP_MODELS.items():
+    for _name in _model_names:
+        _groups_by_model.setdefault(_name, []).append(_group)
+
+
+def _ttl():
+    return getattr(django_settings, 'RESPONSE_CACHE_TTL', 300)
+
+
+def _version_key(group):
+    return f'resp_ver:{group}'
+
+
+def _versions(groups):
+    keys = [_version_key(g) for g in groups]
+    found = cache.get_many(keys)
+    return [str(found.get(k, 0)) for k in keys]
+
+
+def _cache_key(view_name, request, groups, per_host):
+    parts = [view_name, request.GET.urlencode()]
+    if per_host:
+        # Bodies with absolute URLs (build_absolute_uri) differ per host and scheme
+        parts.append(request.build_absolute_uri('/'))
+    parts.extend(_versions(groups))
+    return 'resp:' + hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def _not_modified(request, entry):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return entry['etag'] in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(entry['modified']) <= since
+
+
+def _build(entry, request):
+    if _not_modified(request, entry):
+        metrics.incr('response_cache.not_modified')
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['body'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['modified'])
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_response(*groups, ttl=None, per_host=False):
+    """
+    Cache a GET view's 200 responses, invalidated with the given groups.
+    ttl overrides RESPONSE_CACHE_TTL (e.g. for countdowns), per_host keys by host and scheme.
+    """
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = _ttl() if ttl is None else min(ttl, _ttl())
+            if request.method != 'GET' or timeout <= 0:
+                return view(request, *args, **kwargs)
+
+            try:
+                key = _cache_key(view_name, request, groups, per_host)
+                entry = cache.get(key)
+            except Exception:
+                key, entry = None, None
+            if entry is not None:
+                metrics.incr('response_cache.hits')
+                return _build(entry, request)
+
+            metrics.incr('response_cache.misses')
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            entry = {
+                'body': response.content,
+                'content_type': response['Content-Type'],
+                'etag': quote_etag(hashlib.md5(response.content).hexdigest()),
+                'modified': int(time.time()),
+            }
+            if key is not None:
+                try:
+                    cache.set(key, entry, timeout)
+                except Exception:
+                    pass
+            return _build(entry, request)
+
+        return wrapper
+    return decorator
+
+
+def invalidate(*groups):
+    """Make every cached response of these groups stale"""
+    for group in groups:
+        key = _version_key(group)
+        try:
+            if not cache.add(key, 1, None):
+                cache.incr(key)
+        except Exception:
+            pass
+
+
+def _on_change(sender, **kwargs):
+    invalidate(*_groups_by_model.get(sender.__name__, ()))
+
+
+def connect():
+    """Invalidate on post_save/post_delete of the models in GROUP_MODELS (called from CoreConfig.ready())"""
+    from django.apps import apps
+    from django.db.models.signals import post_delete, post_save
+
+    for name in _groups_by_model:
+        model = apps.get_model('core', name)
+        post_save.connect(_on_change, sender=model, dispatch_uid=f'response_cache_save_{name}')
+        post_delete.connect(_on_change, sender=model, dispatch_uid=f'response_cache_delete_{name}')
+
+
+def get_stats():
+    """Hit/miss counters for this worker process"""
+    counters = metrics.snapshot('response_cache.')
+    hits = counters.get('response_cache.hits', 0)
+    misses = counters.get('response_cache.misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'not_modified': counters.get('response_cache.not_modified', 0),
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
@@ -1,3 +1,1154 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import (
+    account_state, chat_buffer, fm_access, fm_stats, mail_queue, metrics, presence, trade_broadcast, trade_buffer, user_resolver,
+    verification_log, ws_auth,
+)
+from core.closed_positions import get_closed_positions
+from core.license_cache import get_license
+from core.license_verification import verify_and_bind
+from core.models import (
+    ClosedPosition, EASettings, FMAccountAssignment, FMChatMessage, FMChatRoom, FMCommand, FMSubscription, FundManager,
+    License, LicenseAccountState, LicenseMT5Account, LicenseVerificationLog, SiteSettings,
+    SubscriptionPlan, TradeCommand, TradeData,
+)
+
+
+def _make_fm(email, subscribers, accounts=1, statuses=('active',), password=None, trade_data=None, closed_profits=()):
+    """
+    Approved FundManager with `subscribers` subscriptions (status cycling through statuses), each
+    with `accounts` assigned licenses. trade_data: TradeData fields to create per license,
+    closed_profits: one ClosedPosition per profit per license.
+    """
+    plan = SubscriptionPlan.objects.create(name=f'Plan {email}', price=0, duration_days=30)
+    user = User.objects.create(username=email, email=email)
+    if password:
+        user.set_password(password)
+        user.save()
+    fm = FundManager.objects.create(user=user, display_name=email, status='approved')
+    period_end = timezone.now() + timedelta(days=10)
+    for i in range(subscribers):
+        sub_user = User.objects.create(username=f'{email}-sub{i}', email=f'sub{i}.{email}')
+        sub = FMSubscription.objects.create(
+            user=sub_user, fund_manager=fm, status=statuses[i % len(statuses)],
+            price_at_subscription=0, current_period_end=period_end,
+        )
+        for j in range(accounts):
+            lic = License.objects.create(user=sub_user, plan=plan, expires_at=period_end)
+            FMAccountAssignment.objects.create(subscription=sub, license=lic)
+            if trade_data is not None:
+                TradeData.objects.create(license=lic, **trade_data)
+            for ticket, profit in enumerate(closed_profits, 1):
+                ClosedPosition.objects.create(license=lic, ticket=ticket, profit=profit, close_time=timezone.now())
+    return fm
+
+
+@override_settings(USER_RESOLVE_CACHE_TTL=0)
+class GetLicensesQueryCountTests(TestCase):
+    """get_licenses must cost the same number of queries for 1 license and for 200"""
+
+    # resolve_user, licenses (+ plan, account state), EA settings prefetch, FM assignments
+    QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = SubscriptionPlan.objects.create(name='Test', price=0, duration_days=30)
+
+    def _make_user(self, email, count):
+        user = User.objects.create(username=email, email=email)
+        expires_at = timezone.now() + timedelta(days=10)
+        for i in range(count):
+            lic = License.objects.create(user=user, plan=self.plan, expires_at=expires_at)
+            EASettings.objects.create(license=lic, symbol='XAUUSD')
+            EASettings.objects.create(license=lic, symbol='BTCUSD')
+            TradeData.objects.create(license=lic, mt5_account=f'{i}', account_balance=100 + i)
+        return user
+
+    def _get_licenses(self, email):
+        response = self.client.post(
+            '/api/licenses/', data=json.dumps({'email': email}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['licenses']
+
+    def test_query_count_is_constant(self):
+        self._make_user('one@example.com', 1)
+        self._make_user('many@example.com', 200)
+
+        with self.assertNumQueries(self.QUERIES):
+            one = self._get_licenses('one@example.com')
+        with self.assertNumQueries(self.QUERIES):
+            many = self._get_licenses('many@example.com')
+
+        self.assertEqual(len(one), 1)
+        self.assertEqual(len(many), 200)
+        self.assertEqual(one[0]['ea_settings']['symbol'], 'BTCUSD')
+        self.assertEqual(one[0]['account_balance'], 100.0)
+
+    def test_expired_license_is_reported_without_writing(self):
+        user = self._make_user('expired@example.com', 1)
+        License.objects.filter(user=user).update(expires_at=timezone.now() - timedelta(days=1))
+
+        with self.assertNumQueries(self.QUERIES):
+            licenses = self._get_licenses('expired@example.com')
+
+        self.assertEqual(licenses[0]['status'], 'expired')
+        self.assertEqual(licenses[0]['days_remaining'], 0)
+
+
+@override_settings(USER_RESOLVE_CACHE_TTL=0)
+class FMDashboardQueryCountTests(TestCase):
+    """fm_dashboard must not grow with the number of subscribers and accounts"""
+
+    # resolve_user, FM profile, subscriptions, assignments prefetch (+ account state),
+    # subscriber FMs, recent commands
+    QUERIES = 6
+
+    def _make_fm(self, email, subscribers):
+        return _make_fm(
+            email, subscribers, accounts=2, statuses=('trial', 'active'),
+            trade_data={'mt5_account': '1', 'account_balance': 100, 'account_equity': 90, 'account_profit': -10},
+        )
+
+    def _dashboard(self, email):
+        response = self.client.post(
+            '/api/fund-managers/dashboard/', data=json.dumps({'email': email}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['dashboard']
+
+    def test_query_count_is_constant(self):
+        self._make_fm('small@example.com', 1)
+        self._make_fm('large@example.com', 30)
+
+        with self.assertNumQueries(self.QUERIES):
+            small = self._dashboard('small@example.com')
+        with self.assertNumQueries(self.QUERIES):
+            large = self._dashboard('large@example.com')
+
+        self.assertEqual(small['stats']['total_subscribers'], 1)
+        self.assertEqual(large['stats']['total_subscribers'], 30)
+        self.assertEqual(large['stats']['active_subscribers'], 15)
+        self.assertEqual(large['stats']['trial_subscribers'], 15)
+        self.assertEqual(large['stats']['total_managed_balance'], '6000.00')
+        self.assertEqual(len(large['subscribers'][0]['accounts']), 2)
+
+
+class FMMarketplaceStatsTests(TestCase):
+    """Marketplace endpoints read the stored FM stats that fm_stats.refresh() computes"""
+
+    def _make_fm(self, email, subscribers):
+        return _make_fm(email, subscribers, trade_data={'account_balance': 1050}, closed_profits=(75, -25))
+
+    def test_refresh_computes_stats(self):
+        fm = self._make_fm('stats@example.com', 4)
+        self.assertEqual(fm_stats.refresh(), 1)
+        self.assertEqual(fm_stats.refresh(), 0)
+
+        fm.refresh_from_db()
+        self.assertEqual(fm.active_subscribers, 4)
+        self.assertEqual(fm.managed_accounts, 4)
+        self.assertEqual(str(fm.managed_balance), '4200.00')
+        self.assertEqual(str(fm.win_rate), '50.00')
+        self.assertEqual(str(fm.total_profit_percent), '5.00')
+
+    def test_list_is_a_single_query(self):
+        for i in range(5):
+            self._make_fm(f'fm{i}@example.com', i)
+        fm_stats.refresh()
+
+        for sort in ('featured', 'subscribers', 'profit'):
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/fund-managers/', {'sort': sort})
+        with self.assertNumQueries(1):
+            self.client.get('/api/fund-managers/leaderboard/', {'metric': 'subscribers'})
+
+        fund_managers = response.json()['fund_managers']
+        self.assertEqual(len(fund_managers), 5)
+        self.assertEqual(sorted(fm['subscriber_count'] for fm in fund_managers), [0, 1, 2, 3, 4])
+
+    def test_new_subscription_reaches_the_cached_list(self):
+        fm = self._make_fm('cached@example.com', 1)
+        fm_stats.refresh()
+        cache.clear()
+        self.client.get('/api/fund-managers/')
+
+        user = User.objects.create(username='late@example.com', email='late@example.com')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            FMSubscription.objects.create(
+                user=user, fund_manager=fm, status='trial', price_at_subscription=0,
+                current_period_end=timezone.now() + timedelta(days=7),
+            )
+            # A read before the commit may cache the old count again
+            self.client.get('/api/fund-managers/')
+
+        self.assertEqual(len(callbacks), 1)
+        fund_managers = self.client.get('/api/fund-managers/').json()['fund_managers']
+        self.assertEqual(fund_managers[0]['subscriber_count'], 2)
+
+
+class ResponseCacheTests(TestCase):
+    """Public read-only endpoints are served from the response cache with ETag/304"""
+
+    def setUp(self):
+        SiteSettings.get_settings()
+        SubscriptionPlan.objects.create(name='Monthly', price=10, duration_days=30)
+        cache.clear()
+
+    def test_cached_until_a_plan_changes(self):
+        first = self.client.get('/api/plans/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/plans/')
+        self.assertEqual(second.content, first.content)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get('/api/plans/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+
+        SubscriptionPlan.objects.create(name='Yearly', price=100, duration_days=365)
+        changed = self.client.get('/api/plans/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(len(changed.json()['plans']), 2)
+
+
+@override_settings(USER_RESOLVE_CACHE_TTL=0)
+class FMToggleEAQueryCountTests(TestCase):
+    """fm_toggle_ea on 'all' is set-based: the query count does not grow with the accounts"""
+
+    # resolve_user, FM profile, savepoint, assignments, assignment UPDATE, license UPDATE,
+    # FMCommand INSERT, TradeCommand bulk INSERT, release savepoint
+    QUERIES = 9
+
+    def _make_fm(self, email, subscribers):
+        return _make_fm(email, subscribers, accounts=2, password='secret')
+
+    def _toggle(self, email, action):
+        response = self.client.post('/api/fund-managers/toggle-ea/', data=json.dumps({
+            'email': email, 'action': action, 'target': 'all', 'password': 'secret',
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['command']
+
+    def test_query_count_is_constant(self):
+        small = self._make_fm('small@example.com', 1)
+        large = self._make_fm('large@example.com', 25)
+
+        with self.assertNumQueries(self.QUERIES):
+            self._toggle('small@example.com', 'ea_off')
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(self.QUERIES):
+            command = self._toggle('large@example.com', 'ea_off')
+
+        self.assertEqual(command['affected_accounts'], 50)
+        self.assertEqual(len(callbacks), 4)
+        self.assertEqual(TradeCommand.objects.filter(license__fm_assignments__subscription__fund_manager=large).count(), 50)
+        self.assertEqual(License.objects.filter(fm_assignments__subscription__fund_manager=large, status='suspended').count(), 50)
+        self.assertFalse(FMAccountAssignment.objects.filter(subscription__fund_manager=large, is_ea_active=True).exists())
+        self.assertEqual(FMCommand.objects.filter(fund_manager=small).count(), 1)
+
+    @mock.patch.object(mail_queue, '_ensure_worker')
+    def test_emails_go_through_the_mail_queue(self, ensure_worker):
+        from core import fm_views
+
+        self._make_fm('mailer@example.com', 3)
+        mail_queue.drain()
+        with mock.patch.object(fm_views, '_send_fm_email') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._toggle('mailer@example.com', 'ea_on')
+            send.assert_not_called()
+            self.assertEqual(mail_queue.drain(), 3)
+
+        self.assertEqual(
+            sorted(call.kwargs['to_email'] for call in send.call_args_list),
+            ['sub0.mailer@example.com', 'sub1.mailer@example.com', 'sub2.mailer@example.com'],
+        )
+        self.assertTrue(all('Started' in call.kwargs['subject'] for call in send.call_args_list))
+
+
+@mock.patch.object(trade_buffer, '_ensure_worker')
+class TradeBufferFlushTests(TestCase):
+    """Write-behind flush of buffered TradeData snapshots"""
+
+    def setUp(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='buffer@example.com', email='buffer@example.com')
+        self.license = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+        trade_buffer.flush()
+
+    def _fields(self, balance):
+        return {'account_balance': balance, 'account_equity': balance, 'total_buy_positions': 1}
+
+    def test_first_snapshot_of_a_new_account_is_written(self, ensure_worker):
+        received_at = timezone.now() - timedelta(seconds=5)
+        trade_buffer.enqueue(self.license.id, '', self._fields(250), received_at)
+
+        self.assertEqual(trade_buffer.flush(), 1)
+
+        row = TradeData.objects.get(license=self.license, mt5_account='')
+        self.assertEqual(str(row.account_balance), '250.00')
+        self.assertEqual(row.total_buy_positions, 1)
+        self.assertEqual(row.last_update, received_at)
+
+    def test_older_snapshot_does_not_overwrite_a_newer_row(self, ensure_worker):
+        now = timezone.now()
+        trade_buffer.enqueue(self.license.id, '', self._fields(300), now)
+        trade_buffer.flush()
+
+        trade_buffer.enqueue(self.license.id, '', self._fields(100), now - timedelta(seconds=1))
+        self.assertEqual(trade_buffer.flush(), 0)
+
+        row = TradeData.objects.get(license=self.license, mt5_account='')
+        self.assertEqual(str(row.account_balance), '300.00')
+
+    def test_failed_flush_is_retried_with_the_newest_snapshot(self, ensure_worker):
+        now = timezone.now()
+        trade_buffer.enqueue(self.license.id, '', self._fields(100), now - timedelta(seconds=2))
+        with mock.patch.object(trade_buffer, '_write', side_effect=RuntimeError('db down')):
+            with self.assertLogs('core.trade_buffer', 'ERROR'):
+                self.assertEqual(trade_buffer.flush(), 0)
+        self.assertEqual(trade_buffer.get_stats()['pending'], 1)
+
+        trade_buffer.enqueue(self.license.id, '', self._fields(200), now)
+        self.assertEqual(trade_buffer.flush(), 1)
+
+        row = TradeData.objects.get(license=self.license, mt5_account='')
+        self.assertEqual(str(row.account_balance), '200.00')
+
+
+@override_settings(TRADE_DATA_WRITE_BEHIND=True)
+@mock.patch.object(trade_buffer, '_ensure_worker')
+class WriteBehindClosedPositionsTests(TestCase):
+    """Closed trades are stored before the EA gets its answer, even with write-behind on"""
+
+    def test_closed_positions_are_not_buffered(self, ensure_worker):
+        cache.clear()
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='closed@example.com', email='closed@example.com')
+        lic = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10), status='active')
+        payload = {
+            'license_key': lic.license_key, 'account_balance': 100,
+            'closed_positions': [{'ticket': 11, 'profit': 5, 'close_time': '2026.10.18 10:00'}],
+        }
+
+        response = self.client.post('/api/trade-data/update/', data=json.dumps(payload), content_type='application/json')
+
+        self.assertTrue(response.json()['success'])
+        self.assertTrue(ClosedPosition.objects.filter(license=lic, ticket=11).exists())
+        self.assertFalse(TradeData.objects.filter(license=lic).exists())
+        trade_buffer.flush()
+        self.assertTrue(TradeData.objects.filter(license=lic).exists())
+
+
+@override_settings(TRADE_DATA_WRITE_BEHIND=False)
+class SyncClosedPositionsTests(TestCase):
+    """Without write-behind, a re-sent 24h window of closed trades is not inserted again"""
+
+    def tearDown(self):
+        trade_broadcast._pending.clear()
+
+    def test_unchanged_window_is_skipped(self):
+        cache.clear()
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='sync@example.com', email='sync@example.com')
+        lic = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10), status='active')
+        closed = [{'ticket': 11, 'profit': 5, 'close_time': '2026.10.18 10:00'}]
+
+        def push(balance):
+            payload = {'license_key': lic.license_key, 'account_balance': balance, 'closed_positions': closed}
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post('/api/trade-data/update/', data=json.dumps(payload), content_type='application/json')
+            return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT') and 'core_closedposition' in q['sql']]
+
+        self.assertEqual(len(push(100)), 1)
+        self.assertEqual(push(100), [])
+        self.assertEqual(push(110), [])
+
+        closed.append({'ticket': 12, 'profit': -2, 'close_time': '2026.10.18 11:00'})
+        self.assertEqual(len(push(110)), 1)
+        self.assertEqual(sorted(ClosedPosition.objects.filter(license=lic).values_list('ticket', flat=True)), [11, 12])
+
+
+@override_settings(LICENSE_CACHE_TTL=60)
+class LicenseCacheTests(TestCase):
+    """get_license serves the EA endpoints from the cache until the license or its plan changes"""
+
+    def setUp(self):
+        self.plan = SubscriptionPlan.objects.create(name='Plan', max_accounts=1, price=0, duration_days=30)
+        user = User.objects.create(username='cache@example.com', email='cache@example.com')
+        self.license = License.objects.create(user=user, plan=self.plan, expires_at=timezone.now() + timedelta(days=10))
+        cache.clear()
+
+    def test_lookups_are_cached(self):
+        get_license(self.license.license_key)
+        get_license('NOPE')
+        with self.assertNumQueries(0):
+            cached = get_license(self.license.license_key)
+            missing = get_license('NOPE')
+        self.assertEqual(cached.plan.max_accounts, 1)
+        self.assertIsNone(missing)
+
+    def test_save_invalidates_after_commit(self):
+        get_license(self.license.license_key)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.license.status = 'suspended'
+            self.license.save()
+            self.assertEqual(get_license(self.license.license_key).status, 'active')
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(get_license(self.license.license_key).status, 'suspended')
+
+    def test_delete_invalidates(self):
+        key = self.license.license_key
+        get_license(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.license.delete()
+
+        self.assertIsNone(get_license(key))
+
+    def test_plan_change_invalidates_its_licenses(self):
+        get_license(self.license.license_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.max_accounts = 3
+            self.plan.save()
+
+        self.assertEqual(get_license(self.license.license_key).plan.max_accounts, 3)
+
+
+@override_settings(FM_CHAT_BUFFER_REDIS_URL='')
+class VerifyAndBindTests(TestCase):
+    """MT5 account binding on verify: first bind, returning account, max accounts, legacy binding"""
+
+    def _license(self, max_accounts=1, **fields):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30, max_accounts=max_accounts)
+        user = User.objects.create(username=f'bind{plan.id}@example.com')
+        return License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10), **fields)
+
+    def _bindings(self, lic):
+        return dict(LicenseMT5Account.objects.filter(license=lic).values_list('mt5_account', 'hardware_id'))
+
+    def test_first_bind(self):
+        lic = self._license()
+        self.assertIsNone(verify_and_bind(lic, '1001', 'hw-1'))
+
+        self.assertEqual(self._bindings(lic), {'1001': 'hw-1'})
+        lic.refresh_from_db()
+        self.assertEqual((lic.mt5_account, lic.hardware_id, lic.verification_count), ('1001', 'hw-1', 1))
+
+    def test_returning_account(self):
+        lic = self._license()
+        verify_and_bind(lic, '1001', '')
+        first_seen = LicenseMT5Account.objects.get(license=lic).last_seen
+
+        self.assertIsNone(verify_and_bind(lic, '1001', 'hw-2'))
+        binding = LicenseMT5Account.objects.get(license=lic)
+        self.assertEqual(binding.hardware_id, 'hw-2')
+        self.assertGreater(binding.last_seen, first_seen)
+        lic.refresh_from_db()
+        self.assertEqual(lic.verification_count, 2)
+
+    def test_max_accounts_rejects_and_rolls_back(self):
+        lic = self._license()
+        verify_and_bind(lic, '1001', 'hw-1')
+
+        self.assertEqual(verify_and_bind(lic, '1002', 'hw-2'), 'Max accounts reached (1)')
+        self.assertEqual(self._bindings(lic), {'1001': 'hw-1'})
+        lic.refresh_from_db()
+        self.assertEqual(lic.verification_count, 1)
+
+    def test_legacy_binding_moves_into_the_table(self):
+        lic = self._license(max_accounts=2, mt5_account='5005', hardware_id='hw-old')
+        self.assertIsNone(verify_and_bind(lic, '1001', 'hw-1'))
+        self.assertEqual(self._bindings(lic), {'5005': 'hw-old', '1001': 'hw-1'})
+        lic.refresh_from_db()
+        self.assertEqual(lic.mt5_account, '5005')
+
+    def test_legacy_binding_counts_towards_max_accounts(self):
+        lic = self._license(mt5_account='5005')
+        self.assertEqual(verify_and_bind(lic, '1001', ''), 'Max accounts reached (1)')
+        self.assertEqual(self._bindings(lic), {})
+
+
+@override_settings(FM_ACCESS_CACHE_TTL=300)
+class FMAccessTests(TestCase):
+    """Cached FM chat access follows subscriptions and FM changes, admin bulk deletes included"""
+
+    def setUp(self):
+        cache.clear()
+        self.fm = _make_fm('access@example.com', 0)
+        self.user = User.objects.create(username='member@example.com', email='member@example.com')
+
+    def _subscribe(self, status='active'):
+        return FMSubscription.objects.create(
+            user=self.user, fund_manager=self.fm, status=status,
+            price_at_subscription=0, current_period_end=timezone.now() + timedelta(days=10),
+        )
+
+    def _role(self):
+        return fm_access.get_access(self.fm.id, self.user.id)[1]
+
+    def test_grant_and_revoke_on_save_and_delete(self):
+        self.assertIsNone(self._role())
+        sub = self._subscribe()
+        self.assertEqual(self._role(), 'subscriber')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._role(), 'subscriber')
+
+        sub.status = 'cancelled'
+        sub.save()
+        self.assertIsNone(self._role())
+
+        sub.status = 'trial'
+        sub.save()
+        self.assertEqual(self._role(), 'subscriber')
+        sub.delete()
+        self.assertIsNone(self._role())
+
+    def test_fund_manager_change(self):
+        self.assertTrue(fm_access.get_access(self.fm.id, self.user.id)[0]['approved'])
+        self.fm.status = 'suspended'
+        self.fm.save()
+        self.assertFalse(fm_access.get_access(self.fm.id, self.user.id)[0]['approved'])
+
+    def test_admin_bulk_deletes(self):
+        from django.contrib import admin
+
+        self._subscribe()
+        self.assertEqual(self._role(), 'subscriber')
+        admin.site._registry[FMSubscription].delete_queryset(None, FMSubscription.objects.filter(user=self.user))
+        self.assertIsNone(self._role())
+        self.fm.refresh_from_db()
+        self.assertEqual(self.fm.active_subscribers, 0)
+
+        self.assertIsNotNone(fm_access.get_access(self.fm.id, self.user.id)[0])
+        admin.site._registry[FundManager].delete_queryset(None, FundManager.objects.filter(id=self.fm.id))
+        self.assertEqual(fm_access.get_access(self.fm.id, self.user.id), (None, None))
+
+
+@override_settings(VERIFICATION_LOG_ASYNC=True, VERIFICATION_LOG_QUEUE_SIZE=2, VERIFICATION_LOG_QUEUE_POLICY='drop')
+@mock.patch.object(verification_log, '_ensure_worker')
+class VerificationLogQueueTests(TestCase):
+    """Verification log records are queued, bounded and written in batches"""
+
+    def setUp(self):
+        verification_log._queue = None
+
+    def tearDown(self):
+        verification_log._take(10)
+        verification_log._queue = None
+
+    def _log(self, n=1):
+        for i in range(n):
+            verification_log.log(None, f'KEY-{i}', '1001', '', '127.0.0.1', False, 'Invalid license key')
+
+    def _dropped(self):
+        return metrics.snapshot('verification_log.').get('verification_log.dropped', 0)
+
+    def test_queued_then_flushed(self, ensure_worker):
+        self._log(2)
+        ensure_worker.assert_called()
+        self.assertFalse(LicenseVerificationLog.objects.exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(verification_log.drain(), 2)
+        self.assertEqual(sorted(LicenseVerificationLog.objects.values_list('license_key', flat=True)), ['KEY-0', 'KEY-1'])
+        self.assertEqual(verification_log.drain(), 0)
+
+    def test_writer_thread_flushes(self, ensure_worker):
+        self._log(2)
+        with mock.patch.object(verification_log.time, 'sleep', side_effect=[None, RuntimeError]), \
+                mock.patch.object(verification_log, 'close_old_connections'):
+            with self.assertRaises(RuntimeError):
+                verification_log._run()
+        self.assertEqual(LicenseVerificationLog.objects.count(), 2)
+
+    def test_full_queue_drops(self, ensure_worker):
+        dropped = self._dropped()
+        self._log(3)
+        self.assertEqual(self._dropped() - dropped, 1)
+        self.assertEqual(verification_log.drain(), 2)
+
+    @override_settings(VERIFICATION_LOG_QUEUE_SIZE=1, VERIFICATION_LOG_QUEUE_POLICY='block', VERIFICATION_LOG_BLOCK_TIMEOUT=0.2)
+    def test_block_policy_waits_for_room(self, ensure_worker):
+        dropped = self._dropped()
+        self._log()
+        started = time.monotonic()
+        self._log()
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(self._dropped() - dropped, 1)
+
+        threading.Timer(0.01, verification_log._take, args=(1,)).start()
+        self._log()
+        self.assertEqual(self._dropped() - dropped, 1)
+        self.assertEqual(verification_log.drain(), 1)
+
+    def test_flush_on_exit(self, ensure_worker):
+        self._log(2)
+        verification_log._drain_on_exit()
+        self.assertEqual(LicenseVerificationLog.objects.count(), 2)
+
+
+class ChatBufferTests(TestCase):
+    """Edited or deleted messages must not be replayed from the resume buffer"""
+
+    def setUp(self):
+        user = User.objects.create(username='chat@example.com', email='chat@example.com')
+        self.fm = FundManager.objects.create(user=user, display_name='Chat', status='approved')
+        room = FMChatRoom.objects.create(fund_manager=self.fm)
+        self.msg = FMChatMessage.objects.create(chat_room=room, sender=user, message='hello')
+        chat_buffer.clear(self.fm.id)
+        chat_buffer.append(self.fm.id, {'id': self.msg.id, 'message': 'hello'})
+
+    def test_pin_keeps_the_buffer(self):
+        self.msg.is_pinned = True
+        self.msg.save(update_fields=['is_pinned'])
+        self.assertEqual(len(chat_buffer.recent(self.fm.id)), 1)
+
+    def test_edit_and_delete_clear_the_buffer(self):
+        self.msg.message = 'edited'
+        self.msg.save()
+        self.assertEqual(chat_buffer.recent(self.fm.id), [])
+
+        chat_buffer.append(self.fm.id, {'id': self.msg.id, 'message': 'edited'})
+        self.msg.delete()
+        self.assertEqual(chat_buffer.recent(self.fm.id), [])
+
+
+@override_settings(USER_RESOLVE_CACHE_TTL=0)
+class FMChatPageTests(TestCase):
+    """fm_get_chat pages newest first, before_id seeks past ties on created_at"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='room@example.com', email='room@example.com')
+        self.fm = FundManager.objects.create(user=user, display_name='Room', status='approved')
+        room = FMChatRoom.objects.create(fund_manager=self.fm)
+        FMChatMessage.objects.bulk_create(
+            FMChatMessage(chat_room=room, sender=user, message=str(i)) for i in range(120)
+        )
+        # Three messages share each created_at (a page boundary falls inside a tie)
+        base = timezone.now() - timedelta(hours=1)
+        for i, msg in enumerate(FMChatMessage.objects.order_by('id')):
+            FMChatMessage.objects.filter(id=msg.id).update(created_at=base + timedelta(seconds=i // 3))
+        self.newest_first = list(FMChatMessage.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def _get(self, **params):
+        response = self.client.post(
+            '/api/fund-managers/chat/',
+            data=json.dumps({'email': 'room@example.com', 'fund_manager_id': self.fm.id, **params}),
+            content_type='application/json',
+        )
+        return response
+
+    def test_before_id_walks_every_message_once(self):
+        seen, before_id, pages = [], None, 0
+        while True:
+            body = self._get(before_id=before_id).json()
+            seen += [m['id'] for m in body['messages']]
+            pages += 1
+            if not body['has_more']:
+                self.assertIsNone(body['next_before_id'])
+                break
+            self.assertEqual(body['next_before_id'], seen[-1])
+            before_id = body['next_before_id']
+        self.assertEqual(seen, self.newest_first)
+        self.assertEqual(pages, 3)
+
+    def test_before_id_wins_over_page(self):
+        body = self._get(before_id=self.newest_first[49], page=3).json()
+        self.assertEqual([m['id'] for m in body['messages']], self.newest_first[50:100])
+        self.assertTrue(body['has_more'])
+
+    def test_page_matches_before_id(self):
+        body = self._get(page='2').json()
+        self.assertEqual([m['id'] for m in body['messages']], self.newest_first[50:100])
+
+    def test_invalid_page_and_before_id(self):
+        self.assertEqual(self._get(page='abc').status_code, 400)
+        self.assertEqual(self._get(before_id='abc').status_code, 400)
+
+
+class PresenceTests(TestCase):
+    """Without Redis there is no shared presence, every license must count as watched"""
+
+    @override_settings(TRADE_BROADCAST_PRESENCE=True, PRESENCE_REDIS_URL='')
+    def test_no_redis_means_watched(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='watch@example.com', email='watch@example.com')
+        lic = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+
+        self.assertFalse(presence.enabled())
+        self.assertTrue(presence.is_watched(lic))
+
+
+class ClosedPositionsPageTests(TestCase):
+    """Closed positions page newest first, deals without a close time last"""
+
+    def test_pages_put_missing_close_times_last(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='closed@example.com', email='closed@example.com')
+        lic = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+        now = timezone.now()
+        for ticket, minutes in [(1, 30), (2, None), (3, 10), (4, None), (5, 20)]:
+            close_time = now - timedelta(minutes=minutes) if minutes is not None else None
+            ClosedPosition.objects.create(license=lic, ticket=ticket, close_time=close_time)
+
+        tickets, cursor = [], None
+        while True:
+            page, total, cursor = get_closed_positions(lic, limit=2, before_ticket=cursor)
+            tickets.extend(p['ticket'] for p in page)
+            if cursor is None:
+                break
+
+        self.assertEqual(total, 5)
+        self.assertEqual(tickets, [3, 5, 1, 4, 2])
+
+
+class AccountStateTests(TestCase):
+    """LicenseAccountState follows the newest TradeData row of its license"""
+
+    def setUp(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='state@example.com', email='state@example.com')
+        self.license = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+
+    def test_save_records_state_in_one_query(self):
+        row = TradeData.objects.create(license=self.license, mt5_account='1', account_balance=100)
+        row.account_balance = 150
+        with self.assertNumQueries(2):
+            row.save()
+
+        state = LicenseAccountState.objects.get(license=self.license)
+        self.assertEqual(state.trade_data_id, row.id)
+        self.assertEqual(str(state.account_balance), '150.00')
+
+    def test_older_account_does_not_replace_newer_state(self):
+        older = TradeData.objects.create(license=self.license, mt5_account='2', account_balance=999)
+        newer = TradeData.objects.create(license=self.license, mt5_account='1', account_balance=100)
+        older.last_update = newer.last_update - timedelta(minutes=5)
+
+        self.assertEqual(account_state.record([older]), 0)
+        self.assertEqual(LicenseAccountState.objects.get(license=self.license).trade_data_id, newer.id)
+
+        # The row the state came from always wins (write-behind rewrites it with the EA's time)
+        newer.last_update -= timedelta(seconds=1)
+        self.assertEqual(account_state.record([newer]), 1)
+
+
+@override_settings(TRADE_DATA_WRITE_BEHIND=False)
+class TradeDeltaTests(TestCase):
+    """Delta pushes patch the last full snapshot, a sequence gap asks the EA to resync"""
+
+    def setUp(self):
+        cache.clear()
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='delta@example.com', email='delta@example.com')
+        self.license = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+
+    def _push(self, **payload):
+        response = self.client.post(
+            '/api/trade-data/update/',
+            data=json.dumps({'license_key': self.license.license_key, **payload}),
+            content_type='application/json',
+        )
+        return response.json()
+
+    def test_delta_is_applied_to_the_last_snapshot(self):
+        body = self._push(seq=1, open_positions=[{'ticket': 1, 'profit': 1.0}, {'ticket': 2, 'profit': 2.0}])
+        self.assertEqual(body['seq'], 1)
+
+        body = self._push(seq=2, delta={'open_positions': {
+            'added': [{'ticket': 3, 'profit': 0.5}], 'removed': [2], 'changed': [{'ticket': 1, 'profit': 5.0}],
+        }})
+
+        self.assertEqual(body['seq'], 2)
+        row = TradeData.objects.get(license=self.license)
+        self.assertEqual(row.open_positions, [{'ticket': 3, 'profit': 0.5}, {'ticket': 1, 'profit': 5.0}])
+
+    def test_sequence_gap_requests_a_full_push(self):
+        self._push(seq=1, open_positions=[{'ticket': 1, 'profit': 1.0}])
+
+        body = self._push(seq=3, delta={'open_positions': {'removed': [1]}})
+
+        self.assertTrue(body['resync'])
+        self.assertEqual(TradeData.objects.get(license=self.license).open_positions, [{'ticket': 1, 'profit': 1.0}])
+
+    def test_legacy_full_push_drops_the_snapshot(self):
+        self._push(seq=1, open_positions=[{'ticket': 1}])
+        self._push(open_positions=[{'ticket': 1}])
+
+        self.assertTrue(self._push(seq=2, delta={})['resync'])
+
+
+@override_settings(TRADE_DATA_WRITE_BEHIND=False)
+@mock.patch.object(trade_broadcast, 'publish')
+class TradeFingerprintTests(TestCase):
+    """An unchanged push only bumps last_update and is not broadcast"""
+
+    def setUp(self):
+        cache.clear()
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='idle@example.com', email='idle@example.com')
+        self.license = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+
+    def _push(self, balance):
+        self.client.post(
+            '/api/trade-data/update/',
+            data=json.dumps({'license_key': self.license.license_key, 'account_balance': balance}),
+            content_type='application/json',
+        )
+
+    def test_unchanged_push_skips_rewrite_and_broadcast(self, publish):
+        self._push(100)
+        first = TradeData.objects.get(license=self.license)
+        # Marker the full rewrite would overwrite
+        TradeData.objects.filter(id=first.id).update(symbol='MARKER')
+
+        self._push(100)
+
+        row = TradeData.objects.get(id=first.id)
+        self.assertEqual(row.symbol, 'MARKER')
+        self.assertGreater(row.last_update, first.last_update)
+        self.assertEqual(publish.call_count, 1)
+
+    def test_changed_push_is_written_and_broadcast(self, publish):
+        self._push(100)
+        self._push(101)
+
+        self.assertEqual(str(TradeData.objects.get(license=self.license).account_balance), '101.00')
+        self.assertEqual(publish.call_count, 2)
+
+
+class WsAuthTests(TestCase):
+    """Dashboard WebSocket tokens identify an active user until expiry or a password change"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ws@example.com', email='ws@example.com', password='secret-1')
+
+    def test_valid_token(self):
+        self.assertEqual(ws_auth.user_from_token(ws_auth.make_token(self.user)), self.user)
+
+    def test_rejected_tokens(self):
+        token = ws_auth.make_token(self.user)
+        self.assertIsNone(ws_auth.user_from_token(''))
+        self.assertIsNone(ws_auth.user_from_token(token[:-2] + 'xx'))
+        with override_settings(DASHBOARD_WS_TOKEN_MAX_AGE=-1):
+            self.assertIsNone(ws_auth.user_from_token(token))
+
+    def test_password_change_revokes_tokens(self):
+        token = ws_auth.make_token(self.user)
+        self.user.set_password('secret-2')
+        self.user.save()
+        self.assertIsNone(ws_auth.user_from_token(token))
+
+    def test_inactive_user_is_rejected(self):
+        token = ws_auth.make_token(self.user)
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertIsNone(ws_auth.user_from_token(token))
+
+
+class ExpireTradeCommandsTests(TestCase):
+    """expire_trade_commands marks pending commands past their expiry in one UPDATE"""
+
+    def test_only_stale_pending_commands_expire(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='cmd@example.com', email='cmd@example.com')
+        lic = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+        past, future = timezone.now() - timedelta(minutes=1), timezone.now() + timedelta(minutes=5)
+        stale = TradeCommand.objects.create(license=lic, command_type='CLOSE_ALL', expires_at=past)
+        live = TradeCommand.objects.create(license=lic, command_type='CLOSE_ALL', expires_at=future)
+        done = TradeCommand.objects.create(license=lic, command_type='CLOSE_ALL', expires_at=past, status='executed')
+
+        out = StringIO()
+        with self.assertNumQueries(1):
+            call_command('expire_trade_commands', stdout=out)
+
+        self.assertIn('Expired 1 trade commands', out.getvalue())
+        statuses = dict(TradeCommand.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {stale.id: 'expired', live.id: 'pending', done.id: 'executed'})
+
+
+@override_settings(LICENSE_CACHE_TTL=0)
+class CommandStatusBatchTests(TestCase):
+    """update_command_status_batch: per-item results, own commands only, result statuses only"""
+
+    def setUp(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='batch@example.com', email='batch@example.com')
+        expires = timezone.now() + timedelta(days=10)
+        self.license = License.objects.create(user=user, plan=plan, expires_at=expires)
+        self.other = License.objects.create(user=user, plan=plan, expires_at=expires)
+
+    def _command(self, license):
+        return TradeCommand.objects.create(license=license, command_type='CLOSE_ALL')
+
+    def _post(self, commands):
+        response = self.client.post(
+            '/api/trade-commands/update-status/batch/',
+            data=json.dumps({'license_key': self.license.license_key, 'commands': commands}),
+            content_type='application/json',
+        )
+        return response.json()
+
+    def test_updates_own_commands_only(self):
+        own, foreign = self._command(self.license), self._command(self.other)
+        body = self._post([
+            {'command_id': own.id, 'status': 'failed', 'result_message': 'No position'},
+            {'command_id': foreign.id, 'status': 'executed'},
+        ])
+
+        self.assertEqual(body['updated'], 1)
+        self.assertEqual([r['success'] for r in body['results']], [True, False])
+        own.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual((own.status, own.result_message), ('failed', 'No position'))
+        self.assertIsNotNone(own.executed_at)
+        self.assertEqual(foreign.status, 'pending')
+
+    def test_only_result_statuses_are_accepted(self):
+        executed = self._command(self.license)
+        TradeCommand.objects.filter(id=executed.id).update(status='executed')
+        body = self._post([
+            {'command_id': executed.id, 'status': 'pending'},
+            {'command_id': executed.id, 'status': 'expired'},
+            {'command_id': executed.id, 'status': 'bogus'},
+        ])
+
+        self.assertEqual(body['updated'], 0)
+        self.assertEqual({r['message'] for r in body['results']}, {'Invalid status'})
+        executed.refresh_from_db()
+        self.assertEqual(executed.status, 'executed')
+
+    def test_malformed_ids(self):
+        command = self._command(self.license)
+        body = self._post([{'command_id': 'abc'}, {'command_id': None}, 'junk', {'command_id': str(command.id)}])
+
+        self.assertEqual(
+            [(r['command_id'], r['success']) for r in body['results']],
+            [(None, False), (None, False), (None, False), (command.id, True)],
+        )
+
+    def test_batch_size_is_capped(self):
+        from core.views import COMMAND_STATUS_BATCH_MAX
+
+        command = self._command(self.license)
+        body = self._post([{'command_id': command.id}] * (COMMAND_STATUS_BATCH_MAX + 1))
+
+        self.assertFalse(body['success'])
+        command.refresh_from_db()
+        self.assertEqual(command.status, 'pending')
+
+
+@override_settings(TRADE_COMMAND_LONG_POLL_MAX_WAIT=1, LICENSE_CACHE_TTL=0)
+class PendingCommandsLongPollTests(TestCase):
+    """get_pending_commands(wait=N) answers at once, on a new command or after N seconds"""
+
+    def setUp(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='poll@example.com', email='poll@example.com')
+        self.license = License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+
+    async def _poll(self, wait):
+        response = await AsyncClient().get(
+            '/api/trade-commands/pending/', {'license_key': self.license.license_key, 'wait': wait}
+        )
+        return [cmd['id'] for cmd in response.json()['commands']]
+
+    def _create_command(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TradeCommand.objects.create(license=self.license, command_type='CLOSE_ALL').id
+
+    async def test_pending_command_returns_immediately(self):
+        command_id = await sync_to_async(self._create_command)()
+        started = time.monotonic()
+        self.assertEqual(await self._poll(1), [command_id])
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    async def test_new_command_wakes_the_poll(self):
+        async def create_later():
+            await asyncio.sleep(0.1)
+            return await sync_to_async(self._create_command)()
+
+        started = time.monotonic()
+        ids, command_id = await asyncio.gather(self._poll(1), create_later())
+        self.assertEqual(ids, [command_id])
+        self.assertLess(time.monotonic() - started, 0.9)
+
+    async def test_times_out_with_an_empty_list(self):
+        started = time.monotonic()
+        self.assertEqual(await self._poll(5), [])
+        self.assertGreaterEqual(time.monotonic() - started, 1)
+
+
+class _FrameSocket(trade_broadcast.TradeFrameMixin):
+    """TradeFrameMixin without a channel layer, collecting what it would send"""
+
+    def __init__(self, query=b''):
+        self.scope = {'query_string': query}
+        self.sent = []
+        self.setup_frames()
+
+    async def send(self, text_data=None):
+        self.sent.append(text_data)
+
+
+@override_settings(TRADE_WS_MAX_FPS=20)
+class TradeFrameCoalescingTests(SimpleTestCase):
+    """A socket gets at most TRADE_WS_MAX_FPS frames per license, the latest one wins"""
+
+    async def test_updates_within_the_interval_are_coalesced(self):
+        sock = _FrameSocket()
+        for text in ('a', 'b', 'c'):
+            await sock.trade_update({'type': 'trade_update', 'license_key': 'K', 'text': text})
+        await asyncio.sleep(0.01)
+        self.assertEqual(sock.sent, ['c'])
+
+        for text in ('d', 'e'):
+            await sock.trade_update({'type': 'trade_update', 'license_key': 'K', 'text': text})
+        await sock.trade_update({'type': 'trade_update', 'license_key': 'L', 'text': 'x'})
+        await asyncio.sleep(0.01)
+        self.assertEqual(sock.sent, ['c', 'x'])
+
+        await asyncio.sleep(0.1)
+        self.assertEqual(sock.sent, ['c', 'x', 'e'])
+        sock.stop_frames()
+
+
+@override_settings(TRADE_WS_MAX_FPS=0)
+class TradeDiffFrameTests(SimpleTestCase):
+    """?protocol=diff sockets get a snapshot, then ticket-addressed patches"""
+
+    def test_diff_addresses_positions_by_ticket(self):
+        old = {'balance': 1, 'open_positions': [{'ticket': 1, 'profit': 1}, {'ticket': 2, 'profit': 2}]}
+        new = {'balance': 2, 'open_positions': [{'ticket': 1, 'profit': 5}, {'ticket': 3, 'profit': 0}]}
+
+        self.assertEqual(trade_broadcast.diff(old, new), [
+            {'op': 'replace', 'path': '/balance', 'value': 2},
+            {'op': 'remove', 'path': '/open_positions/2'},
+            {'op': 'replace', 'path': '/open_positions/1/profit', 'value': 5},
+            {'op': 'add', 'path': '/open_positions/3', 'value': {'ticket': 3, 'profit': 0}},
+        ])
+
+    def test_reordered_list_is_replaced(self):
+        old = {'open_positions': [{'ticket': 1}, {'ticket': 2}]}
+        new = {'open_positions': [{'ticket': 2}, {'ticket': 1}]}
+        self.assertEqual(
+            trade_broadcast.diff(old, new),
+            [{'op': 'replace', 'path': '/open_positions', 'value': new['open_positions']}],
+        )
+
+    async def test_snapshot_then_patches_then_resync(self):
+        sock = _FrameSocket(b'protocol=diff')
+        for balance in (1, 1, 2):
+            text = json.dumps({'license_key': 'K', 'balance': balance})
+            await sock.trade_update({'type': 'trade_update', 'license_key': 'K', 'text': text})
+        await sock.handle_frame_message(json.dumps({'type': 'resync', 'license_key': 'K'}))
+
+        frames = [json.loads(text) for text in sock.sent]
+        self.assertEqual([(f['type'], f['seq']) for f in frames], [('snapshot', 1), ('patch', 2), ('snapshot', 3)])
+        self.assertEqual(frames[1]['ops'], [{'op': 'replace', 'path': '/balance', 'value': 2}])
+        self.assertEqual(frames[2]['data']['balance'], 2)
+
+
+@override_settings(TRADE_BROADCAST_ASYNC=True, TRADE_BROADCAST_QUEUE_SIZE=2)
+@mock.patch.object(trade_broadcast, '_ensure_worker')
+class TradeBroadcastQueueTests(TestCase):
+    """The publisher queue keeps the latest update per license and is bounded"""
+
+    def tearDown(self):
+        trade_broadcast._pending.clear()
+
+    def test_latest_update_per_license_and_bounded(self, ensure_worker):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        user = User.objects.create(username='owner@example.com', email='owner@example.com')
+        a, b, c = (
+            License.objects.create(user=user, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+            for _ in range(3)
+        )
+
+        trade_broadcast.publish(a, {'n': 1})
+        trade_broadcast.publish(a, {'n': 2})
+        trade_broadcast.publish(b, {'n': 3})
+        trade_broadcast.publish(c, {'n': 4})
+
+        pending = dict(trade_broadcast._pending)
+        self.assertEqual({key: json.loads(text) for key, (_, text) in pending.items()}, {
+            a.license_key: {'n': 2}, b.license_key: {'n': 3},
+        })
+
+        with self.assertNumQueries(0):
+            events = trade_broadcast._events(pending)
+        groups = sorted(group for group, _ in events)
+        owner = trade_broadcast.owner_group(user.id)
+        self.assertEqual(groups, sorted([
+            trade_broadcast.license_group(a.license_key), trade_broadcast.license_group(b.license_key), owner, owner,
+        ]))
+
+
+class OwnerGroupTests(TestCase):
+    """Accounts sharing an email get separate 'trades:all' groups"""
+
+    def test_duplicate_emails_do_not_share_a_group(self):
+        from core.consumers import DashboardConsumer
+
+        first = User.objects.create(username='dup-a', email='same@example.com')
+        second = User.objects.create(username='dup-b', email='same@example.com')
+        groups = []
+        for user in (first, second):
+            consumer = DashboardConsumer()
+            consumer.user, consumer.topics = user, {'trades:all'}
+            groups.append(consumer._wanted_groups())
+
+        self.assertEqual(groups, [{trade_broadcast.owner_group(first.id)}, {trade_broadcast.owner_group(second.id)}])
+        events = trade_broadcast._events({'K': (first.id, '{}')})
+        self.assertNotIn(trade_broadcast.owner_group(second.id), [group for group, _ in events])
+
+
+@override_settings(USER_RESOLVE_CACHE_TTL=60)
+class UserResolverTests(TestCase):
+    """Email/username resolution: case-insensitive, canonical among duplicates, cached"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_case_insensitive_email_and_username(self):
+        user = User.objects.create(username='Trader', email='Trader@Example.com')
+        self.assertEqual(user_resolver.resolve_user('  trader@example.COM '), user)
+        self.assertEqual(user_resolver.resolve_user('TRADER'), user)
+        self.assertIsNone(user_resolver.resolve_user('nobody@example.com'))
+
+    def test_duplicate_email_resolves_to_the_account_with_licenses(self):
+        plan = SubscriptionPlan.objects.create(name='Plan', price=0, duration_days=30)
+        owner = User.objects.create(username='dup1', email='dup@example.com')
+        User.objects.create(username='dup2', email='DUP@example.com')
+        License.objects.create(user=owner, plan=plan, expires_at=timezone.now() + timedelta(days=10))
+
+        self.assertEqual(user_resolver.resolve_user('dup@example.com'), owner)
+        self.assertEqual(user_resolver.resolve_user('dup@example.com'), owner)
+
+    def test_cached_resolution_is_checked_against_the_user(self):
+        user = User.objects.create(username='moved', email='old@example.com')
+        user_resolver.resolve_user('old@example.com')
+        with self.assertNumQueries(1):
+            self.assertEqual(user_resolver.resolve_user('old@example.com'), user)
+
+        User.objects.filter(id=user.id).update(email='new@example.com')
+        self.assertIsNone(user_resolver.resolve_user('old@example.com'))
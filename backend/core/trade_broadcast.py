@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from urllib.parse import parse_qs
+
+from django.conf import settings as django_settings
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# WebSocket fan-out of EA trade updates.
+# update_trade_data() calls publish() once per push: the payload is serialized here, once, and
+# the same text goes to the license group (TradeConsumer) and the owner's group, keyed by user
+# id (DashboardConsumer 'trades:all', AllTradesConsumer). Emails are not unique, so they are
+# never used as group names. With TRADE_BROADCAST_ASYNC (on when Redis is configured) publish()
+# only queues the text and returns; a publisher thread running its own event loop sends
+# everything queued with concurrent group_sends, so the EA response never waits on Redis. The
+# queue keeps the latest update per license (bounded by TRADE_BROADCAST_QUEUE_SIZE licenses).
+# Consumers forward the text as is and, through TradeFrameMixin, send at most TRADE_WS_MAX_FPS
+# frames per second per license. Frames arriving in between replace the one waiting, so a
+# slow or busy socket only ever gets the latest state instead of working through a backlog.
+#
+# Sockets opened with ?protocol=diff get, per license:
+#   {"type": "snapshot", "license_key": K, "seq": n, "data": {...full payload...}}
+# on connect (and after a resync), then
+#   {"type": "patch", "license_key": K, "seq": n, "ops": [...]}
+# with JSON-patch style add/remove/replace ops against the previous frame of that socket.
+# Lists of objects carrying a 'ticket' (open_positions, pending_orders) are addressed by
+# ticket instead of index: /open_positions/<ticket>/profit; an added ticket is appended.
+# seq increases by one per frame; on a gap (or a patch it cannot apply) the client sends
+# {"type": "resync", "license_key": K} and gets a fresh snapshot.
+
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_pending = {}
+_worker_pid = None
+
+
+def license_group(license_key):
+    return f'trade_{license_key}'
+
+
+def owner_group(user_id):
+    return f'trades_user_{user_id}'
+
+
+def frame_interval():
+    """Minimum seconds between frames for one license on one socket (0 = no limit)"""
+    try:
+        fps = float(getattr(django_settings, 'TRADE_WS_MAX_FPS', 2))
+    except (TypeError, ValueError):
+        return 0.0
+    return 1.0 / fps if fps > 0 else 0.0
+
+
+def build_payload(license_key, snapshot, last_update):
+    """WebSocket payload from TradeData column values (trade_buffer.SNAPSHOT_FIELDS)"""
+    return {
+        'license_key': license_key,
+        'account_balance': float(snapshot['account_balance']),
+        'account_equity': float(snapshot['account_equity']),
+        'account_profit': float(snapshot['account_profit']),
+        'account_margin': float(snapshot['account_margin']),
+        'account_free_margin': float(snapshot['account_free_margin']),
+        'total_buy_positions': snapshot['total_buy_positions'],
+        'total_sell_positions': snapshot['total_sell_positions'],
+        'total_buy_lots': float(snapshot['total_buy_lots']),
+        'total_sell_lots': float(snapshot['total_sell_lots']),
+        'total_buy_profit': float(snapshot['total_buy_profit']),
+        'total_sell_profit': float(snapshot['total_sell_profit']),
+        'symbol': snapshot['symbol'],
+        'current_price': float(snapshot['current_price']),
+        'open_positions': snapshot['open_positions'],
+        'pending_orders': snapshot['pending_orders'],
+        'total_pending_orders': snapshot['total_pending_orders'],
+        'trading_mode': snapshot['trading_mode'],
+        'ea_details': snapshot['ea_details'] or {},
+        'last_update': last_update.isoformat() if last_update else None,
+    }
+
+
+def stored_payloads(license_keys=None, owner_ids=None):
+    """Current payloads from TradeData, for the snapshot a diff socket gets on connect"""
+    from core.models import TradeData
+    from core.trade_buffer import SNAPSHOT_FIELDS
+
+    rows = TradeData.objects.select_related('license').order_by('license_id', '-last_update')
+    if license_keys is not None:
+        rows = rows.filter(license__license_key__in=license_keys)
+    if owner_ids is not None:
+        rows = rows.filter(license__user_id__in=owner_ids)
+    payloads = {}
+    for row in rows:
+        key = row.license.license_key
+        if key not in payloads:
+            snapshot = {name: getattr(row, name) for name in SNAPSHOT_FIELDS}
+            payloads[key] = build_payload(key, snapshot, row.last_update)
+    return list(payloads.values())
+
+
+def _setting(name, default):
+    return getattr(django_settings, name, default)
+
+
+def publish(license, payload):
+    """Send payload to the license and owner groups (queued when TRADE_BROADCAST_ASYNC is on)"""
+    from channels.layers import get_channel_layer
+
+    if get_channel_layer() is None:
+        return
+    item = (license.user_id, json.dumps(payload))
+    if not _setting('TRADE_BROADCAST_ASYNC', False):
+        from asgiref.sync import async_to_sync
+        async_to_sync(_send)(_events({license.license_key: item}))
+        return
+
+    with _lock:
+        if license.license_key in _pending:
+            metrics.incr('trade_broadcast.superseded')
+        elif len(_pending) >= max(1, int(_setting('TRADE_BROADCAST_QUEUE_SIZE', 5000))):
+            metrics.incr('trade_broadcast.dropped')
+            return
+        _pending[license.license_key] = item
+    metrics.incr('trade_broadcast.queued')
+    _ensure_worker()
+    _wakeup.set()
+
+
+def _events(batch):
+    """(group, event) pairs for {license_key: (owner user id, text)}"""
+    events = []
+    for license_key, (user_id, text) in batch.items():
+        event = {'type': 'trade_update', 'license_key': license_key, 'text': text}
+        events.append((license_group(license_key), event))
+        if user_id:
+            events.append((owner_group(user_id), event))
+    return events
+
+
+async def _send(events):
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    results = await asyncio.gather(
+        *(channel_layer.group_send(group, event) for group, event in events),
+        return_exceptions=True,
+    )
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    if failed:
+        metrics.incr('trade_broadcast.failed', failed)
+    metrics.incr('trade_broadcast.published', len(events) - failed)
+
+
+def _run():
+    global _pending
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    while True:
+        _wakeup.wait()
+        _wakeup.clear()
+        with _lock:
+            batch, _pending = _pending, {}
+        if not batch:
+            continue
+        try:
+            loop.run_until_complete(_send(_events(batch)))
+        except Exception:
+            metrics.incr('trade_broadcast.failed', len(batch))
+            logger.exception('Failed to publish %d trade updates', len(batch))
+
+
+def _ensure_worker():
+    """Start the publisher thread once per process (gunicorn forks after import)"""
+    global _worker_pid
+    pid = os.getpid()
+    if _worker_pid == pid:
+        return
+    with _lock:
+        if _worker_pid == pid:
+            return
+        _worker_pid = pid
+    threading.Thread(target=_run, name='trade-broadcast-publisher', daemon=True).start()
+
+
+def get_stats():
+    """Publisher counters for this worker process"""
+    counters = metrics.snapshot('trade_broadcast.')
+    stats = {name.split('.', 1)[1]: value for name, value in counters.items()}
+    stats['pending'] = len(_pending)
+    return stats
+
+
+def _escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _tickets(items):
+    """Ticket of every item, or None if the list is not keyed by unique tickets"""
+    tickets = []
+    for item in items:
+        if not isinstance(item, dict) or 'ticket' not in item:
+            return None
+        tickets.append(item['ticket'])
+    return tickets if len(set(map(str, tickets))) == len(tickets) else None
+
+
+def diff(old, new, path=''):
+    """JSON-patch style ops turning old into new (see the protocol notes above)"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{'op': 'remove', 'path': f'{path}/{_escape(key)}'} for key in old if key not in new]
+        for key, value in new.items():
+            child = f'{path}/{_escape(key)}'
+            if key not in old:
+                ops.append({'op': 'add', 'path': child, 'value': value})
+            elif old[key] != value:
+                ops.extend(diff(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        old_tickets, new_tickets = _tickets(old), _tickets(new)
+        if old_tickets is not None and new_tickets is not None:
+            old_items = dict(zip(old_tickets, old))
+            kept = [t for t in old_tickets if t in set(new_tickets)]
+            added = [t for t in new_tickets if t not in old_items]
+            # Only when appending new tickets reproduces the order, otherwise replace the list
+            if kept + added == new_tickets:
+                ops = [{'op': 'remove', 'path': f'{path}/{_escape(t)}'} for t in old_tickets if t not in set(new_tickets)]
+                for ticket, item in zip(new_tickets, new):
+                    child = f'{path}/{_escape(ticket)}'
+                    if ticket not in old_items:
+                        ops.append({'op': 'add', 'path': child, 'value': item})
+                    elif old_items[ticket] != item:
+                        ops.extend(diff(old_items[ticket], item, child))
+                return ops
+
+    if old == new:
+        return []
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+class TradeFrameMixin:
+    """trade_update handler for AsyncWebsocketConsumer with per-license frame coalescing"""
+
+    diff_mode = False
+    _frames = None
+    _last_sent = None
+    _flush_task = None
+    _sent_state = None
+    _seq = None
+
+    def setup_frames(self):
+        """Read the ?protocol= option (call from connect)"""
+        query = parse_qs(self.scope.get('query_string', b'').decode(errors='ignore'))
+        self.diff_mode = query.get('protocol', [''])[0] == 'diff'
+        self._sent_state, self._seq = {}, {}
+
+    async def trade_update(self, event):
+        # 'data' is the pre-publish() event format, still accepted during a rolling deploy
+        text = event['text'] if 'text' in event else json.dumps(event['data'])
+        key = event.get('license_key', '')
+        interval = frame_interval()
+        if not interval:
+            await self._deliver(key, text)
+            return
+
+        if self._frames is None:
+            self._frames, self._last_sent = {}, {}
+        if key in self._frames:
+            metrics.incr('trade_broadcast.coalesced')
+        self._frames[key] = text
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._send_frames(interval))
+
+    async def _send_frames(self, interval):
+        loop = asyncio.get_running_loop()
+        while self._frames:
+            now = loop.time()
+            due = [key for key in self._frames if now - self._last_sent.get(key, float('-inf')) >= interval]
+            if not due:
+                next_at = min(self._last_sent[key] + interval for key in self._frames)
+                await asyncio.sleep(max(0.0, next_at - now))
+                continue
+            for key in due:
+                text = self._frames.pop(key)
+                self._last_sent[key] = loop.time()
+                await self._deliver(key, text)
+
+    async def _deliver(self, key, text):
+        if not self.diff_mode:
+            await self.send(text_data=text)
+            return
+        data = json.loads(text)
+        key = key or data.get('license_key', '')
+        previous = self._sent_state.get(key)
+        if previous is None:
+            await self.send_snapshot(key, data)
+            return
+        ops = diff(previous, data)
+        if not ops:
+            return
+        self._sent_state[key] = data
+        self._seq[key] = self._seq.get(key, 0) + 1
+        metrics.incr('trade_broadcast.patches')
+        await self.send(text_data=json.dumps({'type': 'patch', 'license_key': key, 'seq': self._seq[key], 'ops': ops}))
+
+    async def send_snapshot(self, key, data):
+        self._sent_state[key] = data
+        self._seq[key] = self._seq.get(key, 0) + 1
+        await self.send(text_data=json.dumps({'type': 'snapshot', 'license_key': key, 'seq': self._seq[key], 'data': data}))
+
+    async def handle_frame_message(self, text_data):
+        """Client messages on a diff socket: {"type": "resync"[, "license_key": K]}"""
+        if not self.diff_mode or not text_data:
+            return
+        try:
+            message = json.loads(text_data)
+        except ValueError:
+            return
+        if not isinstance(message, dict) or message.get('type') != 'resync':
+            return
+        metrics.incr('trade_broadcast.resyncs')
+        keys = [message['license_key']] if message.get('license_key') else list(self._sent_state)
+        for key in keys:
+            data = self._sent_state.get(key)
+            if data is not None:
+                await self.send_snapshot(key, data)
+
+    def stop_frames(self):
+        """Drop queued frames (call from disconnect)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        self._frames = None
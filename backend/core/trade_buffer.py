@@ -0,0 +1,184 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings as django_settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from core import account_state, metrics
+
+logger = logging.getLogger(__name__)
+
+# Write-behind buffer for TradeData snapshots (TRADE_DATA_WRITE_BEHIND=True).
+# update_trade_data() hands the parsed snapshot to enqueue() and answers the EA right away.
+# Each worker keeps only the latest snapshot per (license, mt5_account) and a background
+# thread writes them to the database every TRADE_DATA_FLUSH_INTERVAL seconds with one
+# bulk_update. Workers flush independently, so every snapshot carries the time it was
+# received and the flush only overwrites a row with a newer snapshot (rows are locked with
+# select_for_update). A failed flush is logged and its snapshots go back into the buffer.
+#
+# Loss window: the buffer is per-process memory. Pending snapshots are flushed at interpreter
+# exit (gunicorn graceful stop / restart / max_requests recycle), but a SIGKILL, an OOM kill
+# or a worker timeout drops up to TRADE_DATA_FLUSH_INTERVAL seconds of snapshots. That is
+# recoverable by design: a snapshot is the whole account state and the EA pushes a new one
+# every few seconds (unchanged pushes are buffered too), so the row catches up on the next
+# push. Closed trades, the only data the EA does not re-send once acknowledged, are never
+# buffered; update_trade_data() stores them before answering.
+
+# Columns replaced wholesale by the newest snapshot
+SNAPSHOT_FIELDS = [
+    'account_balance', 'account_equity', 'account_profit', 'account_margin', 'account_free_margin',
+    'total_buy_positions', 'total_sell_positions', 'total_buy_lots', 'total_sell_lots',
+    'total_buy_profit', 'total_sell_profit', 'symbol', 'current_price',
+    'open_positions', 'pending_orders', 'total_pending_orders', 'trading_mode', 'ea_details',
+]
+
+_lock = threading.Lock()
+_pending = {}
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker_pid = None
+
+
+def is_enabled():
+    return getattr(django_settings, 'TRADE_DATA_WRITE_BEHIND', False)
+
+
+def _interval():
+    # Bounds the loss window of a killed worker (see above)
+    return min(10.0, max(0.5, float(getattr(django_settings, 'TRADE_DATA_FLUSH_INTERVAL', 2))))
+
+
+def _max_pending():
+    return int(getattr(django_settings, 'TRADE_DATA_FLUSH_MAX_PENDING', 500))
+
+
+def _newest(a, b):
+    return a if a['received_at'] >= b['received_at'] else b
+
+
+def enqueue(license_id, mt5_account, fields, received_at=None):
+    """Buffer the latest snapshot for (license_id, mt5_account)"""
+    snapshot = {
+        'fields': fields,
+        'received_at': received_at or timezone.now(),
+    }
+    key = (license_id, mt5_account or '')
+    with _lock:
+        previous = _pending.get(key)
+        if previous is not None:
+            snapshot = _newest(previous, snapshot)
+            metrics.incr('trade_buffer.coalesced')
+        _pending[key] = snapshot
+        size = len(_pending)
+    metrics.incr('trade_buffer.enqueued')
+
+    _ensure_worker()
+    if size >= _max_pending():
+        _wakeup.set()
+
+
+def flush():
+    """Write all buffered snapshots to the database. Returns the number of rows written."""
+    global _pending
+    with _flush_lock:
+        with _lock:
+            batch, _pending = _pending, {}
+        if not batch:
+            return 0
+        try:
+            written = _write(batch)
+        except Exception:
+            # Put the batch back (newer snapshots received meanwhile win) and retry next tick
+            with _lock:
+                for key, snapshot in batch.items():
+                    current = _pending.get(key)
+                    _pending[key] = snapshot if current is None else _newest(snapshot, current)
+            metrics.incr('trade_buffer.flush_errors')
+            logger.exception('Trade buffer flush failed, %d snapshots re-queued', len(batch))
+            return 0
+        metrics.incr('trade_buffer.flushes')
+        metrics.incr('trade_buffer.rows_written', written)
+        return written
+
+
+def _write(batch):
+    from core.models import TradeData
+
+    license_ids = {license_id for license_id, _ in batch}
+    with transaction.atomic():
+        rows = {}
+        locked = (
+            TradeData.objects.select_for_update()
+            .filter(license_id__in=license_ids)
+            .order_by('id')
+        )
+        for row in locked:
+            rows.setdefault((row.license_id, row.mt5_account), row)
+
+        to_update = []
+        for key, snapshot in batch.items():
+            row = rows.get(key)
+            created = False
+            if row is None:
+                license_id, mt5_account = key
+                row, created = TradeData.objects.select_for_update().get_or_create(
+                    license_id=license_id, mt5_account=mt5_account
+                )
+
+            # A row created just now carries the flush time (auto_now), not a snapshot time
+            if not created and row.last_update and row.last_update >= snapshot['received_at']:
+                # Another worker already wrote a newer snapshot
+                metrics.incr('trade_buffer.stale')
+                continue
+            for name, value in snapshot['fields'].items():
+                setattr(row, name, value)
+            row.last_update = snapshot['received_at']
+            to_update.append(row)
+
+        # bulk_update skips auto_now, last_update is set explicitly above
+        TradeData.objects.bulk_update(to_update, SNAPSHOT_FIELDS + ['last_update'], batch_size=100)
+        account_state.record(to_update)
+    return len(to_update)
+
+
+def _run():
+    while True:
+        _wakeup.wait(_interval())
+        _wakeup.clear()
+        close_old_connections()
+        flush()
+
+
+def _ensure_worker():
+    """Start the flusher thread once per process (gunicorn forks after import)"""
+    global _worker_pid
+    pid = os.getpid()
+    if _worker_pid == pid:
+        return
+    with _lock:
+        if _worker_pid == pid:
+            return
+        _worker_pid = pid
+    threading.Thread(target=_run, name='trade-buffer-flush', daemon=True).start()
+
+
+def get_stats():
+    """Buffer counters for this worker process"""
+    counters = metrics.snapshot('trade_buffer.')
+    with _lock:
+        pending = len(_pending)
+    stats = {name.split('.', 1)[1]: value for name, value in counters.items()}
+    stats['enabled'] = is_enabled()
+    stats['pending'] = pending
+    return stats
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Trade buffer flush at exit failed')
@@ -0,0 +1,77 @@
+import asyncio
+
+from django.conf import settings as django_settings
+from django.core.handlers.asgi import ASGIRequest
+
+from core import metrics
+
+# Long-poll delivery of TradeCommand to the EA.
+# get_pending_commands(wait=N) parks the request until a command for the license is created
+# or N seconds pass. TradeCommand.save() (and bulk creators) call notify_new_command() after
+# commit, which sends a wake-up to the license's group on the Channels layer (Redis on
+# production, so it reaches whichever daphne process holds the parked request). Parking
+# only happens under ASGI; on the gunicorn (WSGI) workers `wait` is ignored so a sync worker
+# is never tied up.
+
+
+def group_name(license_id):
+    return f'trade_commands_{license_id}'
+
+
+def max_wait():
+    return max(0, int(getattr(django_settings, 'TRADE_COMMAND_LONG_POLL_MAX_WAIT', 25)))
+
+
+def long_poll_wait(request, value):
+    """Seconds this request may be parked for (0 = answer immediately)"""
+    if not isinstance(request, ASGIRequest):
+        return 0
+    try:
+        wait = int(float(value or 0))
+    except (TypeError, ValueError):
+        return 0
+    return max(0, min(wait, max_wait()))
+
+
+def notify_new_command(*license_ids):
+    """Wake up parked get_pending_commands requests for these licenses (call after commit)"""
+    try:
+        from channels.layers import get_channel_layer
+        from asgiref.sync import async_to_sync
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        for license_id in set(license_ids):
+            async_to_sync(channel_layer.group_send)(group_name(license_id), {'type': 'command.created'})
+    except Exception:
+        pass
+
+
+async def wait_for_command(license_id, timeout, has_pending):
+    """
+    Park until a command for license_id is announced or timeout passes.
+    has_pending is an async callable, checked after subscribing so a command created in
+    between is not missed. Returns True if woken up (or something was already pending).
+    """
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return False
+
+    group = group_name(license_id)
+    channel = await channel_layer.new_channel()
+    await channel_layer.group_add(group, channel)
+    metrics.incr('trade_commands.parked')
+    try:
+        if await has_pending():
+            return True
+        try:
+            await asyncio.wait_for(channel_layer.receive(channel), timeout)
+        except asyncio.TimeoutError:
+            metrics.incr('trade_commands.timeouts')
+            return False
+        metrics.incr('trade_commands.woken')
+        return True
+    finally:
+        await channel_layer.group_discard(group, channel)
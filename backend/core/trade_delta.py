@@ -0,0 +1,112 @@
+from django.core.cache import cache
+
+from core import metrics
+
+# Delta protocol for EA trade-data pushes.
+#
+# Full push (legacy EAs, or after a resync): the usual payload with open_positions and
+# pending_orders. If it carries "seq", the snapshot is remembered under that sequence number.
+#
+# Delta push: "seq" plus a "delta" object instead of the two arrays:
+#   {"seq": 42, "delta": {"open_positions": {"added": [{...}], "removed": [123],
+#                                            "changed": [{"ticket": 124, "profit": -1.5}]},
+#                         "pending_orders": {...}}}
+# "changed" entries only carry the fields that moved. A list missing from "delta" is
+# unchanged. The patch applies only on top of seq - 1; on a gap (lost response, evicted
+# snapshot, request handled out of order) the EA gets "resync": true and sends a full push.
+#
+# Snapshots live in the shared cache so any worker can apply the next delta.
+
+DELTA_LISTS = ('open_positions', 'pending_orders')
+
+_KEY_PREFIX = 'trade_snapshot:'
+_TTL = 60 * 60
+
+
+def _cache_key(license_id, mt5_account):
+    return f'{_KEY_PREFIX}{license_id}:{mt5_account or ""}'
+
+
+def _parse_seq(value):
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seq if seq > 0 else None
+
+
+def is_delta(data):
+    return isinstance(data.get('delta'), dict)
+
+
+def remember_snapshot(license_id, mt5_account, data):
+    """Store the lists of a full push so the next delta can be applied to them"""
+    key = _cache_key(license_id, mt5_account)
+    seq = _parse_seq(data.get('seq'))
+    try:
+        if seq is None:
+            # Legacy full push, nothing to patch against
+            cache.delete(key)
+            return None
+        snapshot = {'seq': seq}
+        for name in DELTA_LISTS:
+            snapshot[name] = data.get(name) or []
+        cache.set(key, snapshot, _TTL)
+    except Exception:
+        return None
+    metrics.incr('trade_delta.full')
+    return seq
+
+
+def _patch(items, patch):
+    """Apply added/removed/changed to a list of ticket-keyed dicts"""
+    if not isinstance(patch, dict):
+        return items
+    removed = {str(t) for t in patch.get('removed') or []}
+    changed = {str(c.get('ticket')): c for c in patch.get('changed') or [] if isinstance(c, dict)}
+    added = [a for a in patch.get('added') or [] if isinstance(a, dict)]
+    added_tickets = {str(a.get('ticket')) for a in added}
+
+    result = []
+    for item in items:
+        ticket = str(item.get('ticket'))
+        if ticket in removed or ticket in added_tickets:
+            continue
+        if ticket in changed:
+            item = {**item, **changed[ticket]}
+        result.append(item)
+    # EA lists positions newest first
+    return added + result
+
+
+def apply_delta(license_id, mt5_account, data):
+    """
+    Patch the stored snapshot with a delta push.
+    Returns (data with full open_positions/pending_orders, seq), or (None, None) on a sequence gap.
+    """
+    seq = _parse_seq(data.get('seq'))
+    key = _cache_key(license_id, mt5_account)
+    try:
+        snapshot = cache.get(key)
+    except Exception:
+        snapshot = None
+
+    if seq is None or snapshot is None or snapshot.get('seq') != seq - 1:
+        metrics.incr('trade_delta.resync')
+        return None, None
+
+    delta = data['delta']
+    new_snapshot = {'seq': seq}
+    for name in DELTA_LISTS:
+        new_snapshot[name] = _patch(snapshot.get(name) or [], delta.get(name))
+    try:
+        cache.set(key, new_snapshot, _TTL)
+    except Exception:
+        pass
+    metrics.incr('trade_delta.applied')
+
+    full = dict(data)
+    full.pop('delta', None)
+    for name in DELTA_LISTS:
+        full[name] = new_snapshot[name]
+    return full, seq
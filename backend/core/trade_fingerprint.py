@@ -0,0 +1,54 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from core import metrics
+
+# Change detection for EA trade pushes. When the market is closed or the EA is idle it keeps
+# sending the same account state; update_trade_data compares a fingerprint of the normalized
+# snapshot with the last one written and, on a match, only bumps last_update and skips the
+# WebSocket fan-out. Fingerprints expire after _TTL so the full row is still rewritten now
+# and then (covers a write lost in between).
+
+_KEY_PREFIX = 'trade_fp:'
+_TTL = 5 * 60
+
+
+def _cache_key(license_id, mt5_account):
+    return f'{_KEY_PREFIX}{license_id}:{mt5_account or ""}'
+
+
+def compute(fields):
+    """Fingerprint of the TradeData column values built from a push"""
+    normalized = json.dumps(fields, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def is_unchanged(license_id, mt5_account, fingerprint):
+    try:
+        unchanged = cache.get(_cache_key(license_id, mt5_account)) == fingerprint
+    except Exception:
+        unchanged = False
+    metrics.incr('trade_fingerprint.skipped' if unchanged else 'trade_fingerprint.applied')
+    return unchanged
+
+
+def remember(license_id, mt5_account, fingerprint):
+    try:
+        cache.set(_cache_key(license_id, mt5_account), fingerprint, _TTL)
+    except Exception:
+        pass
+
+
+def get_stats():
+    """Skipped/applied write counters for this worker process"""
+    counters = metrics.snapshot('trade_fingerprint.')
+    skipped = counters.get('trade_fingerprint.skipped', 0)
+    applied = counters.get('trade_fingerprint.applied', 0)
+    total = skipped + applied
+    return {
+        'skipped': skipped,
+        'applied': applied,
+        'skip_rate': round(skipped / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,123 @@
+import hashlib
+
+from django.conf import settings as django_settings
+from django.core.cache import cache
+
+from core import metrics
+
+# Email/username -> User for the dashboard and FM endpoints (views.resolve_user,
+# fm_views._resolve_user). Identifiers are matched case-insensitively on lower(email) and
+# lower(username), both indexed (migration 0056). Production still has a few legacy emails
+# shared by several User rows; for those the account with the most licenses, then FM
+# subscriptions, wins. That ranking is stored in CanonicalUser (manage.py map_duplicate_users
+# rebuilds it, unmapped duplicates are ranked and stored on first use), so the aggregate is
+# off the request path. The resolved id is cached for USER_RESOLVE_CACHE_TTL seconds; misses
+# are not cached, so a user who just registered resolves immediately.
+
+
+def _ttl():
+    return getattr(django_settings, 'USER_RESOLVE_CACHE_TTL', 60)
+
+
+def _cache_key(identifier):
+    return 'user_resolve:' + hashlib.sha1(identifier.encode()).hexdigest()
+
+
+def _matches(user, identifier):
+    return (user.email or '').lower() == identifier or (user.username or '').lower() == identifier
+
+
+def candidates(identifier):
+    """Users whose email or username equals identifier (already lower-cased)"""
+    from django.contrib.auth.models import User
+    from django.db.models import Q
+    from django.db.models.functions import Lower
+
+    return list(
+        User.objects.alias(email_lower=Lower('email'), username_lower=Lower('username'))
+        .filter(Q(email_lower=identifier) | Q(username_lower=identifier))
+        .order_by('-id')
+    )
+
+
+def rank(user_ids):
+    """Canonical id among duplicate accounts: most licenses, then FM subscriptions, then newest"""
+    from django.contrib.auth.models import User
+    from django.db.models import Count
+
+    return (
+        User.objects.filter(id__in=user_ids)
+        .annotate(
+            license_count=Count('licenses', distinct=True),
+            fm_sub_count=Count('fm_subscriptions', distinct=True),
+        )
+        .order_by('-license_count', '-fm_sub_count', '-id')
+        .values_list('id', flat=True)
+        .first()
+    )
+
+
+def _canonical(identifier, users):
+    from core.models import CanonicalUser
+
+    by_id = {u.id: u for u in users}
+    mapped = CanonicalUser.objects.filter(identifier=identifier).values_list('user_id', flat=True).first()
+    if mapped in by_id:
+        return by_id[mapped]
+    metrics.incr('user_resolver.ranked')
+    user_id = rank(list(by_id))
+    CanonicalUser.objects.update_or_create(identifier=identifier, defaults={'user_id': user_id})
+    return by_id[user_id]
+
+
+def resolve_user(identifier):
+    """Resolve a user from email or username (None if there is no such account)"""
+    from django.contrib.auth.models import User
+
+    identifier = (identifier or '').strip().lower()
+    if not identifier:
+        return None
+
+    ttl = _ttl()
+    key = _cache_key(identifier)
+    if ttl > 0:
+        user_id = cache.get(key)
+        if user_id is not None:
+            user = User.objects.filter(id=user_id).first()
+            # Deleted or renamed since it was cached: resolve again
+            if user is not None and _matches(user, identifier):
+                metrics.incr('user_resolver.hits')
+                return user
+
+    metrics.incr('user_resolver.misses')
+    users = candidates(identifier)
+    if not users:
+        return None
+    user = users[0] if len(users) == 1 else _canonical(identifier, users)
+    if ttl > 0:
+        cache.set(key, user.id, ttl)
+    return user
+
+
+def invalidate(*identifiers):
+    """Drop cached resolutions, e.g. after merging or deleting duplicate accounts"""
+    keys = [_cache_key(i.strip().lower()) for i in identifiers if i and i.strip()]
+    if keys:
+        try:
+            cache.delete_many(keys)
+        except Exception:
+            pass
+
+
+def get_stats():
+    """Hit/miss counters for this worker process"""
+    counters = metrics.snapshot('user_resolver.')
+    hits = counters.get('user_resolver.hits', 0)
+    misses = counters.get('user_resolver.misses', 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'ranked': counters.get('user_resolver.ranked', 0),
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+    }
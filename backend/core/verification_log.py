@@ -0,0 +1,153 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Asynchronous LicenseVerificationLog writer.
+# verify_license() used to insert one log row per call (valid or not), which doubled the
+# writes on the hot path during EA restart storms. Records are now queued in-process and a
+# background thread inserts them with bulk_create. The queue is bounded
+# (VERIFICATION_LOG_QUEUE_SIZE); when it is full the record is dropped, or with
+# VERIFICATION_LOG_QUEUE_POLICY='block' the request waits up to VERIFICATION_LOG_BLOCK_TIMEOUT
+# seconds for room first. Whatever is still queued is written at interpreter exit; a killed
+# worker loses up to VERIFICATION_LOG_FLUSH_INTERVAL seconds of records.
+# Retention is handled by `manage.py prune_verification_logs` (pm2 app prune-verification-logs).
+# The queue lives in each web worker, that command cannot write it.
+
+BATCH_SIZE = 500
+
+_queue = None
+_lock = threading.Lock()
+_worker_pid = None
+
+
+def _setting(name, default):
+    return getattr(django_settings, name, default)
+
+
+def _get_queue():
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = queue.Queue(maxsize=max(1, int(_setting('VERIFICATION_LOG_QUEUE_SIZE', 10000))))
+    return _queue
+
+
+def log(license, license_key, mt5_account, hardware_id, ip_address, is_valid, message):
+    """Queue a verification log record (written synchronously when VERIFICATION_LOG_ASYNC is off)"""
+    from core.models import LicenseVerificationLog
+
+    record = LicenseVerificationLog(
+        license=license,
+        license_key=license_key,
+        mt5_account=mt5_account,
+        hardware_id=hardware_id,
+        ip_address=ip_address,
+        is_valid=is_valid,
+        message=message[:255],
+        created_at=timezone.now(),
+    )
+    if not _setting('VERIFICATION_LOG_ASYNC', True):
+        record.save()
+        return
+
+    q = _get_queue()
+    try:
+        if _setting('VERIFICATION_LOG_QUEUE_POLICY', 'drop') == 'block':
+            q.put(record, timeout=float(_setting('VERIFICATION_LOG_BLOCK_TIMEOUT', 1.0)))
+        else:
+            q.put_nowait(record)
+    except queue.Full:
+        metrics.incr('verification_log.dropped')
+        return
+    metrics.incr('verification_log.queued')
+    _ensure_worker()
+
+
+def _take(limit):
+    q = _get_queue()
+    batch = []
+    while len(batch) < limit:
+        try:
+            batch.append(q.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write(batch):
+    from core.models import LicenseVerificationLog
+
+    if not batch:
+        return 0
+    try:
+        LicenseVerificationLog.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+    except Exception:
+        # Log rows are best-effort, a failed batch is reported and dropped
+        metrics.incr('verification_log.failed', len(batch))
+        logger.exception('Failed to write %d verification log records', len(batch))
+        return 0
+    metrics.incr('verification_log.written', len(batch))
+    return len(batch)
+
+
+def drain():
+    """Write everything currently queued. Returns the number of rows written."""
+    written = 0
+    while True:
+        batch = _take(BATCH_SIZE)
+        if not batch:
+            return written
+        written += _write(batch)
+
+
+def _run():
+    q = _get_queue()
+    interval = max(0.1, float(_setting('VERIFICATION_LOG_FLUSH_INTERVAL', 1.0)))
+    while True:
+        # Records stay in the queue until written, so the exit hook can still pick them up
+        time.sleep(interval)
+        if q.empty():
+            continue
+        close_old_connections()
+        drain()
+
+
+def _ensure_worker():
+    """Start the writer thread once per process (gunicorn forks after import)"""
+    global _worker_pid
+    pid = os.getpid()
+    if _worker_pid == pid:
+        return
+    with _lock:
+        if _worker_pid == pid:
+            return
+        _worker_pid = pid
+    threading.Thread(target=_run, name='verification-log-writer', daemon=True).start()
+
+
+def get_stats():
+    """Queue counters for this worker process"""
+    counters = metrics.snapshot('verification_log.')
+    stats = {name.split('.', 1)[1]: value for name, value in counters.items()}
+    stats['pending'] = _queue.qsize() if _queue is not None else 0
+    return stats
+
+
+@atexit.register
+def _drain_on_exit():
+    try:
+        drain()
+    except Exception:
+        pass
@@ -10,8 +10,14 @@ from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
-from django.db.models import Count, F
+from django.db.models import F
+from asgiref.sync import sync_to_async
 from .models import SubscriptionPlan, License, LicenseMT5Account, LicenseVerificationLog, EASettings, TradeData, EAControlSettings, EAActionLog, EAProduct, Referral, ReferralAttribution, ReferralTransaction, ReferralPayout, TradeCommand, SiteSettings, PaymentNetwork, LicensePurchaseRequest, PayoutMethod, EmailOTP, GuidelineCategory, GuidelineVideo, GiftLicense
+from .license_cache import get_license, get_stats as get_license_cache_stats
+from .license_verification import verify_and_bind
+from . import account_state, fm_access, mail_queue, metrics, presence, response_cache, trade_broadcast, trade_buffer, trade_commands, trade_delta, trade_fingerprint, user_resolver, verification_log, ws_auth
+from .response_cache import cached_response
+from .closed_positions import record_if_changed as record_closed_if_changed, get_closed_positions, DEFAULT_LIMIT as CLOSED_POSITIONS_LIMIT, MAX_LIMIT as CLOSED_POSITIONS_MAX_LIMIT
 from decimal import Decimal
 import json
 
@@ -27,26 +33,8 @@ def get_client_ip(request):
 
 
 def resolve_user(identifier: str):
-    ident = (identifier or '').strip()
-    if not ident:
-        return None
-
-    email_qs = User.objects.filter(email__iexact=ident)
-    username_qs = User.objects.filter(username__iexact=ident).exclude(id__in=email_qs.values('id'))
-    ids = list(email_qs.values_list('id', flat=True)) + list(username_qs.values_list('id', flat=True))
-    if not ids:
-        return None
-
-    # Prefer the user record that actually has licenses (handles duplicate emails / legacy data)
-    return (
-        User.objects.filter(id__in=ids)
-        .annotate(
-            license_count=Count('licenses', distinct=True),
-            fm_sub_count=Count('fm_subscriptions', distinct=True),
-        )
-        .order_by('-license_count', '-fm_sub_count', '-id')
-        .first()
-    )
+    """Resolve a user from email or username (indexed + cached, see core/user_resolver.py)"""
+    return user_resolver.resolve_user(identifier)
 
 
 def admin_stats(request):
@@ -57,6 +45,18 @@ def admin_stats(request):
         'total_plans': SubscriptionPlan.objects.filter(is_active=True).count(),
         'total_users': User.objects.count(),
         'expired_licenses': License.objects.filter(status='expired').count(),
+        'license_cache': get_license_cache_stats(),
+        'trade_buffer': trade_buffer.get_stats(),
+        'trade_delta': metrics.snapshot('trade_delta.'),
+        'trade_fingerprint': trade_fingerprint.get_stats(),
+        'verification_log': verification_log.get_stats(),
+        'trade_commands': metrics.snapshot('trade_commands.'),
+        'trade_broadcast': trade_broadcast.get_stats(),
+        'trade_presence': presence.get_stats(),
+        'fm_access': fm_access.get_stats(),
+        'mail_queue': mail_queue.get_stats(),
+        'user_resolver': user_resolver.get_stats(),
+        'response_cache': response_cache.get_stats(),
     })
 
 
@@ -92,7 +92,6 @@ def verify_license(request):
 
     license_key = data.get('license_key', '').strip().upper()
     mt5_account = str(data.get('mt5_account', '') or '').strip()
-    mt5_account = data.get('mt5_account', '').strip()
     hardware_id = data.get('hardware_id', '').strip()
     ip_address = get_client_ip(request)
 
@@ -107,9 +106,8 @@ def verify_license(request):
     # MT5 account is optional for web validation, required for EA
 
     # Find license
-    try:
-        license = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    license = get_license(license_key)
+    if license is None:
         log_verification(None, license_key, mt5_account, hardware_id, ip_address, False, 'Invalid license key')
         return JsonResponse({
             'valid': False,
@@ -125,66 +123,14 @@ def verify_license(request):
             'status': license.status
         })
 
-    # Check MT5 account binding (only if mt5_account provided)
-    if mt5_account:
-        # Backward compatibility: if old single-binding exists, migrate it into bindings table
-        if license.mt5_account:
-            LicenseMT5Account.objects.get_or_create(
-                license=license,
-                mt5_account=license.mt5_account,
-                defaults={
-                    'hardware_id': license.hardware_id or None,
-                    'last_seen': timezone.now(),
-                },
-            )
-
-        # Enforce max_accounts per plan
-        current_accounts_count = LicenseMT5Account.objects.filter(license=license).count()
-        binding = LicenseMT5Account.objects.filter(license=license, mt5_account=mt5_account).first()
-
-        if not binding:
-            if current_accounts_count >= (license.plan.max_accounts or 1):
-                log_verification(
-                    license,
-                    license_key,
-                    mt5_account,
-                    hardware_id,
-                    ip_address,
-                    False,
-                    f'Max accounts reached ({license.plan.max_accounts})'
-                )
-                return JsonResponse({
-                    'valid': False,
-                    'message': f'Max accounts reached for this plan ({license.plan.max_accounts})'
-                })
-
-            binding = LicenseMT5Account.objects.create(
-                license=license,
-                mt5_account=mt5_account,
-                hardware_id=hardware_id or None,
-                last_seen=timezone.now(),
-            )
-        else:
-            update_fields = []
-            binding.last_seen = timezone.now()
-            update_fields.append('last_seen')
-            if hardware_id and not binding.hardware_id:
-                binding.hardware_id = hardware_id
-                update_fields.append('hardware_id')
-            if update_fields:
-                binding.save(update_fields=update_fields)
-
-        # Preserve old field for compatibility with existing admin/UI code
-        if not license.mt5_account:
-            license.mt5_account = mt5_account
-            if hardware_id and not license.hardware_id:
-                license.hardware_id = hardware_id
-            license.save(update_fields=['mt5_account', 'hardware_id', 'updated_at'])
-
-    # Update verification stats
-    license.last_verified = timezone.now()
-    license.verification_count += 1
-    license.save()
+    # Bind the MT5 account (only if provided) and update verification stats in one transaction
+    rejection = verify_and_bind(license, mt5_account, hardware_id)
+    if rejection:
+        log_verification(license, license_key, mt5_account, hardware_id, ip_address, False, rejection)
+        return JsonResponse({
+            'valid': False,
+            'message': f'Max accounts reached for this plan ({license.plan.max_accounts})'
+        })
 
     # Log successful verification
     log_verification(license, license_key, mt5_account, hardware_id, ip_address, True, 'License verified successfully')
@@ -200,16 +146,8 @@ def verify_license(request):
 
 
 def log_verification(license, license_key, mt5_account, hardware_id, ip_address, is_valid, message):
-    """Log verification attempt"""
-    LicenseVerificationLog.objects.create(
-        license=license,
-        license_key=license_key,
-        mt5_account=mt5_account,
-        hardware_id=hardware_id,
-        ip_address=ip_address,
-        is_valid=is_valid,
-        message=message
-    )
+    """Log verification attempt (queued, written in batches by core/verification_log.py)"""
+    verification_log.log(license, license_key, mt5_account, hardware_id, ip_address, is_valid, message)
 
 
 @require_http_methods(["GET"])
@@ -223,6 +161,7 @@ def api_health(request):
 
 
 @require_http_methods(["GET"])
+@cached_response('plans')
 def get_plans(request):
     """Get available subscription plans"""
     from core.models import SiteSettings
@@ -788,6 +727,7 @@ def _build_login_response(user):
             'email': user.email or user.username,
             'username': user.username,
             'name': user.first_name,
+            'ws_token': ws_auth.make_token(user),
         },
         'licenses': license_list,
     })
@@ -1038,28 +978,37 @@ def get_licenses(request):
     if not user:
         return JsonResponse({'success': False, 'message': 'User not found'})
     
-    # Get all user's licenses with EA settings
-    licenses = License.objects.filter(user=user).select_related('plan').prefetch_related('ea_settings')
+    # Fixed number of queries whatever the license count: licenses (+ plan and the current
+    # account state), one prefetch of EA settings, one of FM assignments
+    from django.db.models import Prefetch
+    from core.models import FMAccountAssignment
+
+    licenses = (
+        License.objects.filter(user=user)
+        .select_related('plan', 'account_state')
+        .prefetch_related(Prefetch('ea_settings', queryset=EASettings.objects.order_by('pk')))
+    )
 
     # Build a map: license_id -> (is_fm_stopped, fm_name) from active FM assignments
-    from core.models import FMAccountAssignment
     fm_stopped_map = {}  # license_id -> {'fm_name': str, 'is_ea_active': bool, 'reason': str}
     fm_assignments = FMAccountAssignment.objects.filter(
         license__user=user,
         subscription__status__in=['active', 'trial'],
-    ).select_related('subscription__fund_manager', 'license')
+    ).select_related('subscription__fund_manager')
     for a in fm_assignments:
-        fm_stopped_map[a.license.id] = {
+        fm_stopped_map[a.license_id] = {
             'fm_id': a.subscription.fund_manager.id,
             'fm_name': a.subscription.fund_manager.display_name,
             'is_ea_active': a.is_ea_active,
             'reason': a.last_toggled_reason or '',
         }
     
+    now = timezone.now()
     license_list = []
     for lic in licenses:
         # Get EA settings (BTCUSD preferred, or any)
-        settings = lic.ea_settings.filter(symbol='BTCUSD').first() or lic.ea_settings.first()
+        all_settings = list(lic.ea_settings.all())
+        settings = next((s for s in all_settings if s.symbol == 'BTCUSD'), None) or (all_settings[0] if all_settings else None)
         if settings:
             ea_settings = {
                 'symbol': settings.symbol,
@@ -1075,18 +1024,18 @@ def get_licenses(request):
         
         fm_info = fm_stopped_map.get(lic.id)
         
-        # Get latest trade data for balance
-        latest_td = lic.trade_data.order_by('-last_update').first()
-        account_balance = float(latest_td.account_balance) if latest_td and latest_td.account_balance else None
+        # Balance from the latest trade data
+        state = account_state.get_state(lic)
+        account_balance = float(state.account_balance) if state and state.account_balance else None
         
         license_list.append({
             'id': lic.id,
             'license_key': lic.license_key,
             'plan': lic.plan.name,
-            'status': lic.status,
+            'status': lic.current_status(now),
             'activated_at': lic.activated_at.isoformat(),
             'expires_at': lic.expires_at.isoformat(),
-            'days_remaining': lic.days_remaining(),
+            'days_remaining': lic.days_left(now),
             'mt5_account': lic.mt5_account,
             'nickname': lic.nickname or '',
             'account_balance': account_balance,
@@ -1275,7 +1224,8 @@ def subscribe(request):
         'user': {
             'id': user.id,
             'email': user.email,
-            'name': user.first_name
+            'name': user.first_name,
+            'ws_token': ws_auth.make_token(user),
         }
     })
 
@@ -1464,9 +1414,8 @@ def get_ea_settings(request):
         return JsonResponse({'success': False, 'message': 'License key is required'})
     
     # Find license
-    try:
-        license = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    license = get_license(license_key)
+    if license is None:
         return JsonResponse({'success': False, 'message': 'Invalid license key'})
     
     # Check if license is valid
@@ -1546,6 +1495,45 @@ def get_ea_settings(request):
     })
 
 
+def _trade_snapshot_fields(data):
+    """Map an EA trade push onto TradeData column values (closed positions handled separately)"""
+    fields = {
+        # Account info
+        'account_balance': Decimal(str(data.get('account_balance', 0))),
+        'account_equity': Decimal(str(data.get('account_equity', 0))),
+        'account_profit': Decimal(str(data.get('account_profit', 0))),
+        'account_margin': Decimal(str(data.get('account_margin', 0))),
+        'account_free_margin': Decimal(str(data.get('account_free_margin', 0))),
+        # Position summary
+        'total_buy_positions': data.get('total_buy_positions', 0),
+        'total_sell_positions': data.get('total_sell_positions', 0),
+        'total_buy_lots': Decimal(str(data.get('total_buy_lots', 0))),
+        'total_sell_lots': Decimal(str(data.get('total_sell_lots', 0))),
+        'total_buy_profit': Decimal(str(data.get('total_buy_profit', 0))),
+        'total_sell_profit': Decimal(str(data.get('total_sell_profit', 0))),
+        # Symbol info
+        'symbol': data.get('symbol', ''),
+        'current_price': Decimal(str(data.get('current_price', 0))),
+        # Open positions and pending orders
+        'open_positions': data.get('open_positions', []),
+        'pending_orders': data.get('pending_orders', []),
+        'total_pending_orders': data.get('total_pending_orders', 0),
+        'trading_mode': data.get('trading_mode', 'Normal'),
+    }
+
+    # EA smart filter details (all extra fields from EA), only replaced when sent
+    ea_details = {}
+    for key in ['trend_direction', 'filter_status', 'atr_gap_buy', 'atr_gap_sell', 
+                'spread', 'skip_buy', 'skip_sell', 'buy_mode', 'sell_mode',
+                'drawdown_amount', 'drawdown_percent', 'drawdown_limit',
+                'equity_skip_percent', 'max_recovery_lot', 'lot_size']:
+        if key in data:
+            ea_details[key] = data[key]
+    if ea_details:
+        fields['ea_details'] = ea_details
+    return fields
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def update_trade_data(request):
@@ -1561,113 +1549,60 @@ def update_trade_data(request):
         return JsonResponse({'success': False, 'message': 'License key is required'})
     
     # Find license
-    try:
-        license = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    license = get_license(license_key)
+    if license is None:
         return JsonResponse({'success': False, 'message': 'Invalid license key'})
     
-    # Get or create trade data record
-    trade_data, created = TradeData.objects.get_or_create(license=license)
-    
-    # Update account info
-    trade_data.account_balance = Decimal(str(data.get('account_balance', 0)))
-    trade_data.account_equity = Decimal(str(data.get('account_equity', 0)))
-    trade_data.account_profit = Decimal(str(data.get('account_profit', 0)))
-    trade_data.account_margin = Decimal(str(data.get('account_margin', 0)))
-    trade_data.account_free_margin = Decimal(str(data.get('account_free_margin', 0)))
-    
-    # Update position summary
-    trade_data.total_buy_positions = data.get('total_buy_positions', 0)
-    trade_data.total_sell_positions = data.get('total_sell_positions', 0)
-    trade_data.total_buy_lots = Decimal(str(data.get('total_buy_lots', 0)))
-    trade_data.total_sell_lots = Decimal(str(data.get('total_sell_lots', 0)))
-    trade_data.total_buy_profit = Decimal(str(data.get('total_buy_profit', 0)))
-    trade_data.total_sell_profit = Decimal(str(data.get('total_sell_profit', 0)))
-    
-    # Update symbol info
-    trade_data.symbol = data.get('symbol', '')
-    trade_data.current_price = Decimal(str(data.get('current_price', 0)))
-    
-    # Update open positions and pending orders
-    trade_data.open_positions = data.get('open_positions', [])
-    trade_data.pending_orders = data.get('pending_orders', [])
-    trade_data.total_pending_orders = data.get('total_pending_orders', 0)
-    trade_data.trading_mode = data.get('trading_mode', 'Normal')
-    
-    # Update EA smart filter details (all extra fields from EA)
-    ea_details = {}
-    for key in ['trend_direction', 'filter_status', 'atr_gap_buy', 'atr_gap_sell', 
-                'spread', 'skip_buy', 'skip_sell', 'buy_mode', 'sell_mode',
-                'drawdown_amount', 'drawdown_percent', 'drawdown_limit',
-                'equity_skip_percent', 'max_recovery_lot', 'lot_size']:
-        if key in data:
-            ea_details[key] = data[key]
-    if ea_details:
-        trade_data.ea_details = ea_details
-    
-    # Update closed positions (keep last 1000, remove older)
-    new_closed = data.get('closed_positions', [])
-    if new_closed:
-        existing_closed = trade_data.closed_positions or []
-        # Merge and keep unique by ticket
-        all_closed = {p.get('ticket'): p for p in existing_closed}
-        for p in new_closed:
-            all_closed[p.get('ticket')] = p
-        # Sort by close_time descending and keep only last 1000
-        sorted_closed = sorted(all_closed.values(), key=lambda x: x.get('close_time', ''), reverse=True)
-        trade_data.closed_positions = sorted_closed[:1000]
-    
-    # Update last_update timestamp
-    from django.utils import timezone
-    trade_data.last_update = timezone.now()
-    
-    trade_data.save()
+    # Delta pushes only carry added/removed/changed tickets (see core/trade_delta.py)
+    if trade_delta.is_delta(data):
+        data, seq = trade_delta.apply_delta(license.id, '', data)
+        if data is None:
+            return JsonResponse({'success': False, 'resync': True, 'message': 'Full trade snapshot required'})
+    else:
+        seq = trade_delta.remember_snapshot(license.id, '', data)
 
-    # Broadcast to WebSocket consumers
-    try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        channel_layer = get_channel_layer()
-        if channel_layer is not None:
-            payload = {
-                'license_key': license_key,
-                'account_balance': float(trade_data.account_balance),
-                'account_equity': float(trade_data.account_equity),
-                'account_profit': float(trade_data.account_profit),
-                'account_margin': float(trade_data.account_margin),
-                'account_free_margin': float(trade_data.account_free_margin),
-                'total_buy_positions': trade_data.total_buy_positions,
-                'total_sell_positions': trade_data.total_sell_positions,
-                'total_buy_lots': float(trade_data.total_buy_lots),
-                'total_sell_lots': float(trade_data.total_sell_lots),
-                'total_buy_profit': float(trade_data.total_buy_profit),
-                'total_sell_profit': float(trade_data.total_sell_profit),
-                'symbol': trade_data.symbol,
-                'current_price': float(trade_data.current_price),
-                'open_positions': trade_data.open_positions,
-                'pending_orders': trade_data.pending_orders,
-                'total_pending_orders': trade_data.total_pending_orders,
-                'trading_mode': trade_data.trading_mode,
-                'ea_details': trade_data.ea_details or {},
-                'last_update': trade_data.last_update.isoformat(),
-            }
-            # Broadcast to single-license consumer
-            async_to_sync(channel_layer.group_send)(
-                f'trade_{license_key}',
-                {'type': 'trade_update', 'data': payload},
-            )
-            # Broadcast to all-trades consumer for the license owner
-            try:
-                owner_email = license.user.email
-                group_email = owner_email.replace('@', '_at_').replace('.', '_')
-                async_to_sync(channel_layer.group_send)(
-                    f'trades_all_{group_email}',
-                    {'type': 'trade_update', 'data': payload},
-                )
-            except Exception:
-                pass
-    except Exception:
-        pass
+    from django.utils import timezone
+    fields = _trade_snapshot_fields(data)
+    new_closed = data.get('closed_positions', [])
+    received_at = timezone.now()
+
+    # Same account state as the last write (idle EA, market closed): skip the rewrite and fan-out
+    fingerprint = trade_fingerprint.compute(fields)
+    unchanged = trade_fingerprint.is_unchanged(license.id, '', fingerprint)
+
+    if trade_buffer.is_enabled():
+        # Write-behind: buffered per worker and flushed in batches (see core/trade_buffer.py).
+        # Unchanged pushes are buffered too, the flush only overwrites rows with newer snapshots.
+        # Closed trades are acknowledged to the EA, so they are stored before answering.
+        if new_closed:
+            record_closed_if_changed(license.id, '', new_closed)
+        trade_buffer.enqueue(license.id, '', fields, received_at)
+        snapshot = {'ea_details': {}, **fields}
+    elif unchanged and TradeData.objects.filter(license=license, mt5_account='').update(last_update=received_at):
+        account_state.touch(license.id, '', received_at)
+        if new_closed:
+            record_closed_if_changed(license.id, '', new_closed)
+    else:
+        # Get or create trade data record
+        trade_data, created = TradeData.objects.get_or_create(license=license)
+        for name, value in fields.items():
+            setattr(trade_data, name, value)
+        trade_data.last_update = received_at
+        trade_data.save()
+
+        # Closed trades are insert-only rows, skipped when the EA re-sends the same 24h window
+        if new_closed:
+            record_closed_if_changed(license.id, trade_data.mt5_account, new_closed)
+        snapshot = {name: getattr(trade_data, name) for name in trade_buffer.SNAPSHOT_FIELDS}
+    trade_fingerprint.remember(license.id, '', fingerprint)
+
+    # Broadcast to WebSocket consumers (queued and sent off the request thread, see core/trade_broadcast.py),
+    # only when a socket follows this license (core/presence.py)
+    if not unchanged and presence.is_watched(license):
+        try:
+            trade_broadcast.publish(license, trade_broadcast.build_payload(license_key, snapshot, received_at))
+        except Exception:
+            pass
 
     # Include EA control settings in response so EA can apply them
     ea_control_data = {}
@@ -1735,6 +1670,7 @@ def update_trade_data(request):
     return JsonResponse({
         'success': True,
         'message': 'Trade data updated',
+        'seq': seq,
         'ea_control': ea_control_data,
     })
 
@@ -1744,15 +1680,22 @@ def update_trade_data(request):
 def get_trade_data(request):
     """Get trade data for a license (for web dashboard)"""
     if request.method == "GET":
-        license_key = request.GET.get('license_key', '').strip().upper()
-        mt5_account = (request.GET.get('mt5_account', '') or '').strip()
+        params = request.GET
     else:
         try:
-            data = json.loads(request.body)
-            license_key = data.get('license_key', '').strip().upper()
-            mt5_account = (data.get('mt5_account', '') or '').strip()
+            params = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+    license_key = (params.get('license_key', '') or '').strip().upper()
+    mt5_account = (params.get('mt5_account', '') or '').strip()
+
+    # Closed positions window: newest first, closed_before=<next_cursor> for older pages
+    try:
+        closed_limit = int(params.get('closed_limit') or CLOSED_POSITIONS_LIMIT)
+        closed_before = int(params.get('closed_before') or 0) or None
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'message': 'Invalid closed positions window'}, status=400)
+    closed_limit = max(1, min(closed_limit, CLOSED_POSITIONS_MAX_LIMIT))
     
     if not license_key:
         return JsonResponse({'success': False, 'message': 'License key is required'})
@@ -1774,6 +1717,9 @@ def get_trade_data(request):
             trade_data = TradeData.objects.filter(license=license).order_by('-last_update').first()
         if not trade_data:
             raise TradeData.DoesNotExist
+        closed_positions, closed_total, closed_next = get_closed_positions(
+            license, trade_data.mt5_account, closed_limit, closed_before,
+        )
         return JsonResponse({
             'success': True,
             'data': {
@@ -1795,7 +1741,9 @@ def get_trade_data(request):
                 'current_price': float(trade_data.current_price),
                 'open_positions': trade_data.open_positions,
                 'pending_orders': getattr(trade_data, 'pending_orders', []),
-                'closed_positions': getattr(trade_data, 'closed_positions', []),
+                'closed_positions': closed_positions,
+                'closed_positions_total': closed_total,
+                'closed_positions_next': closed_next,
                 'ea_details': getattr(trade_data, 'ea_details', {}),
                 'last_update': trade_data.last_update.isoformat(),
             }
@@ -1828,9 +1776,8 @@ def add_action_log(request):
     if not license_key:
         return JsonResponse({'success': False, 'message': 'License key required'})
     
-    try:
-        license = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    license = get_license(license_key)
+    if license is None:
         return JsonResponse({'success': False, 'message': 'Invalid license'})
     
     # Support batch logs (new format from EA)
@@ -1906,6 +1853,7 @@ def get_action_logs(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('ea_products', per_host=True)
 def get_ea_products(request):
     """Get all active EA products for the store"""
     products = EAProduct.objects.filter(is_active=True).order_by('display_order', 'min_investment')
@@ -2912,48 +2860,63 @@ def close_all_positions(request):
     })
 
 
+async def _pending_command_list(license):
+    """Pending (non-expired) commands for a license, oldest first"""
+    # Expired rows are marked every minute by `manage.py expire_trade_commands` (pm2 app
+    # expire-trade-commands), here they are only filtered out
+    commands = TradeCommand.objects.filter(
+        license=license,
+        status='pending',
+        expires_at__gt=timezone.now(),
+    ).order_by('created_at')
+    
+    command_list = []
+    async for cmd in commands:
+        command_list.append({
+            'id': cmd.id,
+            'command_type': cmd.command_type,
+            'parameters': cmd.parameters,
+            'created_at': cmd.created_at.isoformat()
+        })
+    return command_list
+
+
 @csrf_exempt
 @require_http_methods(["POST", "GET"])
-def get_pending_commands(request):
-    """Get pending commands for EA to execute"""
+async def get_pending_commands(request):
+    """
+    Get pending commands for EA to execute.
+    Optional wait=<seconds> (ASGI only, capped by TRADE_COMMAND_LONG_POLL_MAX_WAIT) parks the
+    request until a command is created instead of returning an empty list right away.
+    """
     if request.method == "GET":
-        license_key = request.GET.get('license_key', '').strip().upper()
+        params = request.GET
     else:
         try:
-            data = json.loads(request.body)
-            license_key = data.get('license_key', '').strip().upper()
+            params = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+    license_key = (params.get('license_key', '') or '').strip().upper()
     
     if not license_key:
         return JsonResponse({'success': False, 'message': 'License key required'})
     
-    try:
-        license = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    # The ORM calls (async ORM and the cached lookup) run on the thread-sensitive thread,
+    # where Django closes and recycles the DB connection between requests
+    license = await sync_to_async(get_license)(license_key)
+    if license is None:
         return JsonResponse({'success': False, 'message': 'Invalid license key'})
     
-    commands = TradeCommand.objects.filter(
-        license=license,
-        status='pending'
-    ).order_by('created_at')
-    
-    for cmd in commands:
-        cmd.is_expired()
-    
-    commands = TradeCommand.objects.filter(
-        license=license,
-        status='pending'
-    ).order_by('created_at')
-    
-    command_list = []
-    for cmd in commands:
-        command_list.append({
-            'id': cmd.id,
-            'command_type': cmd.command_type,
-            'parameters': cmd.parameters,
-            'created_at': cmd.created_at.isoformat()
-        })
+    command_list = await _pending_command_list(license)
+    wait = trade_commands.long_poll_wait(request, params.get('wait'))
+    if not command_list and wait:
+        async def has_pending():
+            return await TradeCommand.objects.filter(
+                license=license, status='pending', expires_at__gt=timezone.now()
+            ).aexists()
+
+        if await trade_commands.wait_for_command(license.id, wait, has_pending):
+            command_list = await _pending_command_list(license)
     
     return JsonResponse({
         'success': True,
@@ -2979,9 +2942,8 @@ def update_command_status(request):
     if not license_key or not command_id:
         return JsonResponse({'success': False, 'message': 'License key and command_id required'})
     
-    try:
-        license = License.objects.get(license_key=license_key)
-    except License.DoesNotExist:
+    license = get_license(license_key)
+    if license is None:
         return JsonResponse({'success': False, 'message': 'Invalid license key'})
     
     try:
@@ -3001,8 +2963,83 @@ def update_command_status(request):
     })
 
 
+COMMAND_STATUS_BATCH_MAX = 100
+# Results the EA reports, a batch cannot put a command back to pending (or expire it)
+COMMAND_RESULT_STATUSES = ('executed', 'failed')
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def update_command_status_batch(request):
+    """
+    Update the execution status of several commands in one request.
+    Body: {license_key, commands: [{command_id, status, result_message, result_data}, ...]}
+    Returns one result per item, in the same order. status is executed (default) or failed.
+    Written with one bulk_update, so TradeCommand.save() and its signals do not run.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
+
+    license_key = (data.get('license_key', '') or '').strip().upper()
+    items = data.get('commands')
+
+    if not license_key or not isinstance(items, list) or not items:
+        return JsonResponse({'success': False, 'message': 'License key and commands required'})
+    if len(items) > COMMAND_STATUS_BATCH_MAX:
+        return JsonResponse({'success': False, 'message': f'At most {COMMAND_STATUS_BATCH_MAX} commands per request'})
+
+    license = get_license(license_key)
+    if license is None:
+        return JsonResponse({'success': False, 'message': 'Invalid license key'})
+
+    def parse_id(item):
+        try:
+            return int(item.get('command_id'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    ids = {cid for cid in (parse_id(item) for item in items) if cid is not None}
+    # Ownership check: only commands of this license are found
+    commands = {cmd.id: cmd for cmd in TradeCommand.objects.filter(license=license, id__in=ids)}
+
+    now = timezone.now()
+    results = []
+    changed = {}
+    for item in items:
+        command_id = parse_id(item)
+        command = commands.get(command_id)
+        if command is None:
+            results.append({'command_id': command_id, 'success': False, 'message': 'Command not found'})
+            continue
+        status = item.get('status', 'executed')
+        if status not in COMMAND_RESULT_STATUSES:
+            results.append({'command_id': command_id, 'success': False, 'message': 'Invalid status'})
+            continue
+        command.status = status
+        command.result_message = item.get('result_message', '') or ''
+        command.result_data = item.get('result_data', {}) or {}
+        command.executed_at = now
+        changed[command_id] = command
+        results.append({'command_id': command_id, 'success': True, 'message': 'Command status updated'})
+
+    if changed:
+        TradeCommand.objects.bulk_update(
+            list(changed.values()),
+            ['status', 'result_message', 'result_data', 'executed_at'],
+        )
+
+    return JsonResponse({
+        'success': True,
+        'updated': len(changed),
+        'results': results,
+    })
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('site_settings', per_host=True)
 def get_site_settings(request):
     """Get public site settings for frontend (favicon, logo, contact info)"""
     settings = SiteSettings.get_settings()
@@ -3199,6 +3236,7 @@ def toggle_license_status(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_response('guidelines')
 def get_guideline_videos(request):
     """Get all active guideline categories with their videos for the guidelines page"""
     categories = GuidelineCategory.objects.filter(is_active=True).prefetch_related('videos')
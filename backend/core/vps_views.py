@@ -6,10 +6,12 @@ from django.utils import timezone
 from django.conf import settings as django_settings
 from .models import VPSPlan, VPSOrder, VPSServer, PaymentNetwork, VPSDiscount
 from .views import resolve_user
+from .response_cache import cached_response
 from decimal import Decimal
 
 
 @require_http_methods(["GET"])
+@cached_response('vps_plans')
 def get_vps_plans(request):
     """Get all active VPS plans"""
     plans = VPSPlan.objects.filter(is_active=True)
@@ -0,0 +1,35 @@
+from django.conf import settings as django_settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+# Signed token identifying a user on the dashboard WebSocket (consumers.DashboardConsumer).
+# It is handed out with the login response; browsers cannot set headers on a WebSocket, so
+# it travels in the query string and is checked once on connect. The token embeds a hash of
+# the password hash, so changing the password invalidates the old ones.
+
+_SALT = 'dashboard-ws'
+
+
+def _password_version(user):
+    return salted_hmac(_SALT, user.password or '').hexdigest()[:12]
+
+
+def make_token(user):
+    return signing.dumps({'uid': user.id, 'pv': _password_version(user)}, salt=_SALT)
+
+
+def user_from_token(token):
+    """User for a valid, unexpired token, else None"""
+    from django.contrib.auth.models import User
+
+    if not token:
+        return None
+    max_age = int(getattr(django_settings, 'DASHBOARD_WS_TOKEN_MAX_AGE', 30 * 24 * 3600))
+    try:
+        payload = signing.loads(token, salt=_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    user = User.objects.filter(id=payload.get('uid'), is_active=True).first()
+    if user is None or not constant_time_compare(payload.get('pv', ''), _password_version(user)):
+        return None
+    return user
@@ -59,6 +59,10 @@ echo -e "${GREEN}✓ Media permissions set${NC}"
 
 # Restart Backend via PM2
 pm2 restart backend --update-env 2>/dev/null || pm2 start $PROJECT_DIR/ecosystem.config.js --only backend
+pm2 restart backend-asgi --update-env 2>/dev/null || pm2 start $PROJECT_DIR/ecosystem.config.js --only backend-asgi
+pm2 restart fm-stats --update-env 2>/dev/null || pm2 start $PROJECT_DIR/ecosystem.config.js --only fm-stats
+pm2 restart expire-trade-commands --update-env 2>/dev/null || pm2 start $PROJECT_DIR/ecosystem.config.js --only expire-trade-commands
+pm2 restart prune-verification-logs --update-env 2>/dev/null || pm2 start $PROJECT_DIR/ecosystem.config.js --only prune-verification-logs
 echo -e "${GREEN}✓ Backend restarted${NC}"
 
 # Step 3: Frontend updates
@@ -95,6 +99,12 @@ fi
 
 # Create/update Nginx configuration
 sudo tee $NGINX_CONFIG > /dev/null <<'EOF'
+# EA command polls that ask to wait (?wait=N) are parked on Daphne, plain polls stay on gunicorn
+map $arg_wait $pending_commands_upstream {
+    default     127.0.0.1:8000;
+    "~^[1-9]"   127.0.0.1:8001;
+}
+
 server {
     listen 80;
     server_name markstrades.com www.markstrades.com;
@@ -117,6 +127,17 @@ server {
         access_log off;
     }
 
+    # EA command poll, long-polls are served by Daphne (see the map above)
+    location = /api/trade-commands/pending/ {
+        proxy_pass http://$pending_commands_upstream;
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_buffering off;
+        proxy_read_timeout 60s;
+    }
+
     # API requests to Django backend
     location /api/ {
         proxy_pass http://127.0.0.1:8000;
@@ -137,9 +158,9 @@ server {
         proxy_set_header X-Forwarded-Proto $scheme;
     }
 
-    # WebSocket connections to Django/Daphne
+    # WebSocket connections to Daphne
     location /ws/ {
-        proxy_pass http://127.0.0.1:8000;
+        proxy_pass http://127.0.0.1:8001;
         proxy_http_version 1.1;
         proxy_set_header Upgrade $http_upgrade;
         proxy_set_header Connection "upgrade";
@@ -20,6 +20,90 @@ module.exports = {
       max_restarts: 10,
       min_uptime: '10s',
     },
+    {
+      // ASGI server: WebSockets and long-poll endpoints (parked requests must not hold gunicorn workers)
+      name: 'backend-asgi',
+      cwd: '/var/www/markstrades/backend',
+      script: 'venv/bin/daphne',
+      args: '--bind 127.0.0.1 --port 8001 config.asgi:application',
+      interpreter: 'none',
+      env: {
+        DJANGO_SETTINGS_MODULE: 'config.settings',
+        PATH: '/var/www/markstrades/backend/venv/bin:' + process.env.PATH,
+      },
+      watch: false,
+      max_memory_restart: '500M',
+      error_file: '/var/www/markstrades/logs/backend-asgi-error.log',
+      out_file: '/var/www/markstrades/logs/backend-asgi-out.log',
+      merge_logs: true,
+      time: true,
+      autorestart: true,
+      max_restarts: 10,
+      min_uptime: '10s',
+    },
+    {
+      // Recomputes the stored FM marketplace stats (core/fm_stats.py) every 5 minutes
+      name: 'fm-stats',
+      cwd: '/var/www/markstrades/backend',
+      script: 'venv/bin/python',
+      args: 'manage.py refresh_fm_stats --loop 300',
+      interpreter: 'none',
+      env: {
+        DJANGO_SETTINGS_MODULE: 'config.settings',
+        PATH: '/var/www/markstrades/backend/venv/bin:' + process.env.PATH,
+      },
+      watch: false,
+      max_memory_restart: '300M',
+      error_file: '/var/www/markstrades/logs/fm-stats-error.log',
+      out_file: '/var/www/markstrades/logs/fm-stats-out.log',
+      merge_logs: true,
+      time: true,
+      autorestart: true,
+      max_restarts: 10,
+      min_uptime: '10s',
+    },
+    {
+      // Marks pending trade commands past their expiry as expired (one UPDATE a minute)
+      name: 'expire-trade-commands',
+      cwd: '/var/www/markstrades/backend',
+      script: 'venv/bin/python',
+      args: 'manage.py expire_trade_commands --loop 60',
+      interpreter: 'none',
+      env: {
+        DJANGO_SETTINGS_MODULE: 'config.settings',
+        PATH: '/var/www/markstrades/backend/venv/bin:' + process.env.PATH,
+      },
+      watch: false,
+      max_memory_restart: '300M',
+      error_file: '/var/www/markstrades/logs/expire-trade-commands-error.log',
+      out_file: '/var/www/markstrades/logs/expire-trade-commands-out.log',
+      merge_logs: true,
+      time: true,
+      autorestart: true,
+      max_restarts: 10,
+      min_uptime: '10s',
+    },
+    {
+      // Deletes license verification logs past VERIFICATION_LOG_RETENTION_DAYS once a day
+      name: 'prune-verification-logs',
+      cwd: '/var/www/markstrades/backend',
+      script: 'venv/bin/python',
+      args: 'manage.py prune_verification_logs --loop 86400',
+      interpreter: 'none',
+      env: {
+        DJANGO_SETTINGS_MODULE: 'config.settings',
+        PATH: '/var/www/markstrades/backend/venv/bin:' + process.env.PATH,
+      },
+      watch: false,
+      max_memory_restart: '300M',
+      error_file: '/var/www/markstrades/logs/prune-verification-logs-error.log',
+      out_file: '/var/www/markstrades/logs/prune-verification-logs-out.log',
+      merge_logs: true,
+      time: true,
+      autorestart: true,
+      max_restarts: 10,
+      min_uptime: '10s',
+    },
     {
       name: 'frontend',
       cwd: '/var/www/markstrades/frontend',
@@ -0,0 +1,126 @@
+// One multiplexed WebSocket per tab (backend consumers.DashboardConsumer at /ws/dashboard/).
+// Pages subscribe to topics ('trade:<license_key>', 'trades:all', 'fm_chat:<fm_id>') with a
+// handler and get an unsubscribe function back. The socket opens with the first subscription,
+// re-subscribes after a reconnect and closes once nothing is subscribed. Trade frames are
+// applied here (tradeStream.ts) and handed over as { type: 'trade', license_key, data, snapshot }.
+// A topic may pass a cursor (e.g. the last chat message id it has): it is sent along with every
+// subscribe, so after a reconnect the server replays only what was missed as a 'backfill' event.
+import { applyTradeFrame, resyncMessage, TradeStreamState } from './tradeStream';
+
+type Handler = (message: any) => void;
+type Cursor = () => number | undefined;
+
+const handlers = new Map<string, Set<Handler>>();
+const cursors = new Map<string, Cursor>();
+let socket: WebSocket | null = null;
+let socketUrl = '';
+let tradeState: TradeStreamState = {};
+let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+let pingTimer: ReturnType<typeof setInterval> | null = null;
+
+// Dashboard socket URL for a user, or '' when the session has no ws_token (older login)
+export const dashboardSocketUrl = (apiUrl: string, token?: string) => {
+  if (!apiUrl || !token) return '';
+  try {
+    const url = new URL(apiUrl);
+    const protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+    return `${protocol}//${url.host}/ws/dashboard/?token=${encodeURIComponent(token)}`;
+  } catch (e) { return ''; }
+};
+
+const send = (message: any) => {
+  if (socket && socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify(message));
+};
+
+const subscribeMessage = (topics: string[]) => {
+  const after: { [topic: string]: number } = {};
+  for (const topic of topics) {
+    const value = cursors.get(topic)?.();
+    if (typeof value === 'number' && value > 0) after[topic] = value;
+  }
+  return { type: 'subscribe', topics, after };
+};
+
+const dispatch = (topic: string, message: any) => {
+  handlers.get(topic)?.forEach((handler) => {
+    try { handler(message); } catch {}
+  });
+};
+
+const onMessage = (e: MessageEvent) => {
+  let frame: any;
+  try { frame = JSON.parse(e.data); } catch { return; }
+
+  if (frame.type === 'snapshot' || frame.type === 'patch') {
+    const { licenseKey, data, resync } = applyTradeFrame(tradeState, frame);
+    if (resync) socket?.send(resyncMessage(licenseKey));
+    if (!data) return;
+    const message = { type: 'trade', license_key: licenseKey, data, snapshot: frame.type === 'snapshot' };
+    dispatch(`trade:${licenseKey}`, message);
+    dispatch('trades:all', message);
+  } else if (frame.fm_id !== undefined && frame.fm_id !== null) {
+    dispatch(`fm_chat:${frame.fm_id}`, frame);
+  }
+};
+
+const stop = () => {
+  if (reconnectTimer) { clearTimeout(reconnectTimer); reconnectTimer = null; }
+  if (pingTimer) { clearInterval(pingTimer); pingTimer = null; }
+  if (socket) {
+    socket.onclose = null;
+    socket.close();
+    socket = null;
+  }
+};
+
+const connect = () => {
+  stop();
+  if (!socketUrl || handlers.size === 0) return;
+  const ws = new WebSocket(socketUrl);
+  socket = ws;
+  tradeState = {};
+  ws.onopen = () => send(subscribeMessage(Array.from(handlers.keys())));
+  ws.onmessage = onMessage;
+  ws.onerror = () => ws.close();
+  ws.onclose = (e) => {
+    socket = null;
+    // 4401: token expired or revoked, live updates stay off until the next login
+    if (e.code === 4401) { stop(); return; }
+    if (handlers.size > 0) reconnectTimer = setTimeout(connect, 3000);
+  };
+  pingTimer = setInterval(() => send({ type: 'ping' }), 25000);
+};
+
+export function subscribeTopic(url: string, topic: string, handler: Handler, cursor?: Cursor): () => void {
+  if (!handlers.has(topic)) handlers.set(topic, new Set());
+  if (cursor) cursors.set(topic, cursor);
+  const isNewTopic = handlers.get(topic)!.size === 0;
+  handlers.get(topic)!.add(handler);
+
+  if (url !== socketUrl || !socket) {
+    socketUrl = url;
+    connect();
+  } else if (isNewTopic) {
+    send(subscribeMessage([topic]));
+  }
+
+  return () => {
+    const set = handlers.get(topic);
+    if (!set) return;
+    set.delete(handler);
+    if (set.size > 0) return;
+    handlers.delete(topic);
+    cursors.delete(topic);
+    if (handlers.size === 0) {
+      stop();
+    } else {
+      send({ type: 'unsubscribe', topics: [topic] });
+      if (topic.startsWith('trade:')) delete tradeState[topic.slice('trade:'.length)];
+      if (topic === 'trades:all') tradeState = {};
+    }
+  };
+}
+
+export function sendDashboardMessage(message: any) {
+  send(message);
+}
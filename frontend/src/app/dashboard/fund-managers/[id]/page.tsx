@@ -3,6 +3,7 @@
 import { useState, useEffect, useRef } from 'react';
 import { useParams, useRouter } from 'next/navigation';
 import { useDashboard } from '../../context';
+import { dashboardSocketUrl, subscribeTopic } from '../../dashboardSocket';
 import {
   Star, Shield, Crown, Users, TrendingUp, Clock, ArrowLeft,
   MessageCircle, Calendar, ChevronDown, ChevronUp, Check, Loader2,
@@ -48,6 +49,9 @@ export default function FundManagerDetailPage() {
   const [sendingVoice, setSendingVoice] = useState(false);
   const chatEndRef = useRef<HTMLDivElement>(null);
   const wsRef = useRef<WebSocket | null>(null);
+  const chatUnsubscribeRef = useRef<(() => void) | null>(null);
+  // Newest chat message id we have, sockets resume from it instead of reloading the chat
+  const lastMessageIdRef = useRef(0);
   const chatErrorTimerRef = useRef<NodeJS.Timeout | null>(null);
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
   const audioChunksRef = useRef<Blob[]>([]);
@@ -69,13 +73,15 @@ export default function FundManagerDetailPage() {
 
   useEffect(() => {
     if (activeTab === 'chat' && (mySubscription?.is_active || isOwner)) {
-      fetchChat();
+      // Back on the tab: the socket's resume backfills what came in meanwhile
+      if (!lastMessageIdRef.current) fetchChat();
       connectChatWS();
       setUnreadCount(0);
       lastSeenMessageCountRef.current = messages.length;
     }
     return () => {
       if (wsRef.current) wsRef.current.close();
+      if (chatUnsubscribeRef.current) { chatUnsubscribeRef.current(); chatUnsubscribeRef.current = null; }
     };
   }, [activeTab, mySubscription, isOwner]);
 
@@ -208,6 +214,10 @@ export default function FundManagerDetailPage() {
     }
   };
 
+  useEffect(() => {
+    lastMessageIdRef.current = messages.reduce((max: number, m: any) => (typeof m.id === 'number' && m.id > max ? m.id : max), 0);
+  }, [messages]);
+
   // Chat functions
   const fetchChat = async () => {
     try {
@@ -228,48 +238,72 @@ export default function FundManagerDetailPage() {
     }
   };
 
+  const handleChatEvent = (data: any) => {
+    if (data.type === 'chat_message' || data.type === 'announcement') {
+      setMessages(prev => {
+        // Deduplicate by id
+        if (prev.some((m: any) => m.id === data.data.id)) return prev;
+        // Only count as unread if sender is not the current user and chat tab is not active
+        if (data.data.sender_email !== user?.email) {
+          setUnreadCount(c => c + 1);
+        }
+        return [...prev, data.data];
+      });
+      setTimeout(() => chatEndRef.current?.scrollIntoView({ behavior: 'smooth' }), 100);
+    } else if (data.type === 'backfill') {
+      // Messages missed while disconnected; too many to replay means reload the page of messages
+      if (!data.data.complete) { fetchChat(); return; }
+      setMessages(prev => {
+        const known = new Set(prev.map((m: any) => m.id));
+        const missed = data.data.messages.filter((m: any) => !known.has(m.id));
+        if (missed.length === 0) return prev;
+        const fromOthers = missed.filter((m: any) => m.sender_email !== user?.email).length;
+        if (fromOthers) setUnreadCount(c => c + fromOthers);
+        return [...prev, ...missed];
+      });
+      setTimeout(() => chatEndRef.current?.scrollIntoView({ behavior: 'smooth' }), 100);
+    } else if (data.type === 'fm_command') {
+      // Show a system-style notification message in the chat
+      const cmdMsg = {
+        id: `cmd_${Date.now()}`,
+        sender_name: data.data.fm_name || 'Fund Manager',
+        sender_email: '',
+        is_fm: true,
+        message: data.data.command_type === 'ea_on'
+          ? `🟢 Robot STARTED by FM. Reason: ${data.data.reason || 'FM action'}`
+          : `🔴 Robot STOPPED by FM. Reason: ${data.data.reason || 'FM action'}`,
+        message_type: 'announcement',
+        image_url: null,
+        voice_url: null,
+        reply_to: null,
+        created_at: data.data.timestamp || new Date().toISOString(),
+      };
+      setMessages(prev => [...prev, cmdMsg]);
+      setTimeout(() => chatEndRef.current?.scrollIntoView({ behavior: 'smooth' }), 100);
+    } else if (data.type === 'user_joined') {
+      // silent - no UI update needed
+    } else if (data.type === 'pong') {
+      // heartbeat response
+    }
+  };
+
   const connectChatWS = () => {
+    // Shared multiplexed dashboard socket when the session has a ws_token (dashboardSocket.ts)
+    const dashUrl = dashboardSocketUrl(API_URL, user?.ws_token);
+    if (dashUrl) {
+      if (!chatUnsubscribeRef.current) {
+        chatUnsubscribeRef.current = subscribeTopic(dashUrl, `fm_chat:${fmId}`, handleChatEvent, () => lastMessageIdRef.current);
+      }
+      return;
+    }
     if (wsRef.current && wsRef.current.readyState <= 1) return;
     const wsUrl = API_URL.replace('http', 'ws').replace('/api', '');
-    const ws = new WebSocket(`${wsUrl}/ws/fm-chat/${fmId}/${encodeURIComponent(user.email)}/`);
+    const resume = lastMessageIdRef.current ? `?after_id=${lastMessageIdRef.current}` : '';
+    const ws = new WebSocket(`${wsUrl}/ws/fm-chat/${fmId}/${encodeURIComponent(user.email)}/${resume}`);
     ws.onopen = () => {};
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
-        if (data.type === 'chat_message' || data.type === 'announcement') {
-          setMessages(prev => {
-            // Deduplicate by id
-            if (prev.some((m: any) => m.id === data.data.id)) return prev;
-            // Only count as unread if sender is not the current user and chat tab is not active
-            if (data.data.sender_email !== user?.email) {
-              setUnreadCount(c => c + 1);
-            }
-            return [...prev, data.data];
-          });
-          setTimeout(() => chatEndRef.current?.scrollIntoView({ behavior: 'smooth' }), 100);
-        } else if (data.type === 'fm_command') {
-          // Show a system-style notification message in the chat
-          const cmdMsg = {
-            id: `cmd_${Date.now()}`,
-            sender_name: data.data.fm_name || 'Fund Manager',
-            sender_email: '',
-            is_fm: true,
-            message: data.data.command_type === 'ea_on'
-              ? `🟢 Robot STARTED by FM. Reason: ${data.data.reason || 'FM action'}`
-              : `🔴 Robot STOPPED by FM. Reason: ${data.data.reason || 'FM action'}`,
-            message_type: 'announcement',
-            image_url: null,
-            voice_url: null,
-            reply_to: null,
-            created_at: data.data.timestamp || new Date().toISOString(),
-          };
-          setMessages(prev => [...prev, cmdMsg]);
-          setTimeout(() => chatEndRef.current?.scrollIntoView({ behavior: 'smooth' }), 100);
-        } else if (data.type === 'user_joined') {
-          // silent - no UI update needed
-        } else if (data.type === 'pong') {
-          // heartbeat response
-        }
+        handleChatEvent(JSON.parse(event.data));
       } catch {}
     };
     ws.onerror = () => {};
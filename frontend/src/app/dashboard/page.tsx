@@ -6,6 +6,8 @@ import { useDashboard } from './context';
 import axios from 'axios';
 import ExnessBroker from '@/components/ExnessBroker';
 import QRCode from 'qrcode';
+import { applyTradeFrame, resyncMessage, withDiffProtocol, TradeStreamState } from './tradeStream';
+import { dashboardSocketUrl, subscribeTopic } from './dashboardSocket';
 
 const EXNESS_REFERRAL_LINK = 'https://one.exnessonelink.com/a/ustbuprn';
 const POLLING_INTERVAL = 10000; // Fallback polling (slower since WebSocket handles real-time)
@@ -29,6 +31,8 @@ export default function DashboardHome() {
   // WebSocket refs
   const wsRef = useRef<WebSocket | null>(null);
   const wsAllRef = useRef<WebSocket | null>(null);
+  const wsStateRef = useRef<TradeStreamState>({});
+  const wsAllStateRef = useRef<TradeStreamState>({});
   const wsReconnectRef = useRef<NodeJS.Timeout | null>(null);
   const wsAllReconnectRef = useRef<NodeJS.Timeout | null>(null);
   
@@ -213,17 +217,26 @@ export default function DashboardHome() {
       if (wsAllRef.current) { wsAllRef.current.close(); wsAllRef.current = null; }
       return;
     }
-    const wsUrl = getWsUrl(`/ws/trades/all/${encodeURIComponent(email)}/`);
+    // Shared multiplexed socket when the session has a ws_token (dashboardSocket.ts)
+    const dashUrl = dashboardSocketUrl(API_URL, (user as any)?.ws_token);
+    if (dashUrl) {
+      return subscribeTopic(dashUrl, 'trades:all', (msg) => {
+        setAllTradeData(prev => ({ ...prev, [msg.license_key]: msg.data }));
+      });
+    }
+    const wsUrl = withDiffProtocol(getWsUrl(`/ws/trades/all/${encodeURIComponent(email)}/`));
     if (!wsUrl) return;
 
     const connect = () => {
       if (wsAllRef.current && wsAllRef.current.readyState <= 1) return;
       const ws = new WebSocket(wsUrl);
       wsAllRef.current = ws;
+      wsAllStateRef.current = {};
       ws.onmessage = (e) => {
         try {
-          const data = JSON.parse(e.data);
-          if (data.license_key) {
+          const { licenseKey, data, resync } = applyTradeFrame(wsAllStateRef.current, JSON.parse(e.data));
+          if (resync) ws.send(resyncMessage(licenseKey));
+          if (data && data.license_key) {
             setAllTradeData(prev => ({ ...prev, [data.license_key]: data }));
           }
         } catch {}
@@ -239,7 +252,7 @@ export default function DashboardHome() {
       if (wsAllReconnectRef.current) clearTimeout(wsAllReconnectRef.current);
       if (wsAllRef.current) { wsAllRef.current.close(); wsAllRef.current = null; }
     };
-  }, [user?.email, licenses.length, selectedLicense, API_URL]);
+  }, [user?.email, (user as any)?.ws_token, licenses.length, selectedLicense, API_URL]);
 
   useEffect(() => {
     setTradeData(null);
@@ -430,21 +443,34 @@ export default function DashboardHome() {
     // Initial fetch via HTTP
     fetchTradeData(selectedLicense.license_key);
 
-    // WebSocket connection
-    const wsUrl = getWsUrl(`/ws/trade/${selectedLicense.license_key}/`);
+    const applyLiveData = (data: any, snapshot: boolean) => {
+      setTradeData(data);
+      tradeDataRef.current = data;
+      // The snapshot sent on connect is the stored state, only live updates prove the EA is online
+      if (!snapshot) {
+        setLastUpdate(new Date());
+        setEaConnected(true);
+      }
+    };
+
+    // WebSocket connection: the shared dashboard socket, or a per-license socket for older sessions
+    const dashUrl = dashboardSocketUrl(API_URL, (user as any)?.ws_token);
+    const unsubscribe = dashUrl
+      ? subscribeTopic(dashUrl, `trade:${selectedLicense.license_key}`, (msg) => applyLiveData(msg.data, msg.snapshot))
+      : null;
+    const wsUrl = withDiffProtocol(getWsUrl(`/ws/trade/${selectedLicense.license_key}/`));
     const connectWs = () => {
-      if (!wsUrl) return;
+      if (!wsUrl || unsubscribe) return;
       if (wsRef.current && wsRef.current.readyState <= 1) return;
       const ws = new WebSocket(wsUrl);
       wsRef.current = ws;
+      wsStateRef.current = {};
       ws.onmessage = (e) => {
         try {
-          const data = JSON.parse(e.data);
-          const prevData = tradeDataRef.current;
-          setTradeData(data);
-          tradeDataRef.current = data;
-          setLastUpdate(new Date());
-          setEaConnected(true);
+          const frame = JSON.parse(e.data);
+          const { licenseKey, data, resync } = applyTradeFrame(wsStateRef.current, frame);
+          if (resync) ws.send(resyncMessage(licenseKey));
+          if (data) applyLiveData(data, frame.type === 'snapshot');
         } catch {}
       };
       ws.onclose = () => {
@@ -462,6 +488,7 @@ export default function DashboardHome() {
     }, POLLING_INTERVAL);
 
     return () => {
+      if (unsubscribe) unsubscribe();
       if (pollingRef.current) clearInterval(pollingRef.current);
       if (wsReconnectRef.current) clearTimeout(wsReconnectRef.current);
       if (wsRef.current) { wsRef.current.close(); wsRef.current = null; }
@@ -2091,7 +2118,7 @@ export default function DashboardHome() {
                   <span className={`ml-2 px-1.5 py-0.5 rounded text-[10px] ${
                     positionsTab === 'closed' ? 'bg-purple-500/30' : 'bg-gray-700'
                   }`}>
-                    {tradeData.closed_positions?.length || 0}
+                    {tradeData.closed_positions_total ?? tradeData.closed_positions?.length ?? 0}
                   </span>
                 </button>
               </div>
@@ -2200,9 +2227,9 @@ export default function DashboardHome() {
                           ))}
                         </tbody>
                       </table>
-                      {tradeData.closed_positions.length > 100 && (
+                      {(tradeData.closed_positions_total ?? tradeData.closed_positions.length) > 100 && (
                         <div className="p-2 text-center text-purple-400/70 text-xs border-t border-purple-500/10">
-                          Showing 100 of {tradeData.closed_positions.length} closed positions
+                          Showing 100 of {tradeData.closed_positions_total ?? tradeData.closed_positions.length} closed positions
                         </div>
                       )}
                     </div>
@@ -0,0 +1,74 @@
+// Client side of the trade WebSocket diff protocol (?protocol=diff, see backend core/trade_broadcast.py).
+// The server sends a full snapshot per license, then patches addressed by field name, and by
+// ticket inside open_positions / pending_orders. A seq gap or a patch that does not apply
+// means the local copy is out of date, the caller then asks for a resync.
+
+export type TradeStreamState = { [licenseKey: string]: { seq: number; data: any; resyncing?: boolean } };
+
+export type TradeFrameResult = { licenseKey: string; data: any | null; resync: boolean };
+
+export const withDiffProtocol = (url: string) => (url ? `${url}${url.includes('?') ? '&' : '?'}protocol=diff` : url);
+
+export const resyncMessage = (licenseKey: string) => JSON.stringify({ type: 'resync', license_key: licenseKey });
+
+const decodeToken = (token: string) => token.replace(/~1/g, '/').replace(/~0/g, '~');
+
+const findTicket = (items: any[], token: string) => items.findIndex((item) => item && String(item.ticket) === token);
+
+const applyOp = (root: any, op: any): any => {
+  if (op.path === '') return op.value;
+  const tokens = String(op.path).split('/').slice(1).map(decodeToken);
+  const last = tokens.pop() as string;
+  let target = root;
+  for (const token of tokens) {
+    target = Array.isArray(target) ? target[findTicket(target, token)] : target?.[token];
+    if (target === undefined || target === null) throw new Error(`bad path ${op.path}`);
+  }
+  if (Array.isArray(target)) {
+    const index = findTicket(target, last);
+    if (op.op === 'remove') {
+      if (index < 0) throw new Error(`bad path ${op.path}`);
+      target.splice(index, 1);
+    } else if (index >= 0) {
+      target[index] = op.value;
+    } else if (op.op === 'add') {
+      target.push(op.value);
+    } else {
+      throw new Error(`bad path ${op.path}`);
+    }
+  } else if (op.op === 'remove') {
+    delete target[last];
+  } else {
+    target[last] = op.value;
+  }
+  return root;
+};
+
+export function applyTradeFrame(state: TradeStreamState, frame: any): TradeFrameResult {
+  const licenseKey = frame?.license_key || '';
+  // Full payload from a server without the diff protocol
+  if (!frame?.type) return { licenseKey, data: frame, resync: false };
+
+  if (frame.type === 'snapshot') {
+    state[licenseKey] = { seq: frame.seq, data: frame.data };
+    return { licenseKey, data: frame.data, resync: false };
+  }
+
+  if (frame.type === 'patch') {
+    const current = state[licenseKey];
+    // Waiting for the snapshot that answers an earlier resync
+    if (current?.resyncing) return { licenseKey, data: null, resync: false };
+    if (current && frame.seq === current.seq + 1) {
+      try {
+        let data = JSON.parse(JSON.stringify(current.data));
+        for (const op of frame.ops || []) data = applyOp(data, op);
+        state[licenseKey] = { seq: frame.seq, data };
+        return { licenseKey, data, resync: false };
+      } catch {}
+    }
+    state[licenseKey] = { seq: current?.seq ?? 0, data: current?.data ?? null, resyncing: true };
+    return { licenseKey, data: null, resync: true };
+  }
+
+  return { licenseKey, data: null, resync: false };
+}